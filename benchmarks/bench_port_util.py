@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Compare port_util.get_index_from_str with the memoized InterfaceIndexer.
+
+Usage: python benchmarks/bench_port_util.py [number of interfaces] [repeats]
+"""
+import os
+import sys
+import timeit
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from swsssdk import port_util
+
+
+def interface_names(count):
+    names = []
+    prefixes = ['Ethernet', 'Ethernet-BP', 'PortChannel', 'Vlan', 'eth']
+    for i in range(count):
+        names.append('{}{}'.format(prefixes[i % len(prefixes)], i))
+    # Names which are not SONiC interfaces are looked up too
+    names.extend('CPU{}'.format(i) for i in range(count // 10))
+    return names
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    names = interface_names(count)
+    indexer = port_util.InterfaceIndexer()
+    assert [port_util.get_index_from_str(name) for name in names] == indexer.get_indexes(names)
+
+    benchmarks = [
+        ('get_index_from_str', lambda: [port_util.get_index_from_str(name) for name in names]),
+        ('InterfaceIndexer (cold)', lambda: port_util.InterfaceIndexer().get_indexes(names)),
+        ('InterfaceIndexer.get_index', lambda: [indexer.get_index(name) for name in names]),
+        ('InterfaceIndexer.get_indexes', lambda: indexer.get_indexes(names)),
+    ]
+    print('{} names, best of {} runs'.format(len(names), repeats))
+    for label, func in benchmarks:
+        best = min(timeit.repeat(func, number=1, repeat=repeats))
+        print('{:32} {:10.3f} ms {:10.3f} us/name'.format(label, best * 1e3, best * 1e6 / len(names)))
+
+
+if __name__ == '__main__':
+    main()
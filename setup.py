@@ -9,6 +9,15 @@ high_performance_deps = [
     'hiredis>=0.1.4'
 ]
 
+numpy_deps = [
+    'numpy'
+]
+
+test_deps = [
+    'pytest',
+    'fakeredis'
+]
+
 setup(
     name='swsssdk',
     version='2.0.1',
@@ -23,8 +32,10 @@ setup(
     maintainer_email='thomasbo@microsoft.com',
     description='Switch State service Python utility library.',
     install_requires=dependencies,
+    tests_require=test_deps,
     extras_require={
-        'high_perf': high_performance_deps
+        'high_perf': high_performance_deps,
+        'numpy': numpy_deps
     },
     entry_points={
         'console_scripts': [
@@ -10,6 +10,8 @@ logger.addHandler(logging.NullHandler())
 try:
     from .dbconnector import SonicDBConfig, SonicV2Connector
     from .configdb import ConfigDBConnector, ConfigDBPipeConnector
+    from .writer import BufferedWriter, ConfigDBBufferedWriter
+    from .statetable import ProducerStateTable, ConsumerStateTable
     from .sonic_db_dump_load import sonic_db_dump_load
 except (KeyError, ValueError):
     msg = "Failed to database connector objects -- incorrect database config schema."
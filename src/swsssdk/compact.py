@@ -0,0 +1,102 @@
+"""
+Memory-compact table representation
+
+Rows are read-only mappings which only hold a tuple of values. The column names are kept
+once per distinct column layout and shared by all the rows having it, and equal strings
+(column names, values, row key parts) are stored once per snapshot.
+
+Example:
+    config_db = ConfigDBConnector()
+    config_db.connect()
+    config = config_db.get_config(compact=True)
+    config['PORT']['Ethernet0']['admin_status']
+"""
+import sys
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+if sys.version_info >= (3, 0):
+    intern = sys.intern
+
+
+class RowLayout(object):
+    __slots__ = ('columns', 'index')
+
+    def __init__(self, columns):
+        self.columns = tuple(intern(str(column)) for column in columns)
+        self.index = dict((column, i) for i, column in enumerate(self.columns))
+
+
+class CompactRow(Mapping):
+    """Read-only table row sharing its column layout with the other rows of a snapshot."""
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._layout.index[key]]
+
+    def __contains__(self, key):
+        return key in self._layout.index
+
+    def __iter__(self):
+        return iter(self._layout.columns)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return repr(dict(zip(self._layout.columns, self._values)))
+
+    def copy(self):
+        return dict(zip(self._layout.columns, self._values))
+
+
+class CompactTableBuilder(object):
+    """Build the compact rows and keys of one snapshot."""
+
+    def __init__(self):
+        self._layouts = {}
+        self._strings = {}
+        self._keys = {}
+
+    def intern(self, value):
+        """Return the stored instance of a string equal to value."""
+        return self._strings.setdefault(value, value)
+
+    def key(self, row, deserialize_key):
+        """Deserialize a row key, sharing results and key parts across the tables of the snapshot.
+        Args:
+            row: serialized row key, without table name.
+            deserialize_key: function to deserialize a row key on cache miss.
+        """
+        key = self._keys.get(row)
+        if key is None:
+            key = deserialize_key(row)
+            if type(key) is tuple:
+                key = tuple(self.intern(token) for token in key)
+            else:
+                key = self.intern(key)
+            self._keys[row] = key
+        return key
+
+    def row(self, entry):
+        """Convert a typed entry {'column_key': value, ...} into a CompactRow."""
+        columns = tuple(entry)
+        layout = self._layouts.get(columns)
+        if layout is None:
+            layout = self._layouts[columns] = RowLayout(columns)
+        strings = self._strings
+        values = []
+        for value in entry.values():
+            if type(value) is list:
+                value = [strings.setdefault(item, item) for item in value]
+            elif isinstance(value, str):
+                value = strings.setdefault(value, value)
+            values.append(value)
+        return CompactRow(layout, tuple(values))
@@ -17,17 +17,32 @@ Example:
     config_db.listen()
 
 """
+import itertools
+import random
 import sys
 import time
+from collections import namedtuple
+from redis.exceptions import RedisError, WatchError
+from . import logger
 from .dbconnector import SonicV2Connector
+from .exceptions import TransactionConflictError
+from .schema import TableSchema
+from .compact import CompactTableBuilder
 
 PY3K = sys.version_info >= (3, 0)
 
 class ConfigDBConnector(SonicV2Connector):
 
     INIT_INDICATOR = 'CONFIG_DB_INITIALIZED'
+    REDIS_SCAN_BATCH_SIZE = 30
+    REDIS_SCAN_COUNT = 1000  # COUNT hint of SCAN commands walking the keyspace
+    REDIS_PIPELINE_BATCH_SIZE = 1000
+    TRANSACTION_RETRIES = 10
+    TRANSACTION_RETRY_WAIT_TIME = 0.01  # seconds, grows linearly with the attempt number
+    # Table index keys have no table separator, so that other readers do not take them for table entries
+    TABLE_INDEX_PREFIX = '_TABLE_INDEX'
 
-    def __init__(self, decode_responses=True, **kwargs):
+    def __init__(self, decode_responses=True, use_table_index=False, **kwargs):
         # By default, connect to Redis through TCP, which does not requires root.
         if len(kwargs) == 0:
             kwargs['host'] = '127.0.0.1'
@@ -45,6 +60,11 @@ class ConfigDBConnector(SonicV2Connector):
            Eg. ConfigDBConnector(use_unix_socket_path=True, namespace=namespace)
 
            'namespace' is implicitly passed to the parent SonicV2Connector class.
+
+           With use_table_index, the connector maintains a Redis set of the row keys of each
+           table, '_TABLE_INDEX_<table>', when writing, and enumerates tables from it instead of
+           scanning the whole keyspace. The index is built on connect if it does not exist yet;
+           use verify_table_index/rebuild_table_index when other clients write the db.
         """
         super(ConfigDBConnector, self).__init__(**kwargs)
         # Trick: to achieve static/instance method "overload", we must use initize the function in ctor
@@ -55,22 +75,11 @@ class ConfigDBConnector(SonicV2Connector):
         self.TABLE_NAME_SEPARATOR = '|'
         self.KEY_SEPARATOR = '|'
         self.handlers = {}
+        self.table_schemas = {}
+        self.use_table_index = use_table_index
 
     def __wait_for_db_init(self):
-        client = self.get_redis_client(self.db_name)
-        pubsub = client.pubsub()
-        initialized = client.get(ConfigDBConnector.INIT_INDICATOR)
-        if not initialized:
-            pattern = "__keyspace@{}__:{}".format(self.get_dbid(self.db_name), ConfigDBConnector.INIT_INDICATOR)
-            pubsub.psubscribe(pattern)
-            for item in pubsub.listen():
-                if item['type'] == 'pmessage':
-                    key = item['channel'].split(':', 1)[1]
-                    if key == ConfigDBConnector.INIT_INDICATOR:
-                        initialized = client.get(self.INIT_INDICATOR)
-                        if initialized:
-                            break
-            pubsub.punsubscribe(pattern)
+        self.wait_for(self.db_name, [self.INIT_INDICATOR], lambda key, value: bool(value))
 
 
     def db_connect(self, dbname, wait_for_init=False, retry_on=False):
@@ -79,6 +88,8 @@ class ConfigDBConnector(SonicV2Connector):
         SonicV2Connector.connect(self, self.db_name, retry_on)
         if wait_for_init:
             self.__wait_for_db_init()
+        if self.use_table_index and not self.get_redis_client(self.db_name).exists(self.TABLE_INDEX_PREFIX):
+            self.rebuild_table_index()
 
     def connect(self, wait_for_init=True, retry_on=False):
         self.db_connect('CONFIG_DB', wait_for_init, retry_on)
@@ -101,6 +112,23 @@ class ConfigDBConnector(SonicV2Connector):
         if table in self.handlers:
             self.handlers.pop(table)
 
+    def register_schema(self, table, fields):
+        """Declare the field types of a table. Entries of the table are then converted with
+        converters compiled from the declaration by all reads and writes of this connector.
+        Args:
+            table: Table name.
+            fields: field types in a form of dictionary {'column_key': 'string'|'list'|'int'|'bool', ...}
+                    Fields which are not declared keep the generic conversion.
+        """
+        self.table_schemas[table.upper()] = TableSchema(fields)
+
+    def unregister_schema(self, table):
+        """Remove the declared field types of a table.
+        Args:
+            table: Table name.
+        """
+        self.table_schemas.pop(table.upper(), None)
+
     def __fire(self, table, key, data):
         if table in self.handlers:
             handler = self.handlers[table]
@@ -118,14 +146,17 @@ class ConfigDBConnector(SonicV2Connector):
                     (table, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
                     if table in self.handlers:
                         client = self.get_redis_client(self.db_name)
-                        data = self.raw_to_typed(client.hgetall(key))
+                        data = self.raw_to_typed(client.hgetall(key), table)
                         self.__fire(table, row, data)
                 except ValueError:
                     pass    #Ignore non table-formated redis entries
 
-    def raw_to_typed(self, raw_data):
+    def raw_to_typed(self, raw_data, table=None):
         if raw_data is None:
             return None
+        schema = self.table_schemas.get(table)
+        if schema is not None:
+            return schema.raw_to_typed(raw_data)
         typed_data = {}
         for raw_key in raw_data:
             key = raw_key
@@ -134,7 +165,7 @@ class ConfigDBConnector(SonicV2Connector):
             if key == "NULL":
                 pass
             # A column key with ending '@' is used to mark list-typed table items
-            # TODO: Replace this with a schema-based typing mechanism.
+            # Tables with a registered schema are converted by their TableSchema instead.
             elif key.endswith("@"):
                 value = raw_data[raw_key].split(',')
                 typed_data[key[:-1]] = value
@@ -142,9 +173,12 @@ class ConfigDBConnector(SonicV2Connector):
                 typed_data[key] = raw_data[raw_key]
         return typed_data
 
-    def typed_to_raw(self, typed_data):
+    def typed_to_raw(self, typed_data, table=None):
         if typed_data is None:
             return None
+        schema = self.table_schemas.get(table)
+        if schema is not None:
+            return schema.typed_to_raw(typed_data)
         elif typed_data == {}:
             return { "NULL": "NULL" }
         raw_data = {}
@@ -197,11 +231,12 @@ class ConfigDBConnector(SonicV2Connector):
             client.delete(_hash)
         else:
             original = self.get_entry(table, key)
-            client.hmset(_hash, self.typed_to_raw(data))
+            client.hmset(_hash, self.typed_to_raw(data, table.upper()))
             for k in [ k for k in original if k not in data ]:
                 if type(original[k]) == list:
                     k = k + '@'
                 client.hdel(_hash, self.serialize_key(k))
+        self._index_update(client, table.upper(), key, data is None)
 
     def mod_entry(self, table, key, data):
         """Modify a table entry to config db.
@@ -218,7 +253,8 @@ class ConfigDBConnector(SonicV2Connector):
         if data is None:
             client.delete(_hash)
         else:
-            client.hmset(_hash, self.typed_to_raw(data))
+            client.hmset(_hash, self.typed_to_raw(data, table.upper()))
+        self._index_update(client, table.upper(), key, data is None)
 
     def get_entry(self, table, key):
         """Read a table entry from config db.
@@ -232,7 +268,7 @@ class ConfigDBConnector(SonicV2Connector):
         key = self.serialize_key(key)
         client = self.get_redis_client(self.db_name)
         _hash = '{}{}{}'.format(table.upper(), self.TABLE_NAME_SEPARATOR, key)
-        return self.raw_to_typed(client.hgetall(_hash))
+        return self.raw_to_typed(client.hgetall(_hash), table.upper())
 
     def get_keys(self, table, split=True):
         """Read all keys of a table from config db.
@@ -244,8 +280,11 @@ class ConfigDBConnector(SonicV2Connector):
             List of keys.
         """
         client = self.get_redis_client(self.db_name)
-        pattern = '{}{}*'.format(table.upper(), self.TABLE_NAME_SEPARATOR)
-        keys = client.keys(pattern)
+        if self.use_table_index:
+            keys = self._table_keys(client, table.upper())
+        else:
+            pattern = '{}{}*'.format(table.upper(), self.TABLE_NAME_SEPARATOR)
+            keys = client.keys(pattern)
         data = []
         for key in keys:
             try:
@@ -258,10 +297,12 @@ class ConfigDBConnector(SonicV2Connector):
                 pass    #Ignore non table-formated redis entries
         return data
 
-    def get_table(self, table):
+    def get_table(self, table, compact=False):
         """Read an entire table from config db.
         Args:
             table: Table name.
+            compact: return rows as read-only CompactRow mappings sharing their column layout
+                     and strings, which takes several times less memory for large tables.
         Returns: 
             Table data in a dictionary form of 
             { 'row_key': {'column_key': value, ...}, ...}
@@ -269,17 +310,75 @@ class ConfigDBConnector(SonicV2Connector):
             Empty dictionary if table does not exist.
         """
         client = self.get_redis_client(self.db_name)
-        pattern = '{}{}*'.format(table.upper(), self.TABLE_NAME_SEPARATOR)
-        keys = client.keys(pattern)
+        builder = CompactTableBuilder() if compact else None
         data = {}
-        for key in keys:
-            try:
-                entry = self.raw_to_typed(client.hgetall(key))
-                if entry is not None:
-                    (_, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
-                    data[self.deserialize_key(row)] = entry
-            except ValueError:
-                pass    #Ignore non table-formated redis entries
+        for _, key, entry in self.__iter_entries(self._table_raw(client, table.upper()), builder):
+            data[key] = entry
+        return data
+
+    def iter_table(self, table):
+        """Iterate over the entries of a table from config db. Keys are scanned with a COUNT hint
+           of REDIS_SCAN_COUNT, or read from the table index with use_table_index, and the entries
+           are read in batches of REDIS_SCAN_BATCH_SIZE keys with one pipelined round trip per
+           batch, so memory use does not grow with the table size.
+           As per SCAN guarantees, an entry modified during the iteration may be yielded twice.
+        Args:
+            table: Table name.
+        Returns:
+            Generator of (table_name, row_key, {'column_key': value, ...}) tuples, with row_key
+            being a tuple of keys for a multi-key table.
+        """
+        client = self.get_redis_client(self.db_name)
+        return self.__iter_entries(self._table_raw(client, table.upper()))
+
+    def iter_config(self):
+        """Iterate over all config data, see iter_table.
+        Returns:
+            Generator of (table_name, row_key, {'column_key': value, ...}) tuples.
+        """
+        client = self.get_redis_client(self.db_name)
+        return self.__iter_entries(self._scan_raw(client, '*'))
+
+    def __iter_entries(self, records, builder=None):
+        for key, raw in records:
+            (table_name, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
+            entry = self.raw_to_typed(raw, table_name)
+            if builder is None:
+                yield table_name, self.deserialize_key(row), entry
+            else:
+                yield builder.intern(table_name), builder.key(row, self.deserialize_key), builder.row(entry)
+
+    def query_table(self, table, where=None, fields=None):
+        """Read the entries of a table matching some column values, restricted to some columns.
+           Filtering and projection are done server-side, see SonicV2Connector.query.
+        Args:
+            table: Table name.
+            where: dictionary {'column_key': value, ...} the entries must match, None for all entries.
+            fields: list of column keys to return, None for all columns.
+        Returns:
+            Table data in the same form as get_table, holding only the matching entries and
+            the requested columns.
+        """
+        table = table.upper()
+        raw_where = self.typed_to_raw(where, table) if where else None
+        raw_fields = None
+        if fields is not None:
+            schema = self.table_schemas.get(table)
+            raw_fields = []
+            for field in fields:
+                if schema is not None and field in schema.fields:
+                    raw_fields.append(field + '@' if schema.fields[field] == 'list' else field)
+                else:
+                    # Without schema, the column may be list-typed or not
+                    raw_fields.extend((field, field + '@'))
+        pattern = '{}{}*'.format(table, self.TABLE_NAME_SEPARATOR)
+        keys = None
+        if self.use_table_index:
+            keys = self._table_keys(self.get_redis_client(self.db_name), table)
+        data = {}
+        for key, raw in self.query(self.db_name, pattern, raw_where, raw_fields, keys).items():
+            (table_name, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
+            data[self.deserialize_key(row)] = self.raw_to_typed(raw, table_name)
         return data
 
     def delete_table(self, table):
@@ -288,8 +387,12 @@ class ConfigDBConnector(SonicV2Connector):
             table: Table name.
         """
         client = self.get_redis_client(self.db_name)
-        pattern = '{}{}*'.format(table.upper(), self.TABLE_NAME_SEPARATOR)
-        keys = client.keys(pattern)
+        if self.use_table_index:
+            keys = list(self._table_keys(client, table.upper()))
+            keys.append(self._index_key(table.upper()))
+        else:
+            pattern = '{}{}*'.format(table.upper(), self.TABLE_NAME_SEPARATOR)
+            keys = client.keys(pattern)
         for key in keys:
             client.delete(key)
 
@@ -312,8 +415,246 @@ class ConfigDBConnector(SonicV2Connector):
             for key in table_data:
                 self.mod_entry(table_name, key, table_data[key])
 
-    def get_config(self):
+    def _scan_raw(self, client, pattern):
+        """Read raw hashes matching a key pattern, see _read_raw.
+        Args:
+            client: Redis client
+            pattern: key pattern
+        Returns:
+            Generator of (redis_key, raw_data) tuples.
+        """
+        return self._read_raw(client, client.scan_iter(match=pattern, count=self.REDIS_SCAN_COUNT))
+
+    def _table_raw(self, client, table):
+        """Read the raw hashes of a table, see _read_raw and _table_keys.
+        Args:
+            client: Redis client
+            table: Table name.
+        Returns:
+            Generator of (redis_key, raw_data) tuples.
+        """
+        return self._read_raw(client, self._table_keys(client, table))
+
+    def _read_raw(self, client, keys):
+        """Read raw hashes in batches of REDIS_SCAN_BATCH_SIZE keys fetched with one
+        pipeline round trip per batch.
+        Args:
+            client: Redis client
+            keys: iterable of redis keys
+        Returns:
+            Generator of (redis_key, raw_data) tuples. Keys which are not table-formated
+            (including the INIT_INDICATOR and the table indexes) and keys which do not
+            exist anymore are skipped.
+        """
+        pipe = client.pipeline(transaction=False)
+        keys = iter(keys)
+        while True:
+            batch = list(itertools.islice(keys, self.REDIS_SCAN_BATCH_SIZE))
+            if not batch:
+                break
+            batch = [key for key in batch
+                     if self.TABLE_NAME_SEPARATOR in key and not key.startswith(self.TABLE_INDEX_PREFIX)]
+            for key in batch:
+                pipe.hgetall(key)
+            records = pipe.execute() if batch else []
+            for index, key in enumerate(batch):
+                if records[index]:
+                    yield key, records[index]
+
+    def _index_key(self, table):
+        return '{}_{}'.format(self.TABLE_INDEX_PREFIX, table)
+
+    def _table_keys(self, client, table):
+        """Enumerate the redis keys of a table, from the table index when use_table_index is set,
+        otherwise by scanning the keyspace.
+        Args:
+            client: Redis client
+            table: Table name.
+        Returns:
+            Generator of redis keys.
+        """
+        if not self.use_table_index:
+            pattern = '{}{}*'.format(table, self.TABLE_NAME_SEPARATOR)
+            for key in client.scan_iter(match=pattern, count=self.REDIS_SCAN_COUNT):
+                yield key
+            return
+        for row in client.sscan_iter(self._index_key(table), count=self.REDIS_SCAN_COUNT):
+            yield '{}{}{}'.format(table, self.TABLE_NAME_SEPARATOR, row)
+
+    def _index_update(self, client, table, row, deleted):
+        """Add or remove a row key of the table index, when use_table_index is set.
+        Args:
+            client: Redis client or pipe
+            table: Table name.
+            row: serialized row key.
+            deleted: True if the entry was deleted.
+        """
+        if not self.use_table_index:
+            return
+        if deleted:
+            client.srem(self._index_key(table), row)
+        else:
+            client.sadd(self._index_key(table), row)
+
+    def __scan_table_rows(self, client):
+        rows = {}
+        for key in client.scan_iter(match='*', count=self.REDIS_SCAN_COUNT):
+            if self.TABLE_NAME_SEPARATOR in key and not key.startswith(self.TABLE_INDEX_PREFIX):
+                (table_name, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
+                rows.setdefault(table_name, set()).add(row)
+        return rows
+
+    def rebuild_table_index(self):
+        """Rebuild the table indexes from a scan of the whole db, e.g. after the db was written by
+           clients which do not maintain them. Writes done during the rebuild may be missed.
+        """
+        client = self.get_redis_client(self.db_name)
+        rows = self.__scan_table_rows(client)
+        pipe = client.pipeline()
+        for key in client.scan_iter(match=self._index_key('*'), count=self.REDIS_SCAN_COUNT):
+            pipe.delete(key)
+        for table_name, table_rows in rows.items():
+            table_rows = list(table_rows)
+            for start in range(0, len(table_rows), self.REDIS_PIPELINE_BATCH_SIZE):
+                pipe.sadd(self._index_key(table_name), *table_rows[start:start + self.REDIS_PIPELINE_BATCH_SIZE])
+        pipe.set(self.TABLE_INDEX_PREFIX, '1')
+        pipe.execute()
+
+    def verify_table_index(self):
+        """Compare the table indexes with a scan of the whole db.
+        Returns:
+            Differences in a dictionary form of
+            { 'TABLE_NAME': {'missing': ['row_key', ...], 'stale': ['row_key', ...]}, ...}
+            with serialized row keys, 'missing' ones being in the db but not in the index.
+            Empty dictionary if the indexes are consistent.
+        """
+        client = self.get_redis_client(self.db_name)
+        rows = self.__scan_table_rows(client)
+        for key in client.scan_iter(match=self._index_key('*'), count=self.REDIS_SCAN_COUNT):
+            rows.setdefault(key[len(self._index_key('')):], set())
+        pipe = client.pipeline(transaction=False)
+        tables = list(rows)
+        for table_name in tables:
+            pipe.smembers(self._index_key(table_name))
+        diff = {}
+        for table_name, indexed in zip(tables, pipe.execute()):
+            missing = rows[table_name] - indexed
+            stale = indexed - rows[table_name]
+            if missing or stale:
+                diff[table_name] = {'missing': sorted(missing), 'stale': sorted(stale)}
+        return diff
+
+    def _diff_raw_entry(self, current, desired, mode):
+        """Compute the field level changes needed to turn one raw hash into another.
+        Args:
+            current: raw data currently in the db, {} if the entry does not exist.
+            desired: raw data to apply.
+            mode: 'replace' or 'merge', see apply_config.
+        Returns:
+            (to_set, to_del): raw fields to write and raw field names to remove.
+        """
+        if current and mode == 'merge' and desired == { "NULL": "NULL" }:
+            # Same as mod_entry with {}: only creates the entry if it does not exist
+            return {}, []
+        to_set = dict((k, v) for k, v in desired.items() if current.get(k) != v)
+        to_del = []
+        if mode == 'replace':
+            to_del = [k for k in current if k not in desired]
+        return to_set, to_del
+
+    def apply_config(self, data, mode='replace'):
+        """Write multiple tables into config db, only touching the entries and fields which differ
+           from the current db content. The current content is read in bulk and the changes are
+           written in pipelined batches of REDIS_PIPELINE_BATCH_SIZE commands.
+        Args:
+            data: config data in a dictionary form
+            {
+                'TABLE_NAME': { 'row_key': {'column_key': 'value', ...}, ...},
+                'MULTI_KEY_TABLE_NAME': { ('l1_key', 'l2_key', ...) : {'column_key': 'value', ...}, ...},
+                ...
+            }
+            mode: 'replace' to make the config db equal to data: tables, entries and fields
+                  which are not in data are removed.
+                  'merge' to keep extra entries/fields in the db, like mod_config.
+                  In both modes, a None table or entry in data is deleted.
+        Returns:
+            The applied delta in a dictionary form of
+            {
+                'TABLE_NAME': {
+                    'row_key': None,    # deleted entry
+                    'row_key': {'set': {'raw_column_key': 'value', ...}, 'del': ['raw_column_key', ...]},
+                    ...
+                },
+                ...
+            }
+            Column keys are in raw form, i.e. with the '@' suffix for list-typed columns.
+        """
+        if mode not in ('replace', 'merge'):
+            raise ValueError("Unsupported apply_config mode '{}'".format(mode))
+
+        client = self.get_redis_client(self.db_name)
+        desired = {}
+        current = {}
+        for table_name in data:
+            table_data = data[table_name]
+            if table_data is None:
+                if mode == 'merge':
+                    current.update(self._table_raw(client, table_name.upper()))
+                continue
+            for key in table_data:
+                _hash = '{}{}{}'.format(table_name.upper(), self.TABLE_NAME_SEPARATOR, self.serialize_key(key))
+                desired[_hash] = self.typed_to_raw(table_data[key], table_name.upper())
+
+        if mode == 'replace':
+            current.update(self._scan_raw(client, '*'))
+        else:
+            pipe = client.pipeline(transaction=False)
+            keys = [key for key in desired if key not in current]
+            for start in range(0, len(keys), self.REDIS_PIPELINE_BATCH_SIZE):
+                batch = keys[start:start + self.REDIS_PIPELINE_BATCH_SIZE]
+                for key in batch:
+                    pipe.hgetall(key)
+                current.update((key, raw) for key, raw in zip(batch, pipe.execute()) if raw)
+
+        delta = {}
+        pipe = client.pipeline()
+        pending = 0
+        for _hash in set(current) | set(desired):
+            (table_name, row) = _hash.split(self.TABLE_NAME_SEPARATOR, 1)
+            raw = desired.get(_hash)
+            if raw is None:
+                if _hash not in current:
+                    continue
+                change = None
+                pipe.delete(_hash)
+                self._index_update(pipe, table_name, row, True)
+                pending += 1
+            else:
+                to_set, to_del = self._diff_raw_entry(current.get(_hash, {}), raw, mode)
+                if not to_set and not to_del:
+                    continue
+                change = {'set': to_set, 'del': to_del}
+                # Write before removing fields so that the entry never disappears in between
+                if to_set:
+                    pipe.hmset(_hash, to_set)
+                    pending += 1
+                if to_del:
+                    pipe.hdel(_hash, *to_del)
+                    pending += 1
+                if _hash not in current:
+                    self._index_update(pipe, table_name, row, False)
+            delta.setdefault(table_name, {})[self.deserialize_key(row)] = change
+            if pending >= self.REDIS_PIPELINE_BATCH_SIZE:
+                pipe.execute()
+                pending = 0
+        if pending:
+            pipe.execute()
+        return delta
+
+    def get_config(self, compact=False):
         """Read all config data. 
+        Args:
+            compact: return rows as read-only CompactRow mappings, see get_table.
         Returns:
             Config data in a dictionary form of 
             { 
@@ -323,21 +664,314 @@ class ConfigDBConnector(SonicV2Connector):
             }
         """
         client = self.get_redis_client(self.db_name)
-        keys = client.keys('*')
+        builder = CompactTableBuilder() if compact else None
         data = {}
+        for table_name, key, entry in self.__iter_entries(self._scan_raw(client, '*'), builder):
+            data.setdefault(table_name, {})[key] = entry
+        return data
+
+    def change_feed(self, tables=None):
+        """Create a resumable change feed on some tables, see ConfigDBChangeFeed.
+        Args:
+            tables: list of table names, None for all tables.
+        """
+        return ConfigDBChangeFeed(self, tables)
+
+    def transaction(self, retries=None):
+        """Run a read-modify-write on config db with optimistic concurrency control.
+           Entries read through the transaction are WATCHed and writes are queued, then
+           committed atomically in a MULTI/EXEC pipeline when the 'with' block exits.
+           If a watched entry was modified by another client in between, the commit is
+           discarded and a new attempt is yielded, up to 'retries' times.
+        Example:
+            for txn in config_db.transaction():
+                with txn:
+                    entry = txn.get_entry('VLAN', 'Vlan100')
+                    members = entry.get('members', []) + ['Ethernet0']
+                    txn.mod_entry('VLAN', 'Vlan100', {'members': members})
+        Args:
+            retries: maximum number of attempts after a conflict, TRANSACTION_RETRIES by default.
+        Returns:
+            Generator of ConfigDBTransaction attempts, stopping after the first committed one.
+        Raises:
+            TransactionConflictError if no attempt could be committed.
+        """
+        if retries is None:
+            retries = self.TRANSACTION_RETRIES
+        client = self.get_redis_client(self.db_name)
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                # Randomized wait so that conflicting writers do not retry in lockstep
+                time.sleep(random.uniform(0, self.TRANSACTION_RETRY_WAIT_TIME * attempt))
+            txn = ConfigDBTransaction(self, client)
+            try:
+                yield txn
+            finally:
+                txn.reset()
+            if txn.committed:
+                return
+            if not txn.conflicted:
+                raise RuntimeError("Transaction attempt was not run in a 'with' block")
+        raise TransactionConflictError("Transaction on '{}' not committed after {} retries".format(self.db_name, retries))
+
+
+ChangeEvent = namedtuple('ChangeEvent', ['seq', 'table', 'key', 'data'])
+"""A table entry change. 'data' is the new typed entry, None if the entry was deleted."""
+
+
+class ConfigDBChangeFeed(object):
+    """Snapshot-plus-delta change feed on config db tables.
+       The feed delivers a snapshot of the tables, then ChangeEvents tagged with increasing
+       sequence numbers. Without a call to snapshot(), the first poll delivers the initial
+       content of the tables as ChangeEvents. Keyspace notifications only tell which entries changed; the feed
+       reads them back and compares with the last known state, so only actual differences
+       are delivered. If the notification channel is lost, the feed re-subscribes, reads the
+       tables again with pipelined requests and delivers the differences it missed.
+    Example:
+        feed = config_db.change_feed(['PORT'])
+        ports = feed.snapshot()
+        for event in feed:
+            print(event.seq, event.table, event.key, event.data)
+
+        # Initial content as events, then the changes
+        for event in config_db.change_feed(['PORT']):
+            print(event.seq, event.table, event.key, event.data)
+    """
+    RESYNC_WAIT_TIME = 1  # seconds
+    NOTIFICATION_TIMEOUT = 10.0  # seconds
+
+    def __init__(self, config_db, tables=None):
+        self.config_db = config_db
+        self.tables = None if tables is None else sorted(set(table.upper() for table in tables))
+        self.seq = 0
+        self.state = {}   # redis key -> typed entry
+        self.pubsub = None
+
+    def __patterns(self):
+        if self.tables is None:
+            return ['*']
+        return ['{}{}*'.format(table, self.config_db.TABLE_NAME_SEPARATOR) for table in self.tables]
+
+    def __subscribe(self):
+        client = self.config_db.get_redis_client(self.config_db.db_name)
+        dbid = self.config_db.get_dbid(self.config_db.db_name)
+        self.pubsub = client.pubsub()
+        self.pubsub.psubscribe(*['__keyspace@{}__:{}'.format(dbid, pattern) for pattern in self.__patterns()])
+
+    def __read_all(self):
+        client = self.config_db.get_redis_client(self.config_db.db_name)
+        if self.tables is None:
+            records = self.config_db._scan_raw(client, '*')
+        else:
+            records = itertools.chain(*[self.config_db._table_raw(client, table) for table in self.tables])
+        current = {}
+        for key, raw in records:
+            table_name = key.split(self.config_db.TABLE_NAME_SEPARATOR, 1)[0]
+            current[key] = self.config_db.raw_to_typed(raw, table_name)
+        return current
+
+    def __read(self, keys):
+        client = self.config_db.get_redis_client(self.config_db.db_name)
+        pipe = client.pipeline(transaction=False)
         for key in keys:
+            pipe.hgetall(key)
+        current = {}
+        for key, raw in zip(keys, pipe.execute()):
+            if raw:
+                table_name = key.split(self.config_db.TABLE_NAME_SEPARATOR, 1)[0]
+                current[key] = self.config_db.raw_to_typed(raw, table_name)
+        return current
+
+    def __diff(self, current, keys):
+        events = []
+        for key in sorted(keys):
+            entry = current.get(key)
+            if entry == self.state.get(key):
+                continue
+            if entry is None:
+                del self.state[key]
+            else:
+                self.state[key] = entry
+            self.seq += 1
+            (table_name, row) = key.split(self.config_db.TABLE_NAME_SEPARATOR, 1)
+            events.append(ChangeEvent(self.seq, table_name, self.config_db.deserialize_key(row), entry))
+        return events
+
+    def snapshot(self):
+        """Subscribe to the table changes and read the tables.
+        Returns:
+            Config data of the tables in the same form as ConfigDBConnector.get_config.
+        """
+        self.close()
+        self.__subscribe()
+        self.state = self.__read_all()
+        data = {}
+        for key, entry in self.state.items():
+            (table_name, row) = key.split(self.config_db.TABLE_NAME_SEPARATOR, 1)
+            data.setdefault(table_name, {})[self.config_db.deserialize_key(row)] = entry
+        return data
+
+    def poll(self, timeout=0):
+        """Get the changes since the last call, or since the last known state after close().
+           The first call without snapshot() returns the table entries.
+        Args:
+            timeout: seconds to wait for a first notification.
+        Returns:
+            List of ChangeEvent.
+        """
+        if self.pubsub is None:
+            return self.resync()
+        try:
+            keys = set()
+            item = self.pubsub.get_message(timeout=timeout)
+            while item is not None:
+                if item['type'] == 'pmessage':
+                    key = item['channel'].split(':', 1)[1]
+                    if self.config_db.TABLE_NAME_SEPARATOR in key and \
+                            not key.startswith(self.config_db.TABLE_INDEX_PREFIX):
+                        keys.add(key)
+                item = self.pubsub.get_message()
+            if not keys:
+                return []
+            return self.__diff(self.__read(list(keys)), keys)
+        except (RedisError, OSError):
+            logger.warning("Change feed on '{}' lost its notification channel, resynchronizing".format(self.config_db.db_name))
+            return self.resync()
+
+    def resync(self):
+        """Re-subscribe and read the tables again.
+        Returns:
+            List of ChangeEvent for the differences between the tables and the last known state.
+        """
+        while True:
             try:
-                (table_name, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
-                entry = self.raw_to_typed(client.hgetall(key))
-                if entry != None:
-                    data.setdefault(table_name, {})[self.deserialize_key(row)] = entry
-            except ValueError:
-                pass    #Ignore non table-formated redis entries
+                self.close()
+                self.__subscribe()
+                current = self.__read_all()
+                break
+            except (RedisError, OSError):
+                logger.warning("Change feed resync on '{}' failed, will retry in {}s".format(self.config_db.db_name, self.RESYNC_WAIT_TIME))
+                time.sleep(self.RESYNC_WAIT_TIME)
+        return self.__diff(current, set(current) | set(self.state))
+
+    def close(self):
+        if self.pubsub is not None:
+            try:
+                self.pubsub.close()
+            except (RedisError, OSError):
+                pass
+            self.pubsub = None
+
+    def __iter__(self):
+        while True:
+            for event in self.poll(self.NOTIFICATION_TIMEOUT):
+                yield event
+
+
+class ConfigDBTransaction(object):
+    """One attempt of a config db transaction, see ConfigDBConnector.transaction.
+       Reads return the db content, not the writes queued in the same transaction.
+    """
+
+    def __init__(self, config_db, client):
+        self.config_db = config_db
+        self.client = client
+        self.pipe = client.pipeline()
+        self.writes = []
+        self.committed = False
+        self.conflicted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            return False
+        if not self.writes:
+            self.committed = True
+            return False
+        try:
+            self.pipe.multi()
+            for (method, args) in self.writes:
+                getattr(self.pipe, method)(*args)
+            self.pipe.execute()
+            self.committed = True
+        except WatchError:
+            self.conflicted = True
+        return False
+
+    def reset(self):
+        self.pipe.reset()
+
+    def __hash(self, table, key):
+        key = self.config_db.serialize_key(key)
+        return '{}{}{}'.format(table.upper(), self.config_db.TABLE_NAME_SEPARATOR, key)
+
+    def __index(self, table, key, deleted):
+        if self.config_db.use_table_index:
+            index = self.config_db._index_key(table.upper())
+            self.writes.append(('srem' if deleted else 'sadd', (index, self.config_db.serialize_key(key))))
+
+    def __read(self, _hash):
+        self.pipe.watch(_hash)
+        return self.pipe.hgetall(_hash)
+
+    def get_entry(self, table, key):
+        """Read a table entry and watch it, see ConfigDBConnector.get_entry."""
+        return self.config_db.raw_to_typed(self.__read(self.__hash(table, key)), table.upper())
+
+    def get_table(self, table):
+        """Read an entire table and watch its entries, see ConfigDBConnector.get_table.
+           The table keys are watched in one WATCH, then enumerated again until no new key shows
+           up, so that all the entries existing at read time are watched, and read in one pipeline.
+           Creation of new entries by other clients after the read does not cause a conflict.
+        """
+        table = table.upper()
+        watched = set()
+        while True:
+            keys = set(self.config_db._table_keys(self.client, table)) - watched
+            if not keys:
+                break
+            self.pipe.watch(*keys)
+            watched |= keys
+        keys = sorted(watched)
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        data = {}
+        for key, raw in zip(keys, pipe.execute() if keys else []):
+            if raw:
+                row = key.split(self.config_db.TABLE_NAME_SEPARATOR, 1)[1]
+                data[self.config_db.deserialize_key(row)] = self.config_db.raw_to_typed(raw, table)
         return data
 
+    def set_entry(self, table, key, data):
+        """Queue the write of a table entry, see ConfigDBConnector.set_entry.
+           The current entry is read and watched to know which fields to remove.
+        """
+        _hash = self.__hash(table, key)
+        self.__index(table, key, data is None)
+        if data is None:
+            self.writes.append(('delete', (_hash,)))
+            return
+        original = self.__read(_hash)
+        raw = self.config_db.typed_to_raw(data, table.upper())
+        self.writes.append(('hmset', (_hash, raw)))
+        stale = [k for k in original if k not in raw and k != "NULL"]
+        if stale:
+            self.writes.append(('hdel', (_hash,) + tuple(stale)))
+
+    def mod_entry(self, table, key, data):
+        """Queue the modification of a table entry, see ConfigDBConnector.mod_entry."""
+        _hash = self.__hash(table, key)
+        self.__index(table, key, data is None)
+        if data is None:
+            self.writes.append(('delete', (_hash,)))
+        else:
+            self.writes.append(('hmset', (_hash, self.config_db.typed_to_raw(data, table.upper()))))
+
 
 class ConfigDBPipeConnector(ConfigDBConnector):
-    REDIS_SCAN_BATCH_SIZE = 30
 
     def __init__(self, **kwargs):
         super(ConfigDBPipeConnector, self).__init__(**kwargs)
@@ -369,6 +1003,11 @@ class ConfigDBPipeConnector(ConfigDBConnector):
             pipe: Redis DB pipe
             table: Table name.
         """
+        if self.use_table_index:
+            for key in self._table_keys(client, table.upper()):
+                pipe.delete(key)
+            pipe.delete(self._index_key(table.upper()))
+            return
         pattern = '{}{}*'.format(table.upper(), self.TABLE_NAME_SEPARATOR)
         cur = self.__delete_entries(client, pipe, pattern, 0)
         while cur != 0:
@@ -390,7 +1029,8 @@ class ConfigDBPipeConnector(ConfigDBConnector):
         if data is None:
             pipe.delete(_hash)
         else:
-            pipe.hmset(_hash, self.typed_to_raw(data))
+            pipe.hmset(_hash, self.typed_to_raw(data, table.upper()))
+        self._index_update(pipe, table.upper(), key, data is None)
 
     def mod_config(self, data):
         """Write multiple tables into config db.
@@ -413,49 +1053,3 @@ class ConfigDBPipeConnector(ConfigDBConnector):
             for key in table_data:
                 self.__mod_entry(pipe, table_name, key, table_data[key])
         pipe.execute()
-
-    def __get_config(self, client, pipe, data, cursor):
-        """Read config data in batches of size REDIS_SCAN_BATCH_SIZE using Redis pipelines
-        Args:
-            client: Redis client
-            pipe: Redis DB pipe
-            data: config dictionary
-            cursor: position to start scanning from
-
-        Returns:
-            cur: poition of next item to scan
-        """
-        cur, keys = client.scan(cursor=cursor, match='*', count=self.REDIS_SCAN_BATCH_SIZE)
-        keys = [key for key in keys if key != self.INIT_INDICATOR]
-        for key in keys:
-            pipe.hgetall(key)
-        records = pipe.execute()
-
-        for index, key in enumerate(keys):
-            (table_name, row) = key.split(self.TABLE_NAME_SEPARATOR, 1)
-            entry = self.raw_to_typed(records[index])
-            if entry is not None:
-                data.setdefault(table_name, {})[self.deserialize_key(row)] = entry
-
-        return cur
-
-    def get_config(self):
-        """Read all config data. 
-        Returns:
-            Config data in a dictionary form of 
-            { 
-                'TABLE_NAME': { 'row_key': {'column_key': 'value', ...}, ...},
-                'MULTI_KEY_TABLE_NAME': { ('l1_key', 'l2_key', ...) : {'column_key': 'value', ...}, ...},
-                ...
-            }
-        """
-        client = self.get_redis_client(self.db_name)
-        pipe = client.pipeline()
-        data = {}
-
-        cur = self.__get_config(client, pipe, data, 0)
-        while cur != 0:
-            cur = self.__get_config(client, pipe, data, cur)
-
-        return data
-
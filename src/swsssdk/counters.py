@@ -0,0 +1,216 @@
+"""
+Bulk COUNTERS_DB reader
+
+The counters of all the ports are read with pipelined HMGET batches and returned as one
+ports x counters uint64 matrix: a NumPy array if NumPy is installed, otherwise a list of lists.
+
+Example:
+    db = SonicV2Connector()
+    if_name_map, if_id_map = port_util.get_interface_oid_map(db)
+    reader = CountersReader(db, if_name_map, ['SAI_PORT_STAT_IF_IN_OCTETS', 'SAI_PORT_STAT_IF_OUT_OCTETS'])
+    snapshot = reader.read()
+    snapshot.values[snapshot.ports.index('Ethernet0')]
+
+    engine = CounterRateEngine(reader)
+    while True:
+        rates = engine.poll()
+        time.sleep(1)
+"""
+import time
+from collections import namedtuple
+
+from . import logger, port_util
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+COUNTERS_DB = 'COUNTERS_DB'
+COUNTERS_KEY_PREFIX = 'COUNTERS:oid:0x'
+
+CounterSnapshot = namedtuple('CounterSnapshot', ['timestamp', 'ports', 'counters', 'values'])
+"""
+timestamp: time.time() when the read completed.
+ports: row labels, interface names ordered by interface index.
+counters: column labels, counter names.
+values: uint64 matrix of the counter values, 0 for missing counters.
+"""
+
+CounterRates = namedtuple('CounterRates', ['timestamp', 'interval', 'ports', 'counters', 'deltas', 'rates', 'totals'])
+"""
+timestamp: timestamp of the last snapshot.
+interval: seconds between the last two snapshots.
+ports, counters: row and column labels.
+deltas: uint64 matrix of the counter increments between the last two snapshots.
+rates: float64 matrix of the increments per second.
+totals: uint64 matrix of the increments since the last clear, or since the first snapshot.
+"""
+
+
+def _port_order(if_name):
+    index = port_util.interface_indexer.get_index(if_name)
+    return (index is None, index or 0, if_name)
+
+
+class CountersReader(object):
+    BATCH_SIZE = 128  # ports per pipeline
+
+    def __init__(self, db, if_name_map, counters, use_numpy=None, batch_size=None):
+        """
+        :param db: SonicV2Connector.
+        :param if_name_map: dict of interface name to port oid without 'oid:0x', as returned by
+        port_util.get_interface_oid_map.
+        :param counters: list of counter names.
+        :param use_numpy: if ``False``, values are lists of ints. By default, NumPy is used if installed.
+        """
+        if use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.db = db
+        self.db.connect(COUNTERS_DB)
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self.batch_size = self.BATCH_SIZE if batch_size is None else batch_size
+        self.ports = sorted(if_name_map, key=_port_order)
+        self.counters = list(counters)
+        self.keys = [COUNTERS_KEY_PREFIX + if_name_map[port] for port in self.ports]
+
+    def read_raw(self):
+        """
+        :return: flat list of the counter values as read, row by row, None for missing counters.
+        """
+        client = self.db.get_redis_client(COUNTERS_DB)
+        values = []
+        for start in range(0, len(self.keys), self.batch_size):
+            pipe = client.pipeline(transaction=False)
+            for key in self.keys[start:start + self.batch_size]:
+                pipe.hmget(key, self.counters)
+            for row in pipe.execute():
+                values.extend(row)
+        return values
+
+    def read(self):
+        """
+        Read the counters of all the ports.
+        :return: CounterSnapshot.
+        """
+        raw = self.read_raw()
+        timestamp = time.time()
+        width = len(self.counters)
+        if self.use_numpy:
+            values = numpy.fromiter((int(value or 0) for value in raw), dtype=numpy.uint64, count=len(raw))
+            values = values.reshape((len(self.ports), width))
+        else:
+            raw = [int(value) if value else 0 for value in raw]
+            values = [raw[start:start + width] for start in range(0, len(raw), width)]
+        return CounterSnapshot(timestamp, self.ports, self.counters, values)
+
+
+def read_counters(db, if_name_map, counters, use_numpy=None):
+    """
+    Read the given counters of all the ports in bulk, see CountersReader.
+    :return: CounterSnapshot.
+    """
+    return CountersReader(db, if_name_map, counters, use_numpy).read()
+
+
+class CounterRateEngine(object):
+    """
+    Deltas, rates and totals since clear of successive CounterSnapshots, computed on whole
+    counter matrices. Requires NumPy.
+
+    A counter lower than in the previous snapshot was reset, and its delta is its new value,
+    unless wrap_bits is set: then it wrapped around at 2 ** wrap_bits.
+    """
+    HISTORY_SIZE = 8
+
+    def __init__(self, reader=None, history_size=None, wrap_bits=None):
+        """
+        :param reader: CountersReader used by poll().
+        :param history_size: number of deltas kept for moving_average().
+        :param wrap_bits: width of counters wrapping around instead of being reset, e.g. 32.
+        """
+        if numpy is None:
+            raise ImportError("CounterRateEngine requires NumPy")
+        self.reader = reader
+        self.history_size = self.HISTORY_SIZE if history_size is None else history_size
+        self.wrap_mask = None if wrap_bits is None else numpy.uint64((1 << wrap_bits) - 1)
+        self.previous = None
+        self.totals = None
+        self.history = None
+        self.intervals = None
+        self.history_count = 0
+        self.history_pos = 0
+
+    def __reset(self, snapshot):
+        shape = (len(snapshot.ports), len(snapshot.counters))
+        self.previous = snapshot
+        self.totals = numpy.zeros(shape, dtype=numpy.uint64)
+        self.history = numpy.zeros((self.history_size,) + shape, dtype=numpy.uint64)
+        self.intervals = numpy.zeros(self.history_size)
+        self.history_count = 0
+        self.history_pos = 0
+
+    def poll(self):
+        """
+        Read a snapshot with the reader and update.
+        """
+        return self.update(self.reader.read())
+
+    def update(self, snapshot):
+        """
+        :param snapshot: CounterSnapshot with NumPy values.
+        :return: CounterRates since the previous snapshot, None for the first snapshot or when the
+        ports or counters changed, which restarts the computation.
+        """
+        previous = self.previous
+        if previous is None or previous.ports != snapshot.ports or previous.counters != snapshot.counters:
+            if previous is not None:
+                logger.info("Counter layout changed, restarting rate computation")
+            self.__reset(snapshot)
+            return None
+
+        current = numpy.asarray(snapshot.values, dtype=numpy.uint64)
+        last = numpy.asarray(previous.values, dtype=numpy.uint64)
+        # uint64 arithmetic is modulo 2 ** 64
+        deltas = current - last
+        if self.wrap_mask is not None:
+            deltas &= self.wrap_mask
+        else:
+            reset = current < last
+            deltas[reset] = current[reset]
+        interval = snapshot.timestamp - previous.timestamp
+        if interval > 0:
+            rates = deltas / interval
+        else:
+            rates = numpy.zeros(deltas.shape)
+
+        self.totals += deltas
+        self.history[self.history_pos] = deltas
+        self.intervals[self.history_pos] = interval
+        self.history_pos = (self.history_pos + 1) % self.history_size
+        self.history_count = min(self.history_count + 1, self.history_size)
+        self.previous = snapshot
+        return CounterRates(snapshot.timestamp, interval, snapshot.ports, snapshot.counters, deltas, rates,
+                            self.totals.copy())
+
+    def moving_average(self, samples=None):
+        """
+        :param samples: number of most recent deltas to average, by default all the history.
+        :return: float64 matrix of the average rates over the last samples, None without history.
+        """
+        count = self.history_count if samples is None else min(samples, self.history_count)
+        if count <= 0:
+            return None
+        positions = (self.history_pos - 1 - numpy.arange(count)) % self.history_size
+        interval = self.intervals[positions].sum()
+        deltas = self.history[positions].sum(axis=0)
+        if interval <= 0:
+            return numpy.zeros(deltas.shape)
+        return deltas / interval
+
+    def clear(self):
+        """
+        Restart the totals from the last snapshot, like clearing the counters.
+        """
+        if self.totals is not None:
+            self.totals[...] = 0
@@ -0,0 +1,239 @@
+"""
+Shared-memory counter snapshots
+
+A publisher reads the counters in bulk with a CountersReader and writes them into a memory-mapped
+file, so that local readers get the counters without querying COUNTERS_DB.
+
+File layout, little-endian:
+    header (HEADER_SIZE bytes): magic, layout version, sequence number, timestamp,
+        number of ports, number of counters, size of the labels, offset of the values
+    labels: JSON {"ports": [...], "counters": [...]}
+    values: ports x counters uint64 matrix, row by row
+
+The sequence number is a seqlock: odd while the values are being written, incremented again once
+they are written. A reader retries its copy until it saw the same even sequence number before and
+after it. When the ports or counters change, the publisher replaces the file, and readers map the
+new one on their next read.
+
+Example:
+    publisher = CountersSnapshotPublisher(CountersReader(db, if_name_map, counter_names))
+    publisher.run()
+
+    reader = CountersSnapshotReader()
+    snapshot = reader.read()
+"""
+import errno
+import json
+import mmap
+import os
+import struct
+import time
+
+from .counters import CounterSnapshot, numpy
+
+DEFAULT_PATH = '/dev/shm/swsssdk_counters'
+
+MAGIC = b'SWSSCNT\0'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<8sIIQdIIII')
+HEADER_SIZE = 64
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = 16
+TIMESTAMP = struct.Struct('<d')
+TIMESTAMP_OFFSET = 24
+
+
+class CountersSnapshotPublisher(object):
+    INTERVAL = 1.0  # seconds
+
+    def __init__(self, reader, path=DEFAULT_PATH, interval=None):
+        """
+        :param reader: CountersReader of the published counters.
+        :param path: path of the snapshot file, preferably on a tmpfs like /dev/shm.
+        :param interval: seconds between the snapshots written by run().
+        """
+        self.reader = reader
+        self.path = path
+        self.interval = self.INTERVAL if interval is None else interval
+        self.mm = None
+        self.layout = None
+        self.values_offset = 0
+        self.seq = 0
+
+    def __create(self, ports, counters):
+        self.close()
+        labels = json.dumps({'ports': list(ports), 'counters': list(counters)}).encode()
+        values_offset = (HEADER_SIZE + len(labels) + 7) // 8 * 8
+        size = values_offset + 8 * len(ports) * len(counters)
+
+        # Build the new file aside and rename it, so that readers never map a partial file
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.mm[:HEADER_SIZE] = HEADER.pack(MAGIC, LAYOUT_VERSION, 0, 0, 0.0, len(ports), len(counters),
+                                            len(labels), values_offset).ljust(HEADER_SIZE, b'\0')
+        self.mm[HEADER_SIZE:HEADER_SIZE + len(labels)] = labels
+        os.rename(tmp_path, self.path)
+        self.layout = (list(ports), list(counters))
+        self.values_offset = values_offset
+        self.seq = 0
+
+    def publish(self, snapshot=None):
+        """
+        Write a snapshot, by default read with the reader.
+        :return: the sequence number of the snapshot.
+        """
+        if snapshot is None:
+            snapshot = self.reader.read()
+        if self.layout != (list(snapshot.ports), list(snapshot.counters)):
+            self.__create(snapshot.ports, snapshot.counters)
+
+        if numpy is not None:
+            values = numpy.asarray(snapshot.values, dtype='<u8').tobytes()
+        else:
+            flat = [value for row in snapshot.values for value in row]
+            values = struct.pack('<{}Q'.format(len(flat)), *flat)
+
+        mm = self.mm
+        SEQ.pack_into(mm, SEQ_OFFSET, self.seq + 1)
+        mm[self.values_offset:self.values_offset + len(values)] = values
+        TIMESTAMP.pack_into(mm, TIMESTAMP_OFFSET, snapshot.timestamp)
+        self.seq += 2
+        SEQ.pack_into(mm, SEQ_OFFSET, self.seq)
+        return self.seq
+
+    def run(self, stop_event=None):
+        """
+        Publish a snapshot every interval until %stop_event (threading.Event) is set.
+        """
+        while stop_event is None or not stop_event.is_set():
+            start = time.time()
+            self.publish()
+            wait = max(self.interval - (time.time() - start), 0)
+            if stop_event is None:
+                time.sleep(wait)
+            else:
+                stop_event.wait(wait)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+            self.layout = None
+
+
+class CountersSnapshotReader(object):
+    RETRIES = 1000
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        :param path: path of the snapshot file of a CountersSnapshotPublisher.
+        """
+        self.path = path
+        self.mm = None
+        self.previous_mm = None
+        self.inode = None
+        self.ports = None
+        self.counters = None
+        self.values_offset = 0
+
+    def __map(self):
+        inode = os.stat(self.path).st_ino
+        if inode == self.inode:
+            return
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        (magic, version, _, _, _, n_ports, n_counters, labels_size, values_offset) = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            mm.close()
+            raise ValueError("{} is not a counters snapshot of layout version {}".format(self.path, LAYOUT_VERSION))
+        labels = json.loads(mm[HEADER_SIZE:HEADER_SIZE + labels_size].decode())
+        # Views of the previous mapping may still be in use: keep it, close the older one
+        self.__close(self.previous_mm)
+        self.previous_mm = self.mm
+        self.mm = mm
+        self.inode = inode
+        self.ports = labels['ports']
+        self.counters = labels['counters']
+        self.values_offset = values_offset
+
+    @staticmethod
+    def __close(mm):
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                # Still exported by a view, unmapped once the view is released
+                pass
+
+    @property
+    def seq(self):
+        """
+        Sequence number of the mapped snapshot, odd while it is being written.
+        """
+        self.__map()
+        return SEQ.unpack_from(self.mm, SEQ_OFFSET)[0]
+
+    def view(self):
+        """
+        Zero-copy access to the values, which the publisher keeps updating: check that seq is even
+        and unchanged after using them. When the ports or counters change, the view keeps showing the
+        replaced file, which is no longer updated: the reader keeps the previous mapping open, and
+        closes the older ones unless views of them are still alive.
+        :return: ports x counters read-only NumPy uint64 array, or flat memoryview of uint64 without NumPy.
+        """
+        self.__map()
+        count = len(self.ports) * len(self.counters)
+        if numpy is not None:
+            values = numpy.frombuffer(self.mm, dtype='<u8', count=count, offset=self.values_offset)
+            return values.reshape((len(self.ports), len(self.counters)))
+        return memoryview(self.mm)[self.values_offset:self.values_offset + 8 * count].cast('Q')
+
+    def read(self):
+        """
+        Copy the last published snapshot.
+        :return: CounterSnapshot, None if no snapshot was published yet.
+        """
+        try:
+            self.__map()
+        except OSError as e:
+            if e.errno != errno.ENOENT or self.mm is not None:
+                raise
+            return None
+        mm = self.mm
+        start, end = self.values_offset, self.values_offset + 8 * len(self.ports) * len(self.counters)
+        for _ in range(self.RETRIES):
+            seq = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if seq & 1:
+                continue
+            timestamp = TIMESTAMP.unpack_from(mm, TIMESTAMP_OFFSET)[0]
+            data = mm[start:end]
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == seq:
+                break
+        else:
+            raise RuntimeError("No consistent counters snapshot after {} attempts".format(self.RETRIES))
+        if seq == 0:
+            return None
+
+        width = len(self.counters)
+        if numpy is not None:
+            values = numpy.frombuffer(data, dtype='<u8').reshape((len(self.ports), width)).astype(numpy.uint64)
+        else:
+            flat = list(struct.unpack('<{}Q'.format(len(data) // 8), data))
+            values = [flat[i:i + width] for i in range(0, len(flat), width)]
+        return CounterSnapshot(timestamp, list(self.ports), list(self.counters), values)
+
+    def close(self):
+        self.__close(self.previous_mm)
+        self.__close(self.mm)
+        self.previous_mm = None
+        self.mm = None
+        self.inode = None
@@ -4,6 +4,7 @@ Database connection module for SwSS
 import os
 import sys
 import json
+import threading
 from . import logger
 from .interface import DBInterface
 
@@ -321,4 +322,104 @@ class SonicV2Connector(object):
     def delete_all_by_pattern(self, db_name, pattern, *args, **kwargs):
         self.dbintf.delete_all_by_pattern(db_name, pattern, *args, **kwargs)
 
+    def query(self, db_name, pattern='*', where=None, fields=None, keys=None):
+        return self.dbintf.query(db_name, pattern, where, fields, keys)
+
+    def wait_for(self, db_name, keys, condition=None, timeout=None):
+        return self.dbintf.wait_for(db_name, keys, condition, timeout)
+
+    def batch(self):
+        return MultiDBBatch(self)
+
     pass
+
+
+class MultiDBBatch(object):
+    """
+    Batch of commands against several databases, sent with one pipeline per redis instance.
+
+    Databases hosted by the same instance share the pipeline: a SELECT is queued whenever the
+    target database changes, and the database of the pipeline connection is restored at the end.
+    The pipelines of different instances are executed in parallel.
+
+    Example:
+        batch = db.batch()
+        batch.hgetall(db.APPL_DB, 'PORT_TABLE:Ethernet0')
+        batch.hget(db.STATE_DB, 'PORT_TABLE|Ethernet0', 'netdev_oper_status')
+        batch.hgetall(db.COUNTERS_DB, 'COUNTERS:' + oid)
+        (appl, oper_status, counters) = batch.execute()
+    """
+
+    def __init__(self, connector):
+        self.connector = connector
+        # instance name -> [(submission index, db_name, method, args, kwargs)]
+        self.groups = {}
+        self.count = 0
+
+    def add(self, db_name, method, *args, **kwargs):
+        """
+        Queue a command.
+        :param db_name: name of a connected DB.
+        :param method: name of the redis client method, e.g. 'hgetall'.
+        """
+        self.connector.get_redis_client(db_name)
+        inst_name = SonicDBConfig.get_instancename(db_name, self.connector.namespace)
+        self.groups.setdefault(inst_name, []).append((self.count, db_name, method, args, kwargs))
+        self.count += 1
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda db_name, *args, **kwargs: self.add(db_name, method, *args, **kwargs)
+
+    def __len__(self):
+        return self.count
+
+    def _execute_group(self, commands, results):
+        client = self.connector.get_redis_client(commands[0][1])
+        client_db = client.connection_pool.connection_kwargs.get('db', 0)
+        current_db = client_db
+        pipe = client.pipeline(transaction=False)
+        positions = []
+        for (index, db_name, method, args, kwargs) in commands:
+            db_id = self.connector.get_dbid(db_name)
+            if db_id != current_db:
+                pipe.execute_command('SELECT', db_id)
+                positions.append(None)
+                current_db = db_id
+            getattr(pipe, method)(*args, **kwargs)
+            positions.append(index)
+        if current_db != client_db:
+            pipe.execute_command('SELECT', client_db)
+        for index, result in zip(positions, pipe.execute()):
+            if index is not None:
+                results[index] = result
+
+    def execute(self):
+        """
+        Send the queued commands and clear the batch.
+        :return: list of the command results, in submission order.
+        """
+        groups = list(self.groups.values())
+        results = [None] * self.count
+        self.groups = {}
+        self.count = 0
+        if len(groups) <= 1:
+            for commands in groups:
+                self._execute_group(commands, results)
+            return results
+
+        errors = []
+        def run(commands):
+            try:
+                self._execute_group(commands, results)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run, args=(commands,)) for commands in groups]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
@@ -44,3 +44,7 @@ class UnavailableDataError(SwSSQueryError):
 
 class MissingClientError(SwSSQueryError):
     """ Raised when a queried client wasn't found. """
+
+
+class TransactionConflictError(SwSSQueryError):
+    """ Raised when a transaction could not be committed because of concurrent writes. """
@@ -1,3 +1,5 @@
+import fnmatch
+import itertools
 import time
 from functools import wraps
 
@@ -142,6 +144,49 @@ class DBInterface(object):
     ACS Redis db mainly uses hash, therefore h is selected.
     """
 
+    REDIS_SCAN_BATCH_SIZE = 500
+    """
+    Number of keys requested per SCAN call, and evaluated per query script call.
+    """
+
+    QUERY_SCRIPT = """
+    -- KEYS: hashes to evaluate
+    -- ARGV: number of conditions, condition field/value pairs, then the fields to return (all if none)
+    local n_where = tonumber(ARGV[1])
+    local first_field = 2 + 2 * n_where
+    local result = {}
+    for _, key in ipairs(KEYS) do
+        local match = redis.call('TYPE', key).ok == 'hash'
+        for i = 0, n_where - 1 do
+            if not match then
+                break
+            end
+            match = redis.call('HGET', key, ARGV[2 + 2 * i]) == ARGV[3 + 2 * i]
+        end
+        if match then
+            local values
+            if #ARGV < first_field then
+                values = redis.call('HGETALL', key)
+            else
+                values = {}
+                for i = first_field, #ARGV do
+                    local value = redis.call('HGET', key, ARGV[i])
+                    if value then
+                        table.insert(values, ARGV[i])
+                        table.insert(values, value)
+                    end
+                end
+            end
+            table.insert(result, key)
+            table.insert(result, values)
+        end
+    end
+    return result
+    """
+    """
+    Lua script filtering and projecting hashes server-side, see query().
+    """
+
     def __init__(self, **kwargs):
 
         super(DBInterface, self).__init__()
@@ -345,6 +390,148 @@ class DBInterface(object):
         for key in keys:
             client.delete(key)
 
+    def query(self, db_name, pattern='*', where=None, fields=None, keys=None):
+        """
+        Retrieve the hashes of DB %db_name matching %pattern whose fields equal the values of
+        %where, restricted to %fields. Keys are scanned in batches of REDIS_SCAN_BATCH_SIZE and
+        each batch is filtered and projected server-side by QUERY_SCRIPT, so only the
+        matching hashes and the requested fields are transferred.
+
+        :param where: dict of field to value the hashes must have, ``None`` to match all hashes.
+        :param fields: list of fields to return, ``None`` to return all fields.
+        Fields missing in a hash are omitted from its result.
+        :param keys: iterable of keys to evaluate instead of scanning for %pattern.
+        :return: dict of key to dict of field to value.
+        """
+        client = self.redis_clients[db_name]
+        script = client.register_script(self.QUERY_SCRIPT)
+        where = where or {}
+        args = [len(where)]
+        for field, value in where.items():
+            args.extend((field, value))
+        args.extend(fields or [])
+
+        if keys is None:
+            keys = client.scan_iter(match=pattern, count=self.REDIS_SCAN_BATCH_SIZE)
+        keys = iter(keys)
+        data = {}
+        while True:
+            batch = list(itertools.islice(keys, self.REDIS_SCAN_BATCH_SIZE))
+            if not batch:
+                break
+            result = script(keys=batch, args=args)
+            for i in range(0, len(result), 2):
+                values = result[i + 1]
+                data[result[i]] = dict(zip(values[::2], values[1::2]))
+        return data
+
+    def wait_for(self, db_name, keys, condition=None, timeout=None):
+        """
+        Wait until all the given keys of DB %db_name satisfy a condition.
+        A single keyspace subscription covers all the keys, current values are read
+        with pipelined requests and only the keys notified as changed are read again.
+
+        :param db_name: DB to wait on.
+        :param keys: list of keys or glob-style key patterns. A pattern is satisfied as soon as one
+        of the keys matching it satisfies the condition.
+        :param condition: function ``condition(key, value)`` returning ``True`` when the key is ready.
+        ``value`` is the dict of a hash, the string of a string key or ``None`` if the key does not exist.
+        By default, a key is ready when it exists.
+        :param timeout: maximum time to wait in seconds, ``None`` to wait forever.
+        :return: ``True`` if all the conditions hold, ``False`` on timeout. Conditions are not latched:
+        a key which stops satisfying its condition is pending again, and the keys satisfying the
+        conditions are read again before returning ``True``.
+        """
+        if condition is None:
+            condition = lambda key, value: value is not None
+        if isinstance(keys, (str, bytes)):
+            keys = [keys]
+        patterns = set(keys)
+        if not patterns:
+            return True
+        client = self.redis_clients[db_name]
+        deadline = None if timeout is None else time.time() + timeout
+
+        # Subscribe before the first read so that no change is missed in between
+        pubsub = client.pubsub()
+        try:
+            pubsub.psubscribe(*["__keyspace@{}__:{}".format(self.redis_db_map[db_name], key) for key in patterns])
+            candidates = []
+            for key in patterns:
+                if any(c in key for c in '*?['):
+                    candidates.extend(client.scan_iter(match=key))
+                else:
+                    candidates.append(key)
+            # keys satisfying the condition at their last read
+            ready = set()
+            while True:
+                values = self._read_values(client, candidates)
+                for key, value in values.items():
+                    if condition(key, value):
+                        ready.add(key)
+                    else:
+                        ready.discard(key)
+                pending = self._pending_patterns(patterns, ready)
+                if not pending:
+                    # Check that the conditions met at earlier reads still hold
+                    values = self._read_values(client, list(ready))
+                    ready = set(key for key, value in values.items() if condition(key, value))
+                    pending = self._pending_patterns(patterns, ready)
+                    if not pending:
+                        return True
+
+                if deadline is None:
+                    wait = self.PUB_SUB_NOTIFICATION_TIMEOUT
+                else:
+                    wait = deadline - time.time()
+                    if wait <= 0:
+                        logger.warning("Keys {} of '{}' not ready before timeout.".format(sorted(pending), db_name))
+                        return False
+                candidates = set()
+                msg = pubsub.get_message(timeout=wait)
+                while msg is not None:
+                    if msg['type'] in ('pmessage', b'pmessage'):
+                        channel = msg['channel']
+                        if isinstance(channel, bytes):
+                            channel = channel.decode()
+                        candidates.add(channel.split(':', 1)[1])
+                    msg = pubsub.get_message()
+        finally:
+            pubsub.close()
+
+    @staticmethod
+    def _pending_patterns(patterns, ready):
+        """
+        :return: set of the keys or patterns of wait_for not matched by any of the ready keys.
+        """
+        return set(pattern for pattern in patterns
+                   if not any(key == pattern or fnmatch.fnmatchcase(key, pattern) for key in ready))
+
+    @staticmethod
+    def _read_values(client, keys):
+        """
+        Read the value of string and hash keys in two pipelined round trips.
+        :return: dict of key to value, ``None`` for a key which does not exist or has another type.
+        """
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+        types = pipe.execute()
+        readers = []
+        for key, key_type in zip(keys, types):
+            if isinstance(key_type, bytes):
+                key_type = key_type.decode()
+            if key_type == 'hash':
+                pipe.hgetall(key)
+            elif key_type == 'string':
+                pipe.get(key)
+            else:
+                continue
+            readers.append(key)
+        values = dict.fromkeys(keys)
+        values.update(zip(readers, pipe.execute() if readers else []))
+        return values
+
     def _unavailable_data_handler(self, db_name, data):
         """
         When the queried config is not available in Redis--wait until it is available.
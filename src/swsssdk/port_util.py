@@ -3,6 +3,10 @@ Bridge/Port mapping utility library.
 """
 import swsssdk
 import re
+import time
+from collections import namedtuple, OrderedDict
+
+from redis import RedisError
 
 
 SONIC_ETHERNET_RE_PATTERN = "^Ethernet(\d+)$"
@@ -15,6 +19,17 @@ SONIC_VLAN_RE_PATTERN = "^Vlan(\d+)$"
 SONIC_PORTCHANNEL_RE_PATTERN = "^PortChannel(\d+)$"
 SONIC_MGMT_PORT_RE_PATTERN = "^eth(\d+)$"
 
+BRIDGE_PORT_KEY_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:"
+ROUTER_INTERFACE_KEY_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_ROUTER_INTERFACE:"
+VLAN_KEY_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_VLAN:"
+ASIC_DB_SCAN_BATCH_SIZE = 1000
+
+COUNTERS_NAME_MAP_KEYS = ('COUNTERS_PORT_NAME_MAP', 'COUNTERS_LAG_NAME_MAP', 'COUNTERS_RIF_NAME_MAP',
+                          'COUNTERS_RIF_TYPE_MAP')
+
+PortMaps = namedtuple('PortMaps', ['if_name_map', 'if_id_map', 'if_br_oid_map', 'rif_port_oid_map',
+                                   'vlan_if_name_map'])
+
 
 class BaseIdx:
     ethernet_base_idx = 1
@@ -57,6 +72,69 @@ def get_index_from_str(if_name):
         if match:
             return int(match.group(1)) + baseidx
 
+
+class InterfaceIndexer(object):
+    """
+    Memoized interface name <-> index translation, with the same indexes as get_index_from_str.
+    Names may be str or bytes, and are cached as given.
+    """
+    INTERFACE_RE = re.compile(r"^(Ethernet-BP|Ethernet|Vlan|PortChannel|eth)(\d+)$")
+    BASE_INDEXES = {
+        'Ethernet': BaseIdx.ethernet_base_idx,
+        'Ethernet-BP': BaseIdx.ethernet_bp_base_idx,
+        'Vlan': BaseIdx.vlan_interface_base_idx,
+        'PortChannel': BaseIdx.portchannel_base_idx,
+        'eth': BaseIdx.mgmt_port_base_idx,
+    }
+
+    def __init__(self):
+        self.indexes = {}   # if_name -> index, None if not a SONiC interface
+        self.names = {}     # index -> last translated if_name
+
+    def get_index(self, if_name):
+        """
+        :return: the 1-based index of interface %if_name, None if it is not a SONiC interface.
+        """
+        try:
+            return self.indexes[if_name]
+        except KeyError:
+            pass
+        name = if_name.decode() if isinstance(if_name, bytes) else if_name
+        match = self.INTERFACE_RE.match(name)
+        index = None
+        if match:
+            index = int(match.group(2)) + self.BASE_INDEXES[match.group(1)]
+            self.names[index] = if_name
+        self.indexes[if_name] = index
+        return index
+
+    def get_name(self, index):
+        """
+        :return: the interface name translated to %index, None if none was.
+        """
+        return self.names.get(index)
+
+    def get_indexes(self, if_names):
+        """
+        :return: list of the indexes of %if_names.
+        """
+        indexes = self.indexes
+        get_index = self.get_index
+        return [indexes[if_name] if if_name in indexes else get_index(if_name) for if_name in if_names]
+
+    def get_names(self, indexes):
+        """
+        :return: list of the interface names translated to %indexes.
+        """
+        names = self.names
+        return [names.get(index) for index in indexes]
+
+    def clear(self):
+        self.indexes.clear()
+        self.names.clear()
+
+interface_indexer = InterfaceIndexer()
+
 def get_interface_oid_map(db):
     """
         Get the Interface names from Counters DB
@@ -64,50 +142,75 @@ def get_interface_oid_map(db):
     db.connect('COUNTERS_DB')
     if_name_map = db.get_all('COUNTERS_DB', 'COUNTERS_PORT_NAME_MAP', blocking=True)
     if_lag_name_map = db.get_all('COUNTERS_DB', 'COUNTERS_LAG_NAME_MAP', blocking=True)
+    return _interface_oid_map(if_name_map, if_lag_name_map)
+
+def _interface_oid_map(if_name_map, if_lag_name_map):
+    if_name_map = dict(if_name_map)
     if_name_map.update(if_lag_name_map)
 
     oid_pfx = len("oid:0x")
     if_name_map = {if_name: sai_oid[oid_pfx:] for if_name, sai_oid in if_name_map.items()}
 
-    # TODO: remove the first branch after all SonicV2Connector are migrated to decode_responses
-    if isinstance(db, swsssdk.SonicV2Connector) and db.dbintf.redis_kwargs.get('decode_responses', False) == False:
-        get_index_func = get_index
-    else:
-        get_index_func = get_index_from_str
-
-    if_id_map = {sai_oid: if_name for if_name, sai_oid in if_name_map.items()
+    if_names = list(if_name_map)
+    if_id_map = {if_name_map[if_name]: if_name for if_name, index in zip(if_names, interface_indexer.get_indexes(if_names))
                  # only map the interface if it's a style understood to be a SONiC interface.
-                 if get_index_func(if_name) is not None}
+                 if index is not None}
 
     return if_name_map, if_id_map
 
-def get_bridge_port_map(db):
+def _scan_attributes(client, specs):
     """
-        Get the Bridge port mapping from ASIC DB
+        Read one attribute of all the objects of several ASIC_DB object types, pipelining the SCAN
+        steps of all the types with the HGET of the objects found at the previous step.
+        specs: list of (key prefix, attribute name)
+        Returns, for each spec, the list of (key, attribute value) of the objects having the attribute.
     """
-    db.connect('ASIC_DB')
-    br_port_str = db.keys('ASIC_DB', "ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:*")
-    if not br_port_str:
-        return {}
+    results = [[] for _ in specs]
+    cursors = [0] * len(specs)   # None once the scan of the spec is done
+    pending = []                 # (spec index, key) to read
+    while pending or any(cursor is not None for cursor in cursors):
+        pipe = client.pipeline(transaction=False)
+        scanning = [i for i, cursor in enumerate(cursors) if cursor is not None]
+        for i in scanning:
+            pipe.scan(cursors[i], match=specs[i][0] + '*', count=ASIC_DB_SCAN_BATCH_SIZE)
+        for i, key in pending:
+            pipe.hget(key, specs[i][1])
+        replies = pipe.execute()
+
+        for (i, key), value in zip(pending, replies[len(scanning):]):
+            if value is not None:
+                results[i].append((key, value))
+        pending = []
+        for i, (cursor, keys) in zip(scanning, replies):
+            cursors[i] = cursor if cursor != 0 else None
+            pending.extend((i, key) for key in keys)
+    return results
 
-    if_br_oid_map = {}
-    offset = len("ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:")
+def _bridge_port_map(entries):
+    # Example key: ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:0x3a000000000616
+    offset = len(BRIDGE_PORT_KEY_PREFIX)
     oid_pfx = len("oid:0x")
-    for br_s in br_port_str:
-        # Example output: ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:0x3a000000000616
-        br_port_id = br_s[(offset + oid_pfx):]
-        ent = db.get_all('ASIC_DB', br_s, blocking=True)
+    return {br_s[(offset + oid_pfx):]: port_id[oid_pfx:] for br_s, port_id in entries}
+
+def _rif_port_map(entries):
+    offset = len(ROUTER_INTERFACE_KEY_PREFIX + "oid:0x")
+    rif_port_oid_map = {}
+    for rif_s, port_id in entries:
         # TODO: remove the first branch after all SonicV2Connector are migrated to decode_responses
-        if isinstance(db, swsssdk.SonicV2Connector) and db.dbintf.redis_kwargs.get('decode_responses', False) == False:
-            if b"SAI_BRIDGE_PORT_ATTR_PORT_ID" in ent:
-                port_id = ent[b"SAI_BRIDGE_PORT_ATTR_PORT_ID"][oid_pfx:]
-                if_br_oid_map[br_port_id] = port_id
+        if isinstance(port_id, bytes):
+            rif_port_oid_map[rif_s[offset:]] = port_id.lstrip(b"oid:0x")
         else:
-            if "SAI_BRIDGE_PORT_ATTR_PORT_ID" in ent:
-                port_id = ent["SAI_BRIDGE_PORT_ATTR_PORT_ID"][oid_pfx:]
-                if_br_oid_map[br_port_id] = port_id
+            rif_port_oid_map[rif_s[offset:]] = port_id.lstrip("oid:0x")
+    return rif_port_oid_map
 
-    return if_br_oid_map
+def get_bridge_port_map(db):
+    """
+        Get the Bridge port mapping from ASIC DB
+    """
+    db.connect('ASIC_DB')
+    entries, = _scan_attributes(db.get_redis_client('ASIC_DB'),
+                                [(BRIDGE_PORT_KEY_PREFIX, "SAI_BRIDGE_PORT_ATTR_PORT_ID")])
+    return _bridge_port_map(entries)
 
 def get_vlan_id_from_bvid(db, bvid):
     """
@@ -132,25 +235,9 @@ def get_rif_port_map(db):
         Get the RIF port mapping from ASIC DB
     """
     db.connect('ASIC_DB')
-    rif_keys_str = db.keys('ASIC_DB', "ASIC_STATE:SAI_OBJECT_TYPE_ROUTER_INTERFACE:*")
-    if not rif_keys_str:
-        return {}
-
-    rif_port_oid_map = {}
-    for rif_s in rif_keys_str:
-        rif_id = rif_s[len("ASIC_STATE:SAI_OBJECT_TYPE_ROUTER_INTERFACE:oid:0x"):]
-        ent = db.get_all('ASIC_DB', rif_s, blocking=True)
-        # TODO: remove the first branch after all SonicV2Connector are migrated to decode_responses
-        if isinstance(db, swsssdk.SonicV2Connector) and db.dbintf.redis_kwargs.get('decode_responses', False) == False:
-            if b"SAI_ROUTER_INTERFACE_ATTR_PORT_ID" in ent:
-                port_id = ent[b"SAI_ROUTER_INTERFACE_ATTR_PORT_ID"].lstrip(b"oid:0x")
-                rif_port_oid_map[rif_id] = port_id
-        else:
-            if "SAI_ROUTER_INTERFACE_ATTR_PORT_ID" in ent:
-                port_id = ent["SAI_ROUTER_INTERFACE_ATTR_PORT_ID"].lstrip("oid:0x")
-                rif_port_oid_map[rif_id] = port_id
-
-    return rif_port_oid_map
+    entries, = _scan_attributes(db.get_redis_client('ASIC_DB'),
+                                [(ROUTER_INTERFACE_KEY_PREFIX, "SAI_ROUTER_INTERFACE_ATTR_PORT_ID")])
+    return _rif_port_map(entries)
 
 def get_vlan_interface_oid_map(db):
     """
@@ -159,25 +246,268 @@ def get_vlan_interface_oid_map(db):
     db.connect('COUNTERS_DB')
     rif_name_map = db.get_all('COUNTERS_DB', 'COUNTERS_RIF_NAME_MAP', blocking=True)
     rif_type_name_map = db.get_all('COUNTERS_DB', 'COUNTERS_RIF_TYPE_MAP', blocking=True)
+    return _vlan_interface_oid_map(rif_name_map, rif_type_name_map)
 
+def _vlan_interface_oid_map(rif_name_map, rif_type_name_map):
     if not rif_name_map or not rif_type_name_map:
         return {}
 
     oid_pfx = len("oid:0x")
     vlan_if_name_map = {}
 
-    # TODO: remove the first branch after all SonicV2Connector are migrated to decode_responses
-    if isinstance(db, swsssdk.SonicV2Connector) and db.dbintf.redis_kwargs.get('decode_responses', False) == False:
-        get_index_func = get_index
-    else:
-        get_index_func = get_index_from_str
-
     for if_name, sai_oid in rif_name_map.items():
         # Check if RIF is l3 vlan interface
         # TODO: remove the first candidate after all SonicV2Connector are migrated to decode_responses
-        if rif_type_name_map[sai_oid] in (b'SAI_ROUTER_INTERFACE_TYPE_VLAN', 'SAI_ROUTER_INTERFACE_TYPE_VLAN'):
+        if rif_type_name_map.get(sai_oid) in (b'SAI_ROUTER_INTERFACE_TYPE_VLAN', 'SAI_ROUTER_INTERFACE_TYPE_VLAN'):
             # Check if interface name is in style understood to be a SONiC interface
-            if get_index_func(if_name):
+            if interface_indexer.get_index(if_name):
                 vlan_if_name_map[sai_oid[oid_pfx:]] = if_name
 
     return vlan_if_name_map
+
+def get_port_maps(db):
+    """
+        Get all the port maps, scanning the bridge ports and router interfaces of ASIC DB in a single pass
+        Returns a PortMaps of the results of get_interface_oid_map, get_bridge_port_map,
+        get_rif_port_map and get_vlan_interface_oid_map
+    """
+    if_name_map, if_id_map = get_interface_oid_map(db)
+    vlan_if_name_map = get_vlan_interface_oid_map(db)
+
+    db.connect('ASIC_DB')
+    br_entries, rif_entries = _scan_attributes(db.get_redis_client('ASIC_DB'),
+                                               [(BRIDGE_PORT_KEY_PREFIX, "SAI_BRIDGE_PORT_ATTR_PORT_ID"),
+                                                (ROUTER_INTERFACE_KEY_PREFIX, "SAI_ROUTER_INTERFACE_ATTR_PORT_ID")])
+    return PortMaps(if_name_map, if_id_map, _bridge_port_map(br_entries), _rif_port_map(rif_entries),
+                    vlan_if_name_map)
+
+class PortMapCache(object):
+    """
+        Port maps of get_port_maps, built once then kept current from the keyspace notifications
+        of the COUNTERS_DB name maps and of the ASIC_DB bridge port and router interface objects.
+        The maps are replaced, never modified, and the version is incremented whenever one changes,
+        so callers only recompute their derived structures when the version they used is outdated.
+
+        Example:
+            cache = PortMapCache(db)
+            while True:
+                if cache.update(timeout=5):
+                    rebuild_oid_tables(cache.maps)
+    """
+    POLL_INTERVAL = 0.1  # seconds, when the databases are on different instances
+    RESYNC_WAIT_TIME = 1  # seconds
+
+    def __init__(self, db):
+        self.db = db
+        self.version = 0
+        self.maps = None
+        self.pubsubs = []
+        self.resync()
+
+    def __subscribe(self):
+        self.close()
+        channels = {}
+        for db_name, patterns in (('COUNTERS_DB', COUNTERS_NAME_MAP_KEYS),
+                                  ('ASIC_DB', (BRIDGE_PORT_KEY_PREFIX + '*', ROUTER_INTERFACE_KEY_PREFIX + '*'))):
+            self.db.connect(db_name)
+            db_id = self.db.get_dbid(db_name)
+            inst_name = swsssdk.SonicDBConfig.get_instancename(db_name, self.db.namespace)
+            inst = channels.setdefault(inst_name, (self.db.get_redis_client(db_name), []))
+            inst[1].extend('__keyspace@{}__:{}'.format(db_id, pattern) for pattern in patterns)
+        for client, patterns in channels.values():
+            pubsub = client.pubsub()
+            pubsub.psubscribe(*patterns)
+            self.pubsubs.append(pubsub)
+
+    def __read_counters_maps(self):
+        pipe = self.db.get_redis_client('COUNTERS_DB').pipeline(transaction=False)
+        for key in COUNTERS_NAME_MAP_KEYS:
+            pipe.hgetall(key)
+        (port_map, lag_map, rif_name_map, rif_type_map) = pipe.execute()
+        if_name_map, if_id_map = _interface_oid_map(port_map, lag_map)
+        return if_name_map, if_id_map, _vlan_interface_oid_map(rif_name_map, rif_type_map)
+
+    def __set_maps(self, maps):
+        if maps != self.maps:
+            self.maps = maps
+            self.version += 1
+            return True
+        return False
+
+    def resync(self):
+        """
+            Subscribe again and rebuild all the maps.
+            Returns True if the maps changed.
+        """
+        # Subscribe before reading so that no change is missed in between
+        self.__subscribe()
+        if_name_map, if_id_map, vlan_if_name_map = self.__read_counters_maps()
+        br_entries, rif_entries = _scan_attributes(self.db.get_redis_client('ASIC_DB'),
+                                                   [(BRIDGE_PORT_KEY_PREFIX, "SAI_BRIDGE_PORT_ATTR_PORT_ID"),
+                                                    (ROUTER_INTERFACE_KEY_PREFIX, "SAI_ROUTER_INTERFACE_ATTR_PORT_ID")])
+        return self.__set_maps(PortMaps(if_name_map, if_id_map, _bridge_port_map(br_entries),
+                                        _rif_port_map(rif_entries), vlan_if_name_map))
+
+    def __get_changed_keys(self, timeout):
+        keys = set()
+        deadline = time.time() + timeout
+        while True:
+            for i, pubsub in enumerate(self.pubsubs):
+                if i == 0 and len(self.pubsubs) == 1:
+                    wait = max(deadline - time.time(), 0)
+                elif i == 0:
+                    wait = max(min(deadline - time.time(), self.POLL_INTERVAL), 0)
+                else:
+                    wait = 0
+                msg = pubsub.get_message(timeout=wait)
+                while msg is not None:
+                    if msg['type'] in ('pmessage', b'pmessage'):
+                        keys.add(msg['channel'].split(':', 1)[1])
+                    msg = pubsub.get_message()
+            if keys or time.time() >= deadline:
+                return keys
+
+    def __apply(self, keys):
+        maps = self.maps
+        if_name_map, if_id_map, vlan_if_name_map = maps.if_name_map, maps.if_id_map, maps.vlan_if_name_map
+        if any(key in COUNTERS_NAME_MAP_KEYS for key in keys):
+            if_name_map, if_id_map, vlan_if_name_map = self.__read_counters_maps()
+
+        objects = [(key, BRIDGE_PORT_KEY_PREFIX, "SAI_BRIDGE_PORT_ATTR_PORT_ID") for key in keys
+                   if key.startswith(BRIDGE_PORT_KEY_PREFIX)]
+        objects.extend((key, ROUTER_INTERFACE_KEY_PREFIX, "SAI_ROUTER_INTERFACE_ATTR_PORT_ID") for key in keys
+                       if key.startswith(ROUTER_INTERFACE_KEY_PREFIX))
+        if_br_oid_map, rif_port_oid_map = maps.if_br_oid_map, maps.rif_port_oid_map
+        if objects:
+            pipe = self.db.get_redis_client('ASIC_DB').pipeline(transaction=False)
+            for key, prefix, attribute in objects:
+                pipe.hget(key, attribute)
+            if_br_oid_map, rif_port_oid_map = dict(if_br_oid_map), dict(rif_port_oid_map)
+            for (key, prefix, attribute), value in zip(objects, pipe.execute()):
+                if prefix == BRIDGE_PORT_KEY_PREFIX:
+                    (changed_map, build) = (if_br_oid_map, _bridge_port_map)
+                else:
+                    (changed_map, build) = (rif_port_oid_map, _rif_port_map)
+                if value is None:
+                    changed_map.pop(key[len(prefix + "oid:0x"):], None)
+                else:
+                    changed_map.update(build([(key, value)]))
+
+        return self.__set_maps(PortMaps(if_name_map, if_id_map, if_br_oid_map, rif_port_oid_map, vlan_if_name_map))
+
+    def update(self, timeout=0):
+        """
+            Apply the changes notified within timeout seconds, or resync after a redis error.
+            Returns True if the maps changed, and so the version.
+        """
+        try:
+            keys = self.__get_changed_keys(timeout)
+            return self.__apply(keys) if keys else False
+        except (RedisError, OSError):
+            swsssdk.logger.warning("Port map notifications lost, resyncing in {}s".format(self.RESYNC_WAIT_TIME))
+            time.sleep(self.RESYNC_WAIT_TIME)
+            return self.resync()
+
+    def close(self):
+        for pubsub in self.pubsubs:
+            pubsub.close()
+        self.pubsubs = []
+
+class VlanResolver(object):
+    """
+        Resolve Bridge Vlan Objects to Vlan Ids, like get_vlan_id_from_bvid, with a direct HGET of the
+        VLAN object and a bounded LRU cache of the results. Cached results are invalidated by the
+        keyspace notifications of the VLAN objects, and the whole cache is dropped when the
+        notifications may have been missed: after a redis error or a reconnection.
+
+        Example:
+            resolver = VlanResolver(db)
+            resolver.populate()
+            vlan_ids = resolver.resolve_many(fdb_entry['bvid'] for fdb_entry in fdb_entries)
+    """
+    CACHE_SIZE = 4096
+
+    def __init__(self, db, cache_size=None):
+        db.connect('ASIC_DB')
+        self.client = db.get_redis_client('ASIC_DB')
+        self.cache_size = self.CACHE_SIZE if cache_size is None else cache_size
+        self.cache = OrderedDict()  # bvid -> vlan id, None if there is no such VLAN object
+        self.pattern = '__keyspace@{}__:{}*'.format(db.get_dbid('ASIC_DB'), VLAN_KEY_PREFIX)
+        self.__subscribe()
+
+    def __subscribe(self):
+        self.subscribed = False
+        self.pubsub = self.client.pubsub()
+        self.pubsub.psubscribe(self.pattern)
+
+    def __invalidate(self):
+        try:
+            msg = self.pubsub.get_message()
+            while msg is not None:
+                if msg['type'] in ('pmessage', b'pmessage'):
+                    key = msg['channel'].split(':', 1)[1]
+                    self.cache.pop(key[len(VLAN_KEY_PREFIX):], None)
+                elif msg['type'] in ('psubscribe', b'psubscribe'):
+                    if self.subscribed:
+                        # Subscribed again by a reconnection, changes may have been missed
+                        self.cache.clear()
+                    self.subscribed = True
+                msg = self.pubsub.get_message()
+        except (RedisError, OSError):
+            swsssdk.logger.warning("VLAN notifications lost, dropping the VLAN cache")
+            self.cache.clear()
+            self.pubsub.close()
+            self.__subscribe()
+
+    def __cache(self, bvid, vlan_id):
+        self.cache[bvid] = vlan_id
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def populate(self):
+        """
+            Cache the Vlan Ids of all the VLAN objects, up to the cache size, with one SCAN.
+        """
+        self.__invalidate()
+        entries, = _scan_attributes(self.client, [(VLAN_KEY_PREFIX, "SAI_VLAN_ATTR_VLAN_ID")])
+        for key, vlan_id in entries[:self.cache_size]:
+            self.__cache(key[len(VLAN_KEY_PREFIX):], vlan_id)
+
+    def resolve(self, bvid):
+        """
+            Get the Vlan Id from Bridge Vlan Object, None if unknown
+        """
+        return self.resolve_many([bvid])[0]
+
+    def resolve_many(self, bvids):
+        """
+            Get the Vlan Ids from Bridge Vlan Objects, reading the ones not cached with pipelined HGETs
+        """
+        self.__invalidate()
+        bvids = list(bvids)
+        cache = self.cache
+        vlan_ids = []
+        missing = []
+        for bvid in bvids:
+            if bvid in cache:
+                # Move to the most recently used end
+                vlan_id = cache.pop(bvid)
+                cache[bvid] = vlan_id
+            else:
+                vlan_id = None
+                missing.append(bvid)
+            vlan_ids.append(vlan_id)
+        if not missing:
+            return vlan_ids
+
+        missing = list(OrderedDict.fromkeys(missing))
+        pipe = self.client.pipeline(transaction=False)
+        for bvid in missing:
+            pipe.hget(VLAN_KEY_PREFIX + bvid, "SAI_VLAN_ATTR_VLAN_ID")
+        read = dict(zip(missing, pipe.execute()))
+        for bvid, vlan_id in read.items():
+            self.__cache(bvid, vlan_id)
+        return [read[bvid] if bvid in read else vlan_id for bvid, vlan_id in zip(bvids, vlan_ids)]
+
+    def close(self):
+        self.pubsub.close()
@@ -0,0 +1,126 @@
+"""
+ConfigDB table schema module
+
+Field types of a table are declared once and compiled into converters between the raw
+Redis hash of an entry and its typed representation. ConfigDBConnector uses them
+transparently for the tables which have a registered schema.
+
+Example:
+    config_db = ConfigDBConnector()
+    config_db.register_schema('PORT', {
+        'alias': 'string',
+        'lanes': 'list',
+        'mtu': 'int',
+        'autoneg': 'bool',
+        })
+    config_db.connect()
+    config_db.get_entry('PORT', 'Ethernet0')
+    # {'alias': 'etp1', 'lanes': ['0', '1'], 'mtu': 9100, 'autoneg': True}
+
+Fields which are not declared in the schema are converted with the generic rules:
+a column key with ending '@' is list-typed and everything else is a string.
+"""
+
+FIELD_TYPES = ('string', 'list', 'int', 'bool')
+
+
+def _split_list(value):
+    return value.split(',')
+
+
+def _join_list(value):
+    return ','.join(value)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value    # Keep malformed data readable rather than failing the whole read
+
+
+def _from_int(value):
+    return str(int(value))
+
+
+def _to_bool(value):
+    return value.lower() == 'true'
+
+
+def _from_bool(value):
+    if isinstance(value, str):
+        value = _to_bool(value)
+    return 'true' if value else 'false'
+
+
+class TableSchema(object):
+    def __init__(self, fields):
+        """
+        Args:
+            fields: field types in a form of dictionary {'column_key': 'string'|'list'|'int'|'bool', ...}
+        """
+        # raw column key -> (column key or None to drop the column, decode function or None)
+        self._decoders = { "NULL": (None, None) }
+        # column key -> (raw column key, encode function)
+        self._encoders = {}
+        for field, field_type in fields.items():
+            if field_type == 'string':
+                self._decoders[field] = (field, None)
+                self._encoders[field] = (field, str)
+            elif field_type == 'list':
+                self._decoders[field + '@'] = (field, _split_list)
+                self._encoders[field] = (field + '@', _join_list)
+            elif field_type == 'int':
+                self._decoders[field] = (field, _to_int)
+                self._encoders[field] = (field, _from_int)
+            elif field_type == 'bool':
+                self._decoders[field] = (field, _to_bool)
+                self._encoders[field] = (field, _from_bool)
+            else:
+                raise ValueError("Unsupported type '{}' for field '{}', expecting one of {}".format(
+                    field_type, field, FIELD_TYPES))
+        self.fields = dict(fields)
+        self.raw_to_typed = self._compile_raw_to_typed()
+        self.typed_to_raw = self._compile_typed_to_raw()
+
+    def _compile_raw_to_typed(self):
+        decoders = self._decoders
+
+        def generic_decoder(raw_key):
+            if raw_key.endswith('@'):
+                return (raw_key[:-1], _split_list)
+            return (raw_key, None)
+
+        def raw_to_typed(raw_data):
+            typed_data = {}
+            for raw_key, value in raw_data.items():
+                decoder = decoders.get(raw_key)
+                if decoder is None:
+                    # Undeclared columns are resolved once and then cached like declared ones
+                    decoder = decoders[raw_key] = generic_decoder(raw_key)
+                key, decode = decoder
+                if key is not None:
+                    typed_data[key] = value if decode is None else decode(value)
+            return typed_data
+
+        return raw_to_typed
+
+    def _compile_typed_to_raw(self):
+        encoders = self._encoders
+
+        def typed_to_raw(typed_data):
+            if not typed_data:
+                return { "NULL": "NULL" }
+            raw_data = {}
+            for key, value in typed_data.items():
+                encoder = encoders.get(key)
+                if encoder is not None:
+                    raw_key, encode = encoder
+                    raw_data[raw_key] = encode(value)
+                elif type(value) is list:
+                    raw_data[key + '@'] = ','.join(value)
+                else:
+                    raw_data[key] = str(value)
+            return raw_data
+
+        return typed_to_raw
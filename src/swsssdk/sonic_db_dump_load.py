@@ -1,27 +1,816 @@
 ## ref: https://github.com/p/redis-dump-load/blob/7bbdb1eaea0a51ed4758d3ce6ca01d497a4e7429/redisdl.py
 
+DUMP_BATCH_SIZE = 1000
+KEY_READ_RETRIES = 10
+LOAD_BATCH_SIZE = 1000
+LOAD_READ_SIZE = 65536
+PROGRESS_INTERVAL = 1.0  # seconds
+
+# Binary snapshot: magic, manifest size, JSON manifest, then one record per key:
+# key size, payload size, TTL in milliseconds (0 without expiration), key, DUMP payload.
+# The records end with a record of key size SNAPSHOT_END whose TTL field is the number of keys.
+SNAPSHOT_MAGIC = b'SWSSDMP1'
+SNAPSHOT_VERSION = 1  # version of the manifest
+SNAPSHOT_HEADER = '<8sI'
+SNAPSHOT_RECORD = '<IIq'
+SNAPSHOT_END = 0xFFFFFFFF
+
+# Item of the keys removed since the previous dump, in incremental dumps
+REMOVED_ITEM = {'type': 'none'}
+
+# KEYS: keys; returns the SHA1 of the type and content of each key, sorted for sets and hashes,
+# false for missing keys and keys of unsupported types. TTLs are not part of the digests.
+DIGEST_SCRIPT = """
+local digests = {}
+for i, key in ipairs(KEYS) do
+    local key_type = redis.call('TYPE', key)['ok']
+    local content = nil
+    if key_type == 'string' then
+        content = {redis.call('GET', key)}
+    elseif key_type == 'list' then
+        content = redis.call('LRANGE', key, 0, -1)
+    elseif key_type == 'set' then
+        content = redis.call('SMEMBERS', key)
+        table.sort(content)
+    elseif key_type == 'zset' then
+        content = redis.call('ZRANGE', key, 0, -1, 'WITHSCORES')
+    elseif key_type == 'hash' then
+        local fieldvalues = redis.call('HGETALL', key)
+        local fields = {}
+        local values = {}
+        for j = 1, #fieldvalues, 2 do
+            table.insert(fields, fieldvalues[j])
+            values[fieldvalues[j]] = fieldvalues[j + 1]
+        end
+        table.sort(fields)
+        content = {}
+        for _, field in ipairs(fields) do
+            table.insert(content, field)
+            table.insert(content, values[field])
+        end
+    end
+    if content then
+        local parts = {key_type}
+        for _, element in ipairs(content) do
+            table.insert(parts, #element .. ':' .. element)
+        end
+        digests[i] = redis.sha1hex(table.concat(parts, ','))
+    else
+        digests[i] = false
+    end
+end
+return digests
+"""
+
+def _client(host='localhost', port=6379, password=None, db=0, unix_socket_path=None, encoding='utf-8'):
+    import redis
+
+    if unix_socket_path is not None:
+        return redis.StrictRedis(unix_socket_path=unix_socket_path, password=password, db=db, encoding=encoding)
+    return redis.StrictRedis(host=host, port=port, password=password, db=db, encoding=encoding)
+
+def _send_read(pipe, key, key_type):
+    if key_type == 'string':
+        pipe.get(key)
+    elif key_type == 'list':
+        pipe.lrange(key, 0, -1)
+    elif key_type == 'set':
+        pipe.smembers(key)
+    elif key_type == 'zset':
+        pipe.zrange(key, 0, -1, False, True)
+    else:
+        pipe.hgetall(key)
+
+def _decode_value(response, key_type, pretty, encoding):
+    """
+    Convert a read value into its redisdl representation.
+    """
+    if key_type == 'string':
+        return response.decode(encoding)
+    elif key_type == 'list':
+        return [v.decode(encoding) for v in response]
+    elif key_type == 'set':
+        value = [v.decode(encoding) for v in response]
+        if pretty:
+            value.sort()
+        return value
+    elif key_type == 'zset':
+        return [(k.decode(encoding), score) for k, score in response]
+    return dict((k.decode(encoding), v.decode(encoding)) for k, v in response.items())
+
+def _decode_ttl(pttl):
+    if pttl is None or pttl < 0:
+        return None
+    return float(pttl) / 1000
+
+def _read_key(client, key, pretty, encoding):
+    """
+    Read one key atomically, retrying while its type changes.
+    :return: (type, ttl, value), None if the key does not exist anymore.
+    """
+    from redis import ResponseError
+
+    for _ in range(KEY_READ_RETRIES):
+        key_type = client.type(key).decode('ascii')
+        if key_type == 'none':
+            return None
+        pipe = client.pipeline(transaction=True)
+        pipe.type(key)
+        pipe.pttl(key)
+        _send_read(pipe, key, key_type)
+        try:
+            (actual_type, pttl, response) = pipe.execute()
+        except ResponseError:
+            continue
+        if actual_type.decode('ascii') == key_type:
+            return (key_type, _decode_ttl(pttl), _decode_value(response, key_type, pretty, encoding))
+    raise RuntimeError('Key {} is being concurrently modified'.format(key))
+
+def _read_batch(client, keys, pretty, encoding):
+    """
+    Read a batch of keys with two pipelined round trips: TYPE, then PTTL and value reads.
+    Keys modified in between are read again one by one.
+    :return: generator of (key, type, ttl, value).
+    """
+    from . import logger
+
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+    types = [key_type.decode('ascii') for key_type in pipe.execute()]
+
+    readers = []
+    for key, key_type in zip(keys, types):
+        if key_type == 'none':
+            # key was deleted by a concurrent operation on the data store
+            continue
+        if key_type not in ('string', 'list', 'set', 'zset', 'hash'):
+            logger.warning("Key {} of unsupported type {} is not dumped".format(key, key_type))
+            continue
+        pipe.type(key)
+        pipe.pttl(key)
+        _send_read(pipe, key, key_type)
+        readers.append((key, key_type))
+    if not readers:
+        return
+    results = pipe.execute(raise_on_error=False)
+
+    for i, (key, key_type) in enumerate(readers):
+        (actual_type, pttl, response) = results[3 * i:3 * i + 3]
+        if isinstance(response, Exception) or isinstance(actual_type, Exception) or \
+                actual_type.decode('ascii') != key_type:
+            item = _read_key(client, key, pretty, encoding)
+            if item is None:
+                continue
+            (key_type, ttl, value) = item
+        else:
+            (ttl, value) = (_decode_ttl(pttl), _decode_value(response, key_type, pretty, encoding))
+        yield (key.decode(encoding), key_type, ttl, value)
+
+def _scan_keys(client, patterns='*', types=None, exclude=None, batch_size=DUMP_BATCH_SIZE):
+    """
+    Scan the keys matching one of patterns and none of the exclude patterns, of one of types.
+    Patterns and types are filtered server-side, with a SCAN per pattern and type using the TYPE
+    option of SCAN, or with pipelined TYPE commands before Redis 6.0. Exclude patterns are applied
+    to each SCAN batch, before any read.
+    :param patterns: glob-style pattern, or list of patterns.
+    :param types: list of key types, None for all the types.
+    :param exclude: list of glob-style patterns.
+    :return: generator of non-empty lists of keys.
+    """
+    import fnmatch
+    import re
+    from redis import ResponseError
+
+    if not isinstance(patterns, (list, tuple)):
+        patterns = [patterns]
+    excluded = None
+    if exclude:
+        excluded = re.compile('|'.join(fnmatch.translate(pattern) for pattern in exclude).encode('utf-8'))
+    scan_types = types or [None]
+    if types:
+        try:
+            client.scan(0, count=1, _type=types[0])
+        except ResponseError:
+            # no TYPE option of SCAN before Redis 6.0
+            scan_types = [None]
+    # keys matching several patterns are returned once
+    seen = set() if len(patterns) > 1 else None
+
+    for pattern in patterns:
+        for scan_type in scan_types:
+            cursor = 0
+            while True:
+                cursor, keys = client.scan(cursor, match=pattern, count=batch_size, _type=scan_type)
+                if excluded is not None:
+                    keys = [key for key in keys if not excluded.match(key)]
+                if seen is not None:
+                    keys = [key for key in keys if key not in seen]
+                    seen.update(keys)
+                if types and scan_type is None and keys:
+                    pipe = client.pipeline(transaction=False)
+                    for key in keys:
+                        pipe.type(key)
+                    keys = [key for key, key_type in zip(keys, pipe.execute())
+                            if key_type.decode('ascii') in types]
+                if keys:
+                    yield keys
+                if cursor == 0:
+                    break
+
+def _scan_items(client, pattern='*', pretty=False, encoding='utf-8', batch_size=DUMP_BATCH_SIZE, types=None,
+                exclude=None):
+    """
+    Read all the selected keys, see _scan_keys, with pipelined reads per SCAN batch.
+    :return: generator of (key, type, ttl, value).
+    """
+    for keys in _scan_keys(client, pattern, types, exclude, batch_size):
+        for item in _read_batch(client, keys, pretty, encoding):
+            yield item
+
+def _scan_changed_items(client, pattern, pretty, encoding, batch_size, types, exclude, previous, current):
+    """
+    Read the selected keys whose content changed, computing the digests of the keys of each
+    SCAN batch server-side with DIGEST_SCRIPT and reading only the keys of a digest not in previous.
+    :param previous: dict of key to digest at the previous dump.
+    :param current: dict filled with the digests of the keys.
+    :return: generator of (key, type, ttl, value).
+    """
+    script = client.register_script(DIGEST_SCRIPT)
+    for batch in _scan_keys(client, pattern, types, exclude, batch_size):
+        changed = {}
+        for key, digest in zip(batch, script(keys=batch)):
+            name = key.decode(encoding)
+            if digest is None or name in current:
+                continue
+            current[name] = digest.decode('ascii')
+            if previous.get(name) != current[name]:
+                changed[name] = key
+        if changed:
+            for item in _read_batch(client, list(changed.values()), pretty, encoding):
+                del changed[item[0]]
+                yield item
+            # keys deleted since their digest was computed
+            for name in changed:
+                del current[name]
+
+def _selection(keys, types, exclude):
+    """
+    :return: JSON representation of the keys selected by a dump.
+    """
+    return {
+        'keys': list(keys) if isinstance(keys, (list, tuple)) else keys,
+        'types': list(types) if types else None,
+        'exclude': list(exclude) if exclude else None,
+    }
+
+def _read_digests(path, selection):
+    """
+    :return: dict of key to digest of the digests file at path, empty if it does not exist.
+    """
+    import json
+    import os.path
+
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        content = json.load(f)
+    for name, value in selection.items():
+        if content.get(name) != value:
+            raise ValueError("Digests file {} is of {} {}, not {}".format(path, name, content.get(name), value))
+    return content['digests']
+
+def _write_digests(path, db, selection, digests):
+    import json
+    import os
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(selection, version=1, db=db, digests=digests), f, separators=(',', ':'))
+    os.rename(tmp_path, path)
+
+class _DumpWriter(object):
+    """
+    Writer of native dumps in the redisdl format, or as JSON lines with one one-key JSON object per line.
+    JSON lines are never indented: pretty only sorts their keys.
+    """
+
+    def __init__(self, fp, pretty=False, jsonl=False):
+        import json
+
+        self.fp = fp
+        self.pretty = pretty
+        self.jsonl = jsonl
+        if pretty and not jsonl:
+            self.encoder = json.JSONEncoder(indent=2, sort_keys=True)
+        else:
+            self.encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=pretty)
+        self.first = True
+        if not jsonl:
+            fp.write(b'{')
+
+    def write(self, key, item):
+        if self.jsonl:
+            self.fp.write(self.encoder.encode({key: item}).encode('utf-8') + b'\n')
+            return
+        if self.first:
+            self.first = False
+        else:
+            self.fp.write(b',')
+        if self.pretty:
+            self.fp.write(b'\n')
+        self.fp.write((self.encoder.encode(key) + ':' + self.encoder.encode(item)).encode('utf-8'))
+
+    def close(self):
+        if not self.jsonl:
+            self.fp.write(b'\n}' if self.pretty else b'}')
+
+def native_dump(fp, host='localhost', port=6379, password=None, db=0, pretty=False,
+                unix_socket_path=None, encoding='utf-8', keys='*', jsonl=False, batch_size=DUMP_BATCH_SIZE,
+                digests=None, types=None, exclude=None):
+    """
+    Dump a database to the binary stream fp in the redisdl format, reading it by batches
+    of keys so that memory use does not depend on the database size.
+    With jsonl, each key is written as a one-key JSON object on its own line instead.
+    :param keys: glob-style pattern of the dumped keys, or list of patterns.
+    :param types: list of the dumped key types, None for all the types.
+    :param exclude: list of glob-style patterns of keys not dumped.
+    :param digests: path of a digests file, to write an incremental dump: only the keys added or
+    changed since the dump which wrote the file, and the keys removed with item REMOVED_ITEM.
+    The file is then updated with the digests of all the keys. redisdl does not load the removed
+    keys: incremental dumps are loaded by native_load, or merged by merge_dumps.
+    """
+    import time
+
+    client = _client(host, port, password, db, unix_socket_path, encoding)
+    writer = _DumpWriter(fp, pretty, jsonl)
+    selection = _selection(keys, types, exclude)
+    if digests is None:
+        items = _scan_items(client, keys, pretty, encoding, batch_size, types, exclude)
+    else:
+        previous = _read_digests(digests, selection)
+        current = {}
+        items = _scan_changed_items(client, keys, pretty, encoding, batch_size, types, exclude, previous, current)
+
+    for key, key_type, ttl, value in items:
+        item = {'type': key_type, 'value': value}
+        if ttl:
+            item['ttl'] = ttl
+            item['expireat'] = time.time() + ttl
+        writer.write(key, item)
+
+    if digests is not None:
+        for key in sorted(set(previous) - set(current)):
+            writer.write(key, REMOVED_ITEM)
+    writer.close()
+    if digests is not None:
+        _write_digests(digests, db, selection, current)
+
+def merge_dumps(fp, inputs, pretty=False, jsonl=False, encoding='utf-8'):
+    """
+    Write to the binary stream fp the full dump reconstructed from a native or redisdl dump and the
+    chain of incremental dumps written after it. The removed keys are dropped, so that the merged
+    dump is loaded by redisdl too.
+    :param inputs: binary streams of the dump, then of the incremental dumps in order.
+    :return: number of keys written
+    """
+    merged = {}
+    for input in inputs:
+        for key, item in _DumpReader(input, encoding):
+            if item['type'] == REMOVED_ITEM['type']:
+                merged.pop(key, None)
+            else:
+                merged[key] = item
+
+    writer = _DumpWriter(fp, pretty, jsonl)
+    for key in sorted(merged):
+        writer.write(key, merged[key])
+    writer.close()
+    return len(merged)
+
+class _Input(object):
+    """
+    Binary input stream read by chunks, gzip compressed or not.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.bytes_read = 0
+        self.decompressor = None
+        self.first_read = True
+
+    def __decompress(self, data):
+        import zlib
+
+        if self.first_read:
+            self.first_read = False
+            if data[:2] == b'\x1f\x8b':
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self.decompressor is None:
+            return data
+        chunks = [self.decompressor.decompress(data)]
+        # Concatenated gzip members
+        while self.decompressor.unused_data:
+            unused_data = self.decompressor.unused_data
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            chunks.append(self.decompressor.decompress(unused_data))
+        return b''.join(chunks)
+
+    def read(self, size=LOAD_READ_SIZE):
+        """
+        Read up to size bytes from the input.
+        :return: the decompressed data, None at the end of the input.
+        """
+        data = self.fp.read(size)
+        if not data:
+            return None
+        if self.first_read:
+            # gzip is detected from the first 2 bytes, which a short read may split
+            while len(data) < 2:
+                more = self.fp.read(size)
+                if not more:
+                    break
+                data += more
+        self.bytes_read += len(data)
+        return self.__decompress(data)
+
+class _DumpReader(object):
+    """
+    Incremental parser of native and redisdl dumps, optionally gzip compressed.
+    The input is parsed as a sequence of JSON objects, so that both a single object (redisdl format)
+    and one object per line (JSON lines) are read, and their members are yielded one at a time.
+    """
+
+    def __init__(self, fp, encoding='utf-8'):
+        import codecs
+        import json
+
+        self.input = _Input(fp)
+        self.json_decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder(encoding)()
+        self.eof = False
+        self.buffer = ''
+        self.pos = 0
+
+    @property
+    def bytes_read(self):
+        return self.input.bytes_read
+
+    def __fill(self, size=LOAD_READ_SIZE):
+        """
+        Read at least size more bytes from the input, unless it ends.
+        :return: False at the end of the input.
+        """
+        if self.eof:
+            return False
+        data = self.input.read(max(size, LOAD_READ_SIZE))
+        if data is None:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(b'', True)
+        else:
+            self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(data)
+        self.pos = 0
+        return True
+
+    def __next_char(self):
+        """
+        Skip whitespace.
+        :return: the next character, None at the end of the input.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.__fill():
+                return None
+
+    def __expect(self, chars):
+        c = self.__next_char()
+        if c is None or c not in chars:
+            raise ValueError("Invalid dump: expected {} at input byte {}, found {!r}".format(
+                ' or '.join(repr(char) for char in chars), self.bytes_read, c))
+        self.pos += 1
+        return c
+
+    def __decode(self):
+        self.__next_char()
+        while True:
+            try:
+                value, self.pos = self.json_decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except ValueError as e:
+                # Incomplete value: read as much again as pending so that parsing stays linear
+                if not self.__fill(len(self.buffer) - self.pos):
+                    raise ValueError("Invalid dump at input byte {}: {}".format(self.bytes_read, e))
+
+    def __iter__(self):
+        while self.__next_char() is not None:
+            self.__expect('{')
+            if self.__next_char() == '}':
+                self.pos += 1
+                continue
+            while True:
+                key = self.__decode()
+                self.__expect(':')
+                yield key, self.__decode()
+                if self.__expect(',}') == '}':
+                    break
+
+def _write_item(pipe, key, item, use_expireat):
+    """
+    Queue the commands restoring a dumped key, like redisdl.
+    """
+    key_type = item['type']
+    pipe.delete(key)
+    if key_type == REMOVED_ITEM['type']:
+        return
+    value = item['value']
+    ttl = item.get('ttl')
+    expireat = item.get('expireat')
+    if key_type == 'string':
+        pipe.set(key, value)
+    elif key_type == 'list':
+        if value:
+            pipe.rpush(key, *value)
+    elif key_type == 'set':
+        if value:
+            pipe.sadd(key, *value)
+    elif key_type == 'zset':
+        if value:
+            pipe.zadd(key, dict((element, score) for element, score in value))
+    elif key_type == 'hash':
+        if value:
+            pipe.hset(key, mapping=value)
+    else:
+        raise ValueError("Unknown key type: {}".format(key_type))
+
+    if use_expireat and expireat is not None:
+        pipe.pexpireat(key, int(expireat * 1000))
+    elif ttl is not None:
+        pipe.pexpire(key, int(ttl * 1000))
+    elif expireat is not None:
+        pipe.pexpireat(key, int(expireat * 1000))
+
+def _empty(client, batch_size=LOAD_BATCH_SIZE):
+    """
+    Delete all the keys with SCAN and UNLINK, the UNLINK of each batch being pipelined with the next SCAN.
+    """
+    cursor = 0
+    keys = []
+    while True:
+        pipe = client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        pipe.scan(cursor, count=batch_size)
+        cursor, keys = pipe.execute()[-1]
+        if cursor == 0:
+            break
+    if keys:
+        client.unlink(*keys)
+
+def native_load(fp, host='localhost', port=6379, password=None, db=0, empty=False, unix_socket_path=None,
+                encoding='utf-8', use_expireat=False, streaming_backend=None, batch_size=LOAD_BATCH_SIZE,
+                multi=False, progress=None):
+    """
+    Load a native or redisdl dump from the binary stream fp, parsing it incrementally and writing
+    the keys with pipelines of batch_size keys, each in a MULTI/EXEC block if multi is set.
+    streaming_backend is accepted for compatibility with redisdl.load, and ignored.
+    :param progress: function called with (keys loaded, bytes read, seconds elapsed) every
+    PROGRESS_INTERVAL and at the end.
+    :return: (keys loaded, bytes read)
+    """
+    import time
+
+    client = _client(host, port, password, db, unix_socket_path, encoding)
+    start = last_report = time.time()
+    if empty:
+        _empty(client, batch_size)
+
+    reader = _DumpReader(fp, encoding)
+    pipe = client.pipeline(transaction=multi)
+    count = 0
+    pending = 0
+    for key, item in reader:
+        _write_item(pipe, key, item, use_expireat)
+        pending += 1
+        if pending >= batch_size:
+            pipe.execute()
+            count += pending
+            pending = 0
+            if progress is not None and time.time() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.time()
+                progress(count, reader.bytes_read, last_report - start)
+    if pending:
+        pipe.execute()
+        count += pending
+    if progress is not None:
+        progress(count, reader.bytes_read, time.time() - start)
+    return (count, reader.bytes_read)
+
+def binary_dump(fp, host='localhost', port=6379, password=None, db=0, unix_socket_path=None, encoding='utf-8',
+                keys='*', batch_size=DUMP_BATCH_SIZE, manifest=None, types=None, exclude=None):
+    """
+    Dump a database to the binary stream fp as a binary snapshot of the DUMP payloads of its keys,
+    read with a pipelined DUMP and PTTL per key and batches of batch_size keys.
+    :param manifest: dict of extra manifest fields, e.g. the database name and namespace.
+    :param keys, types, exclude: selection of the dumped keys, see native_dump.
+    :return: number of keys dumped
+    """
+    import json
+    import struct
+    import time
+
+    client = _client(host, port, password, db, unix_socket_path, encoding)
+    header = dict(manifest or {}, version=SNAPSHOT_VERSION, db=db, created=int(time.time() * 1000))
+    header.update(_selection(keys, types, exclude))
+    header = json.dumps(header, sort_keys=True).encode('utf-8')
+    fp.write(struct.pack(SNAPSHOT_HEADER, SNAPSHOT_MAGIC, len(header)) + header)
+
+    count = 0
+    for batch in _scan_keys(client, keys, types, exclude, batch_size):
+        pipe = client.pipeline(transaction=False)
+        for key in batch:
+            pipe.dump(key)
+            pipe.pttl(key)
+        results = pipe.execute()
+        for i, key in enumerate(batch):
+            (payload, pttl) = results[2 * i:2 * i + 2]
+            if payload is None:
+                # key was deleted by a concurrent operation on the data store
+                continue
+            fp.write(struct.pack(SNAPSHOT_RECORD, len(key), len(payload), max(pttl, 0)) + key + payload)
+            count += 1
+    fp.write(struct.pack(SNAPSHOT_RECORD, SNAPSHOT_END, 0, count))
+    return count
+
+class _SnapshotReader(object):
+    """
+    Reader of the binary snapshots written by binary_dump, optionally gzip compressed.
+    """
+
+    def __init__(self, fp):
+        import json
+        import struct
+
+        self.input = _Input(fp)
+        self.buffer = b''
+        self.pos = 0
+        (magic, size) = struct.unpack(SNAPSHOT_HEADER, self.read(struct.calcsize(SNAPSHOT_HEADER)))
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Invalid snapshot: unknown format {!r}".format(magic))
+        self.manifest = json.loads(self.read(size).decode('utf-8'))
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError("Invalid snapshot: unsupported version {}".format(self.manifest.get('version')))
+
+    @property
+    def bytes_read(self):
+        return self.input.bytes_read
+
+    def read(self, size):
+        """
+        :return: the next size bytes of the snapshot.
+        """
+        while len(self.buffer) - self.pos < size:
+            data = self.input.read(max(size - len(self.buffer) + self.pos, LOAD_READ_SIZE))
+            if data is None:
+                raise ValueError("Invalid snapshot: truncated at input byte {}".format(self.bytes_read))
+            self.buffer = self.buffer[self.pos:] + data
+            self.pos = 0
+        data = self.buffer[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def __iter__(self):
+        """
+        :return: generator of (key, TTL in milliseconds, DUMP payload).
+        """
+        import struct
+
+        record_size = struct.calcsize(SNAPSHOT_RECORD)
+        count = 0
+        while True:
+            (key_size, payload_size, pttl) = struct.unpack(SNAPSHOT_RECORD, self.read(record_size))
+            if key_size == SNAPSHOT_END:
+                if pttl != count:
+                    raise ValueError("Invalid snapshot: {} keys read, {} dumped".format(count, pttl))
+                return
+            yield (self.read(key_size), pttl, self.read(payload_size))
+            count += 1
+
+def binary_load(fp, host='localhost', port=6379, password=None, db=0, empty=False, unix_socket_path=None,
+                encoding='utf-8', use_expireat=False, streaming_backend=None, batch_size=LOAD_BATCH_SIZE,
+                multi=False, progress=None):
+    """
+    Load a binary snapshot written by binary_dump from the binary stream fp, with pipelines of
+    batch_size RESTORE ... REPLACE commands, each in a MULTI/EXEC block if multi is set.
+    The payloads can only be restored by a Redis server of an RDB version at least the dumping one.
+    streaming_backend is accepted for compatibility with native_load, and ignored.
+    :param use_expireat: restore the expiration times of the dump rather than its TTLs, skipping
+    the keys expired since.
+    :param progress: function called with (keys loaded, bytes read, seconds elapsed) every
+    PROGRESS_INTERVAL and at the end.
+    :return: (keys loaded, bytes read, manifest)
+    """
+    import time
+
+    client = _client(host, port, password, db, unix_socket_path, encoding)
+    start = last_report = time.time()
+    if empty:
+        _empty(client, batch_size)
+
+    reader = _SnapshotReader(fp)
+    created = reader.manifest['created']
+    pipe = client.pipeline(transaction=multi)
+    count = 0
+    pending = 0
+    for key, pttl, payload in reader:
+        if use_expireat and pttl:
+            pttl = created + pttl - int(time.time() * 1000)
+            if pttl <= 0:
+                # expired since the dump
+                continue
+        pipe.restore(key, pttl, payload, replace=True)
+        pending += 1
+        if pending >= batch_size:
+            pipe.execute()
+            count += pending
+            pending = 0
+            if progress is not None and time.time() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.time()
+                progress(count, reader.bytes_read, last_report - start)
+    if pending:
+        pipe.execute()
+        count += pending
+    if progress is not None:
+        progress(count, reader.bytes_read, time.time() - start)
+    return (count, reader.bytes_read, reader.manifest)
+
+def _open_output(path, compress):
+    import gzip
+
+    if compress:
+        return gzip.open(path, 'wb')
+    return open(path, 'wb')
+
+def _dump_to_file(job):
+    """
+    Dump one database into a file, in a worker process of the --all mode.
+    :param job: (label, path, compress, engine, kwargs of the dump function of the engine)
+    :return: (label, size of the file, dump duration in seconds)
+    """
+    import os
+    import time
+
+    (label, path, compress, engine, kwargs) = job
+    start = time.time()
+    if engine == 'redisdl':
+        from redisdl import dump
+        with open(path, 'w') as output:
+            dump(output, **kwargs)
+    else:
+        with _open_output(path, compress) as output:
+            (binary_dump if engine == 'binary' else native_dump)(output, **kwargs)
+    return (label, os.path.getsize(path), time.time() - start)
+
 def sonic_db_dump_load():
+    import gzip
+    import multiprocessing
     import optparse
+    import os
     import os.path
     import re
+    import shutil
     import sys
-    from redisdl import dump, load
+    import tarfile
+    import tempfile
+    import time
+    from redisdl import UnknownTypeError, dump, load
     from swsssdk import SonicDBConfig
 
     DUMP = 1
     LOAD = 2
+    KEY_TYPES = ['string', 'list', 'set', 'zset', 'hash']
 
-    def options_to_kwargs(options):
+    def options_to_kwargs(options, dbname=None, namespace=None):
         args = {}
+        if dbname is None and hasattr(options, 'dbname'):
+            dbname = options.dbname
         if options.password:
             args['password'] = options.password
         if options.encoding:
             args['encoding'] = options.encoding
         # dump only
-        if hasattr(options, 'pretty') and options.pretty:
+        if hasattr(options, 'pretty') and options.pretty and options.engine != 'binary':
             args['pretty'] = True
-        if hasattr(options, 'keys') and options.keys:
-            args['keys'] = options.keys
+        if hasattr(options, 'keys') and (options.keys or options.tables):
+            patterns = list(options.keys or [])
+            for table in options.tables or []:
+                # separator of the database, or both separators for the default database
+                separators = [SonicDBConfig.get_separator(dbname, namespace)] if dbname else ['|', ':']
+                patterns.extend(table + separator + '*' for separator in separators)
+            # redisdl dumps a single pattern
+            args['keys'] = patterns[0] if options.engine == 'redisdl' else patterns
         # load only
         if hasattr(options, 'use_expireat') and options.use_expireat:
             args['use_expireat'] = True
@@ -29,42 +818,175 @@ def sonic_db_dump_load():
             args['empty'] = True
         if hasattr(options, 'backend') and options.backend:
             args['streaming_backend'] = options.backend
-        if hasattr(options, 'dbname') and options.dbname:
+        # native and binary engines only
+        if getattr(options, 'engine', None) in ('native', 'binary'):
+            if hasattr(options, 'jsonl') and options.jsonl and options.engine == 'native':
+                args['jsonl'] = True
+            if options.batch_size:
+                args['batch_size'] = options.batch_size
+            if hasattr(options, 'multi') and options.multi:
+                args['multi'] = True
+            if hasattr(options, 'types') and options.types:
+                args['types'] = options.types
+            if hasattr(options, 'exclude') and options.exclude:
+                args['exclude'] = options.exclude
+        if dbname:
             if options.conntype == 'tcp':
-                args['host'] = SonicDBConfig.get_hostname(options.dbname)
-                args['port'] = SonicDBConfig.get_port(options.dbname)
-                args['db'] = SonicDBConfig.get_dbid(options.dbname)
+                args['host'] = SonicDBConfig.get_hostname(dbname, namespace)
+                args['port'] = SonicDBConfig.get_port(dbname, namespace)
+                args['db'] = SonicDBConfig.get_dbid(dbname, namespace)
                 args['unix_socket_path'] = None
             elif options.conntype == "unix_socket":
                 args['host'] = None
                 args['port'] = None
-                args['db'] = SonicDBConfig.get_dbid(options.dbname)
-                args['unix_socket_path'] = SonicDBConfig.get_socket(options.dbname)
+                args['db'] = SonicDBConfig.get_dbid(dbname, namespace)
+                args['unix_socket_path'] = SonicDBConfig.get_socket(dbname, namespace)
             else:
                 raise TypeError('redis connection type is tcp or unix_socket')
 
         return args
 
-    def do_dump(options):
+    def open_dump_output(options):
+        """
+        :return: (binary output stream of the native engine, whether it is to be closed)
+        """
+        compress = options.gzip or bool(options.output and options.output.endswith('.gz'))
         if options.output:
-            output = open(options.output, 'w')
-        else:
-            output = sys.stdout
+            return (_open_output(options.output, compress), True)
+        # Python 3 binary stdout, or Python 2 stdout
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+        if compress:
+            return (gzip.GzipFile(fileobj=output, mode='wb'), True)
+        return (output, False)
 
+    def do_dump(options):
         kwargs = options_to_kwargs(options)
-        dump(output, **kwargs)
+        if options.digests:
+            kwargs['digests'] = options.digests
+        if options.engine == 'redisdl':
+            if options.output:
+                output = open(options.output, 'w')
+            else:
+                output = sys.stdout
+            dump(output, **kwargs)
+            if options.output:
+                output.close()
+            return
 
-        if options.output:
+        (output, close) = open_dump_output(options)
+        if options.engine == 'binary':
+            binary_dump(output, manifest={'dbname': options.dbname, 'namespace': ''}, **kwargs)
+        else:
+            native_dump(output, **kwargs)
+        if close:
+            output.close()
+
+    def do_merge(options, args):
+        """
+        Write the full dump reconstructed from the dump and incremental dumps given as arguments.
+        """
+        inputs = [open(path, 'rb') for path in args]
+        (output, close) = open_dump_output(options)
+        merge_dumps(output, inputs, pretty=options.pretty, jsonl=options.jsonl, encoding=options.encoding)
+        if close:
             output.close()
+        for input in inputs:
+            input.close()
+
+    def do_dump_all(options):
+        """
+        Dump all the databases concurrently, one file per database, into the output directory
+        or into a tar archive if the output name ends with .tar, .tar.gz or .tgz.
+        """
+        if options.all_namespaces:
+            SonicDBConfig.load_sonic_global_db_config()
+            namespaces = sorted(SonicDBConfig.get_ns_list())
+        else:
+            namespaces = ['']
+
+        archive = re.search(r'\.(tar|tar\.gz|tgz)$', options.output)
+        if archive:
+            directory = tempfile.mkdtemp()
+        else:
+            directory = options.output
+
+        try:
+            jobs = []
+            for namespace in namespaces:
+                ns_directory = os.path.join(directory, namespace) if namespace else directory
+                if not os.path.isdir(ns_directory):
+                    os.makedirs(ns_directory)
+                for dbname in SonicDBConfig.get_dblist(namespace):
+                    label = '{}/{}'.format(namespace, dbname) if namespace else dbname
+                    kwargs = options_to_kwargs(options, dbname, namespace)
+                    if options.engine == 'redisdl':
+                        path = os.path.join(ns_directory, dbname + '.json')
+                        jobs.append((label, path, False, options.engine, kwargs))
+                        continue
+                    if options.engine == 'binary':
+                        kwargs['manifest'] = {'dbname': dbname, 'namespace': namespace}
+                        path = os.path.join(ns_directory, dbname + '.snap')
+                    else:
+                        path = os.path.join(ns_directory, dbname + ('.jsonl' if options.jsonl else '.json'))
+                        if options.digests:
+                            digests_directory = os.path.join(options.digests, namespace)
+                            if not os.path.isdir(digests_directory):
+                                os.makedirs(digests_directory)
+                            kwargs['digests'] = os.path.join(digests_directory, dbname + '.digests')
+                    if options.gzip:
+                        path += '.gz'
+                    jobs.append((label, path, options.gzip, options.engine, kwargs))
+
+            start = time.time()
+            # multiprocessing.Pool(0) raises ValueError when there is no database to dump
+            if jobs:
+                pool = multiprocessing.Pool(min(len(jobs), options.jobs or multiprocessing.cpu_count()))
+                try:
+                    for (label, size, duration) in pool.imap_unordered(_dump_to_file, jobs):
+                        print("{}: {} bytes in {:.3f}s".format(label, size, duration))
+                finally:
+                    pool.close()
+                    pool.join()
+
+            if archive:
+                mode = 'w' if archive.group(1) == 'tar' else 'w:gz'
+                with tarfile.open(options.output, mode) as tar:
+                    for name in sorted(os.listdir(directory)):
+                        tar.add(os.path.join(directory, name), arcname=name)
+        finally:
+            if archive:
+                # the staging directory of the archive
+                shutil.rmtree(directory)
+        print("{} databases dumped to {} in {:.3f}s".format(len(jobs), options.output, time.time() - start))
+
+    def print_progress(keys, size, duration):
+        duration = max(duration, 1e-6)
+        sys.stderr.write("{} keys, {} bytes in {:.3f}s: {:.0f} keys/s, {:.0f} bytes/s\n".format(
+            keys, size, duration, keys / duration, size / duration))
 
     def do_load(options, args):
         if len(args) > 0:
             input = open(args[0], 'rb')
-        else:
+        elif options.engine == 'redisdl':
             input = sys.stdin
+        else:
+            # Python 3 binary stdin, or Python 2 stdin
+            input = getattr(sys.stdin, 'buffer', sys.stdin)
 
         kwargs = options_to_kwargs(options)
-        load(input, **kwargs)
+        if options.engine == 'redisdl':
+            try:
+                load(input, **kwargs)
+            except (KeyError, UnknownTypeError) as e:
+                # Items without value or of type none: the removed keys of an incremental dump
+                sys.stderr.write("Error: invalid item for redisdl ({!r}), load incremental dumps with --engine native\n".format(e))
+                exit(4)
+        elif options.engine == 'binary':
+            (_, _, manifest) = binary_load(input, progress=print_progress if options.progress else None, **kwargs)
+            if options.dbname and manifest.get('dbname') and manifest['dbname'] != options.dbname:
+                sys.stderr.write("Warning: snapshot of {} loaded into {}\n".format(manifest['dbname'], options.dbname))
+        else:
+            native_load(input, progress=print_progress if options.progress else None, **kwargs)
 
         if len(args) > 0:
             input.close()
@@ -83,15 +1005,34 @@ def sonic_db_dump_load():
     if help == LOAD:
         usage = "Usage: %prog [options] [FILE]"
         usage += "\n\nLoad data from FILE (which must be a JSON dump previously created"
-        usage += "\nby redisdl) into specified or default redis."
+        usage += "\nby sonic-db-dump or redisdl, optionally as JSON lines or gzip compressed"
+        usage += "\nwith the native engine, or a binary snapshot with the binary engine) into specified"
+        usage += "\nor default redis."
+        usage += "\n\nThe native (--engine native) and binary (--engine binary) engines load the keys"
+        usage += "\nwith pipelines of --batch-size keys. Incremental dumps, written with --digests, are"
+        usage += "\nloaded with the native engine only."
         usage += "\n\nIf FILE is omitted standard input is read."
     elif help == DUMP:
         usage = "Usage: %prog [options]"
+        usage += "\n       %prog --merge [options] FILE..."
         usage += "\n\nDump data from specified or default redis."
         usage += "\n\nIf no output file is specified, dump to standard output."
+        usage += "\n\nThe native engine (--engine native) streams the dump, optionally as JSON lines (--jsonl)"
+        usage += "\nand gzip compressed. Its keys are selected while scanning the database with --keys,"
+        usage += "\n--table, --type and --exclude."
+        usage += "\n\nThe binary engine (--engine binary) writes a snapshot of the DUMP payloads of the keys,"
+        usage += "\nrestored with the binary engine of sonic-db-load by a Redis server of the same or a newer"
+        usage += "\nversion."
+        usage += "\n\nWith --all, OUTPUT is a directory receiving one DBNAME.json file per database,"
+        usage += "\nor a .tar, .tar.gz or .tgz archive of them."
+        usage += "\n\nWith --digests and the native engine, only the keys changed since the previous dump with"
+        usage += "\nthe same DIGESTS are written. --merge writes the full dump reconstructed from the FILE"
+        usage += "\narguments: a dump, then the incremental dumps written after it in order. Incremental"
+        usage += "\ndumps are loaded with the native engine of sonic-db-load, merged dumps with any engine."
     else:
         usage = "Usage: %prog [options]"
         usage += "\n       %prog -l [options] [FILE]"
+        usage += "\n       %prog --merge [options] FILE..."
         usage += "\n\nDump data from redis or load data into redis."
         usage += "\n\nIf input or output file is specified, dump to standard output and load"
         usage += "\nfrom standard input."
@@ -100,10 +1041,22 @@ def sonic_db_dump_load():
     if help == DUMP:
         parser.add_option('-n', '--dbname', help='dump DATABASE (APPL_DB/ASIC_DB...)')
         parser.add_option('-t', '--conntype', help='indicate redis connection type (tcp[default] or unix_socket)', default='tcp')
-        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern')
+        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern, may be repeated with the native and binary engines', action='append')
+        parser.add_option('-T', '--table', help='dump only the keys of TABLE, may be repeated (native and binary engines only)', dest='tables', action='append')
+        parser.add_option('--type', help='dump only keys of TYPE, may be repeated (native and binary engines only)', dest='types', action='append', choices=KEY_TYPES)
+        parser.add_option('-x', '--exclude', help='do not dump keys matching specified glob-style pattern, may be repeated (native and binary engines only)', action='append')
         parser.add_option('-o', '--output', help='write to OUTPUT instead of stdout')
-        parser.add_option('-y', '--pretty', help='split output on multiple lines and indent it', action='store_true')
+        parser.add_option('-y', '--pretty', help='split output on multiple lines and indent it, or sort the keys of the JSON lines of --jsonl', action='store_true')
         parser.add_option('-E', '--encoding', help='set encoding to use while decoding data from redis', default='utf-8')
+        parser.add_option('-a', '--all', help='dump all the databases concurrently into OUTPUT', action='store_true')
+        parser.add_option('-N', '--all-namespaces', help='with --all, dump the databases of all the namespaces', action='store_true')
+        parser.add_option('-j', '--jobs', help='with --all, number of databases dumped at the same time (default: number of CPUs)', type='int')
+        parser.add_option('-J', '--jsonl', help='write one JSON object per key and line (native engine only)', action='store_true')
+        parser.add_option('-z', '--gzip', help='compress the output with gzip, implied by an OUTPUT ending with .gz (native and binary engines only)', action='store_true')
+        parser.add_option('-b', '--batch-size', help='number of keys read per round trip (native and binary engines only, default: {})'.format(DUMP_BATCH_SIZE), type='int')
+        parser.add_option('-D', '--digests', help='write an incremental dump from the key digests of the previous dump in DIGESTS, and update it; with --all, a directory of DBNAME.digests files (native engine only)')
+        parser.add_option('-m', '--merge', help='write the full dump reconstructed from a dump and its incremental dumps', action='store_true')
+        parser.add_option('--engine', help='dump with redisdl (default), the native engine or as a binary snapshot', choices=['native', 'binary', 'redisdl'], default='redisdl')
     elif help == LOAD:
         parser.add_option('-n', '--dbname', help='dump DATABASE (APPL_DB/ASIC_DB...)')
         parser.add_option('-t', '--conntype', help='indicate redis connection type (tcp[default] or unix_socket)', default='tcp')
@@ -111,29 +1064,63 @@ def sonic_db_dump_load():
         parser.add_option('-E', '--encoding', help='set encoding to use while encoding data to redis', default='utf-8')
         parser.add_option('-B', '--backend', help='use specified streaming backend')
         parser.add_option('-A', '--use-expireat', help='use EXPIREAT rather than TTL/EXPIRE', action='store_true')
+        parser.add_option('-b', '--batch-size', help='number of keys written per round trip (native and binary engines only, default: {})'.format(LOAD_BATCH_SIZE), type='int')
+        parser.add_option('-M', '--multi', help='write each batch in a MULTI/EXEC transaction (native and binary engines only)', action='store_true')
+        parser.add_option('-P', '--progress', help='print the keys/s and bytes/s progress on stderr (native and binary engines only)', action='store_true')
+        parser.add_option('--engine', help='load with redisdl (default), the native engine or a binary snapshot', choices=['native', 'binary', 'redisdl'], default='redisdl')
     else:
         parser.add_option('-l', '--load', help='load data into redis (default is to dump data from redis)', action='store_true')
         parser.add_option('-n', '--dbname', help='dump DATABASE (APPL_DB/ASIC_DB/COUNTERS_DB/LOGLEVEL_DB/CONFIG_DB...)')
         parser.add_option('-t', '--conntype', help='indicate redis connection type (tcp[default] or unix_socket)', default='tcp')
-        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern')
+        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern, may be repeated with the native and binary engines (dump mode only)', action='append')
+        parser.add_option('-T', '--table', help='dump only the keys of TABLE, may be repeated (dump mode, native and binary engines only)', dest='tables', action='append')
+        parser.add_option('--type', help='dump only keys of TYPE, may be repeated (dump mode, native and binary engines only)', dest='types', action='append', choices=KEY_TYPES)
+        parser.add_option('-x', '--exclude', help='do not dump keys matching specified glob-style pattern, may be repeated (dump mode, native and binary engines only)', action='append')
         parser.add_option('-o', '--output', help='write to OUTPUT instead of stdout (dump mode only)')
-        parser.add_option('-y', '--pretty', help='split output on multiple lines and indent it (dump mode only)', action='store_true')
+        parser.add_option('-y', '--pretty', help='split output on multiple lines and indent it, or sort the keys of the JSON lines of --jsonl (dump mode only)', action='store_true')
         parser.add_option('-e', '--empty', help='delete all keys in destination db prior to loading (load mode only)', action='store_true')
         parser.add_option('-E', '--encoding', help='set encoding to use while decoding data from redis', default='utf-8')
         parser.add_option('-A', '--use-expireat', help='use EXPIREAT rather than TTL/EXPIRE', action='store_true')
         parser.add_option('-B', '--backend', help='use specified streaming backend (load mode only)')
+        parser.add_option('-a', '--all', help='dump all the databases concurrently into OUTPUT (dump mode only)', action='store_true')
+        parser.add_option('-N', '--all-namespaces', help='with --all, dump the databases of all the namespaces (dump mode only)', action='store_true')
+        parser.add_option('-j', '--jobs', help='with --all, number of databases dumped at the same time (dump mode only)', type='int')
+        parser.add_option('-J', '--jsonl', help='write one JSON object per key and line (dump mode, native engine only)', action='store_true')
+        parser.add_option('-z', '--gzip', help='compress the output with gzip, implied by an OUTPUT ending with .gz (dump mode, native and binary engines only)', action='store_true')
+        parser.add_option('-b', '--batch-size', help='number of keys read or written per round trip (native and binary engines only)', type='int')
+        parser.add_option('-M', '--multi', help='write each batch in a MULTI/EXEC transaction (load mode, native and binary engines only)', action='store_true')
+        parser.add_option('-P', '--progress', help='print the keys/s and bytes/s progress on stderr (load mode, native and binary engines only)', action='store_true')
+        parser.add_option('-D', '--digests', help='write an incremental dump from the key digests of the previous dump in DIGESTS, and update it; with --all, a directory of DBNAME.digests files (dump mode, native engine only)')
+        parser.add_option('-m', '--merge', help='write the full dump reconstructed from a dump and its incremental dumps (dump mode only)', action='store_true')
+        parser.add_option('--engine', help='dump or load with redisdl (default), the native engine or as a binary snapshot', choices=['native', 'binary', 'redisdl'], default='redisdl')
     options, args = parser.parse_args()
 
     if hasattr(options, 'load') and options.load:
         action = LOAD
 
     if action == DUMP:
-        if len(args) > 0:
+        if options.merge:
+            if len(args) == 0 or options.all:
+                parser.print_help()
+                exit(4)
+            do_merge(options, args)
+            return
+        if len(args) > 0 or (options.digests and options.engine != 'native'):
             parser.print_help()
             exit(4)
-        do_dump(options)
+        if options.engine == 'redisdl' and (len(options.keys or []) > 1 or options.tables or options.types or options.exclude or
+                                            options.jsonl or options.gzip or options.batch_size):
+            parser.print_help()
+            exit(4)
+        if options.all:
+            if not options.output or options.dbname:
+                parser.print_help()
+                exit(4)
+            do_dump_all(options)
+        else:
+            do_dump(options)
     else:
-        if len(args) > 1:
+        if len(args) > 1 or (options.engine == 'redisdl' and (options.batch_size or options.multi or options.progress)):
             parser.print_help()
             exit(4)
         do_load(options, args)
@@ -0,0 +1,190 @@
+"""
+Producer/consumer state tables compatible with swss-common
+
+A producer does not write the table itself: it stages the entry fields in a temporary
+'_<table><sep><key>' hash, adds the key to the '<table>_KEY_SET' set (and to the
+'<table>_DEL_SET' set for a deletion) and notifies the '<table>_CHANNEL' channel. A consumer
+pops batches of keys from the key set with a Lua script which applies the staged changes to
+the table and returns them, so it can be the swss-common C++ implementation (e.g. orchagent)
+on either side.
+
+Example:
+    db = SonicV2Connector()
+    db.connect(db.APPL_DB)
+    producer = ProducerStateTable(db, db.APPL_DB, 'PORT_TABLE', buffered=True)
+    for port, speed in speeds:
+        producer.set(port, {'speed': speed})
+    producer.flush()
+
+    consumer = ConsumerStateTable(db, db.APPL_DB, 'PORT_TABLE')
+    while True:
+        entries = consumer.pops()
+        if not entries:
+            consumer.wait(timeout=1)
+        for key, op, fvs in entries:
+            print(key, op, fvs)
+"""
+
+SET_COMMAND = 'SET'
+DEL_COMMAND = 'DEL'
+
+STATE_PREFIX = '_'
+KEY_SET_SUFFIX = '_KEY_SET'
+DEL_SET_SUFFIX = '_DEL_SET'
+CHANNEL_SUFFIX = '_CHANNEL'
+
+# KEYS: channel, key set, staging hash; ARGV: notification, key, field/value pairs
+PRODUCER_SET_SCRIPT = """
+local added = redis.call('SADD', KEYS[2], ARGV[2])
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[3], ARGV[i], ARGV[i + 1])
+end
+if added > 0 then
+    redis.call('PUBLISH', KEYS[1], ARGV[1])
+end
+"""
+
+# KEYS: channel, key set, staging hash, del set; ARGV: notification, key
+PRODUCER_DEL_SCRIPT = """
+local added = redis.call('SADD', KEYS[2], ARGV[2])
+redis.call('SADD', KEYS[4], ARGV[2])
+redis.call('DEL', KEYS[3])
+if added > 0 then
+    redis.call('PUBLISH', KEYS[1], ARGV[1])
+end
+"""
+
+# KEYS: key set, table prefix, del set; ARGV: pop batch size, staging prefix
+CONSUMER_POPS_SCRIPT = """
+local ret = {}
+local tablename = KEYS[2]
+local stateprefix = ARGV[2]
+local keys = redis.call('SPOP', KEYS[1], ARGV[1])
+for _, key in ipairs(keys) do
+    -- A requested deletion clears the table entry before the staged fields are applied
+    if redis.call('SREM', KEYS[3], key) == 1 then
+        redis.call('DEL', tablename .. key)
+    end
+    local fieldvalues = redis.call('HGETALL', stateprefix .. tablename .. key)
+    table.insert(ret, {key, fieldvalues})
+    for i = 1, #fieldvalues, 2 do
+        redis.call('HSET', tablename .. key, fieldvalues[i], fieldvalues[i + 1])
+    end
+    redis.call('DEL', stateprefix .. tablename .. key)
+end
+return ret
+"""
+
+
+class _StateTable(object):
+    def __init__(self, connector, db_name, table_name):
+        self.connector = connector
+        self.db_name = db_name
+        self.table_name = table_name
+        self.client = connector.get_redis_client(db_name)
+        separator = connector.get_db_separator(db_name)
+        self.table_prefix = table_name + separator
+        self.key_set = table_name + KEY_SET_SUFFIX
+        self.del_set = table_name + DEL_SET_SUFFIX
+        self.channel = table_name + CHANNEL_SUFFIX
+
+    def staging_key(self, key):
+        return STATE_PREFIX + self.table_prefix + key
+
+
+class ProducerStateTable(_StateTable):
+    BATCH_SIZE = 128
+
+    def __init__(self, connector, db_name, table_name, buffered=False, batch_size=None):
+        """
+        :param connector: SonicV2Connector connected to %db_name.
+        :param buffered: if ``True``, operations are sent in pipelines of %batch_size
+        operations, or on flush().
+        """
+        super(ProducerStateTable, self).__init__(connector, db_name, table_name)
+        self.buffered = buffered
+        self.batch_size = self.BATCH_SIZE if batch_size is None else batch_size
+        self.set_script = self.client.register_script(PRODUCER_SET_SCRIPT)
+        self.del_script = self.client.register_script(PRODUCER_DEL_SCRIPT)
+        self.pipe = self.client.pipeline(transaction=False)
+        self.pending = 0
+
+    def __run(self, script, keys, args):
+        if not self.buffered:
+            return script(keys=keys, args=args)
+        script(keys=keys, args=args, client=self.pipe)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def set(self, key, values):
+        """
+        Produce the write of fields to entry %key.
+        :param values: dict of field to value, or list of (field, value) pairs.
+        """
+        if isinstance(values, dict):
+            values = values.items()
+        args = ['G', key]
+        for field, value in values:
+            args.extend((field, value))
+        self.__run(self.set_script, [self.channel, self.key_set, self.staging_key(key)], args)
+
+    def delete(self, key):
+        """
+        Produce the deletion of entry %key.
+        """
+        self.__run(self.del_script, [self.channel, self.key_set, self.staging_key(key), self.del_set], ['G', key])
+
+    def flush(self):
+        """
+        Send the buffered operations.
+        """
+        if self.pending:
+            self.pipe.execute()
+            self.pending = 0
+
+
+class ConsumerStateTable(_StateTable):
+    POP_BATCH_SIZE = 128
+
+    def __init__(self, connector, db_name, table_name, pop_batch_size=None):
+        """
+        :param connector: SonicV2Connector connected to %db_name.
+        :param pop_batch_size: maximum number of entries returned by pops().
+        """
+        super(ConsumerStateTable, self).__init__(connector, db_name, table_name)
+        self.pop_batch_size = self.POP_BATCH_SIZE if pop_batch_size is None else pop_batch_size
+        self.pops_script = self.client.register_script(CONSUMER_POPS_SCRIPT)
+        self.pubsub = self.client.pubsub()
+        self.pubsub.subscribe(self.channel)
+
+    def pops(self):
+        """
+        Pop a batch of produced entries and apply them to the table.
+        :return: list of (key, op, fvs) with op SET_COMMAND or DEL_COMMAND and fvs the list of
+        (field, value) pairs written.
+        """
+        result = self.pops_script(keys=[self.key_set, self.table_prefix, self.del_set],
+                                  args=[self.pop_batch_size, STATE_PREFIX])
+        entries = []
+        for key, fieldvalues in result:
+            fvs = list(zip(fieldvalues[::2], fieldvalues[1::2]))
+            entries.append((key, SET_COMMAND if fvs else DEL_COMMAND, fvs))
+        return entries
+
+    def wait(self, timeout=None):
+        """
+        Wait for a producer notification.
+        :param timeout: seconds to wait, ``None`` to wait forever.
+        :return: ``True`` if notified, ``False`` on timeout.
+        """
+        notified = False
+        msg = self.pubsub.get_message(timeout=timeout)
+        while msg is not None:
+            if msg['type'] in ('message', b'message'):
+                notified = True
+            msg = self.pubsub.get_message()
+        return notified
+
+    def close(self):
+        self.pubsub.close()
@@ -0,0 +1,258 @@
+"""
+Write-coalescing buffered writers
+
+Writes are buffered per key and field, so that repeated writes to the same field only
+send the last value, and flushed with one pipeline per database when the number of pending
+writes reaches max_pending, when the oldest pending write is older than max_delay seconds
+(checked on each write and by flush_if_due) or on explicit flush().
+
+Example:
+    db = SonicV2Connector()
+    db.connect(db.STATE_DB)
+    with BufferedWriter(db) as writer:
+        for port, status in link_states:
+            writer.set(db.STATE_DB, 'PORT_TABLE|' + port, 'netdev_oper_status', status)
+    print(writer.stats)
+
+    config_db = ConfigDBConnector()
+    config_db.connect()
+    writer = ConfigDBBufferedWriter(config_db, max_pending=500)
+    writer.mod_entry('PORT', 'Ethernet0', {'admin_status': 'up'})
+    writer.flush()
+"""
+import time
+
+
+def _text(field):
+    return field.decode('utf-8') if isinstance(field, bytes) and not isinstance(field, str) else field
+
+
+class BufferedWriter(object):
+    """
+    Buffered writer of SonicV2Connector hashes. The thresholds are only checked when writing and
+    by flush_if_due(): the writer has no timer, so a caller which may stop writing has to call
+    flush_if_due() periodically, e.g. from its event loop, or flush() when idle, for its last
+    writes to be sent within max_delay.
+    """
+    MAX_PENDING = 1000
+    MAX_DELAY = 0.1  # seconds
+
+    def __init__(self, connector, max_pending=None, max_delay=None):
+        """
+        :param connector: SonicV2Connector connected to the databases to write.
+        :param max_pending: number of pending field writes and deletions triggering a flush.
+        :param max_delay: age in seconds of the oldest pending write triggering a flush, checked
+        on the next write or flush_if_due() call.
+        """
+        self.connector = connector
+        self.max_pending = self.MAX_PENDING if max_pending is None else max_pending
+        self.max_delay = self.MAX_DELAY if max_delay is None else max_delay
+        # db_name -> key -> [deleted, {field: value}]
+        self.pending = {}
+        self.pending_count = 0
+        self.first_pending_time = None
+        self.stats = {
+            'writes': 0,                # write calls received
+            'coalesced': 0,             # writes superseded before being flushed
+            'flushes': 0,
+            'commands': 0,              # commands sent over all flushes
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_latency': 0.0,  # seconds
+            'max_flush_latency': 0.0,
+            'total_flush_latency': 0.0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+    def __entry(self, db_name, key):
+        entries = self.pending.setdefault(db_name, {})
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = [False, {}]
+            if self.first_pending_time is None:
+                self.first_pending_time = time.time()
+        return entry
+
+    def __written(self, count):
+        self.stats['writes'] += 1
+        self.pending_count += count
+        self.flush_if_due()
+
+    def set(self, db_name, _hash, key, val):
+        """
+        Buffer the write of %(key, val) to Hashtable %hash in DB %db_name
+        """
+        fields = self.__entry(db_name, _hash)[1]
+        if key in fields:
+            self.stats['coalesced'] += 1
+            count = 0
+        else:
+            count = 1
+        fields[key] = val
+        self.__written(count)
+
+    def set_all(self, db_name, _hash, values):
+        """
+        Buffer the write of all the (key, val) of dict %values to Hashtable %hash in DB %db_name
+        """
+        fields = self.__entry(db_name, _hash)[1]
+        count = 0
+        for key, val in values.items():
+            if key in fields:
+                self.stats['coalesced'] += 1
+            else:
+                count += 1
+            fields[key] = val
+        self.__written(count)
+
+    def delete(self, db_name, key):
+        """
+        Buffer the deletion of %key from DB %db_name. Pending writes to %key are dropped.
+        """
+        self.replace(db_name, key, {})
+
+    def replace(self, db_name, key, values):
+        """
+        Buffer the replacement of Hashtable %key in DB %db_name by the (key, val) of dict %values:
+        the values are written, then the other fields are deleted in the same MULTI/EXEC block, so that
+        the key does not transiently disappear. The key is deleted if %values is empty.
+        Pending writes to %key are dropped.
+        """
+        entry = self.__entry(db_name, key)
+        superseded = len(entry[1]) + (1 if entry[0] else 0)
+        self.stats['coalesced'] += superseded
+        self.pending_count -= superseded
+        entry[0] = True
+        entry[1] = dict(values)
+        self.__written(1 + len(values))
+
+    def flush_if_due(self):
+        """
+        Flush if a size or time threshold is reached.
+        :return: True if a flush was done.
+        """
+        if self.pending_count >= self.max_pending or \
+                (self.first_pending_time is not None and time.time() - self.first_pending_time >= self.max_delay):
+            self.flush()
+            return True
+        return False
+
+    def _write_key(self, pipe, db_name, key, deleted, fields, stale):
+        """
+        Queue the pending writes of a key into the pipeline.
+        :param stale: fields of a replaced key to delete.
+        :return: number of queued commands.
+        """
+        count = 0
+        if deleted and not fields:
+            pipe.delete(key)
+            count += 1
+        if fields:
+            pipe.hmset(key, fields)
+            count += 1
+        if stale:
+            pipe.hdel(key, *stale)
+            count += 1
+        return count
+
+    def __stale_fields(self, client, entries):
+        """
+        Read the fields of the replaced keys with one pipeline.
+        :return: dict of replaced key to the list of its fields not written by the replacement.
+        """
+        replaced = [key for key, (deleted, fields) in entries.items() if deleted and fields]
+        if not replaced:
+            return {}
+        pipe = client.pipeline(transaction=False)
+        for key in replaced:
+            pipe.hkeys(key)
+        stale = {}
+        for key, current in zip(replaced, pipe.execute()):
+            written = set(_text(field) for field in entries[key][1])
+            stale[key] = [field for field in current if _text(field) not in written]
+        return stale
+
+    def flush(self):
+        """
+        Send all pending writes, with one pipeline per database. The writes to a database are
+        dropped only once its pipeline succeeded: after an error, the writes not sent are kept
+        for the next flush.
+        """
+        if not self.pending:
+            return
+        start = time.time()
+        batch_size = 0
+        try:
+            for db_name in list(self.pending):
+                entries = self.pending[db_name]
+                client = self.connector.get_redis_client(db_name)
+                stale = self.__stale_fields(client, entries)
+                pipe = client.pipeline()
+                count = 0
+                for key, (deleted, fields) in entries.items():
+                    count += self._write_key(pipe, db_name, key, deleted, fields, stale.get(key))
+                if count:
+                    pipe.execute()
+                batch_size += count
+                del self.pending[db_name]
+        finally:
+            self.pending_count = sum(len(fields) + (1 if deleted else 0)
+                                     for entries in self.pending.values() for deleted, fields in entries.values())
+            if not self.pending:
+                self.first_pending_time = None
+        latency = time.time() - start
+
+        stats = self.stats
+        stats['flushes'] += 1
+        stats['commands'] += batch_size
+        stats['last_batch_size'] = batch_size
+        stats['max_batch_size'] = max(stats['max_batch_size'], batch_size)
+        stats['last_flush_latency'] = latency
+        stats['max_flush_latency'] = max(stats['max_flush_latency'], latency)
+        stats['total_flush_latency'] += latency
+
+
+class ConfigDBBufferedWriter(BufferedWriter):
+    """Buffered writer of config db table entries, with the ConfigDBConnector write semantics."""
+
+    def __init__(self, config_db, max_pending=None, max_delay=None):
+        """
+        :param config_db: connected ConfigDBConnector.
+        """
+        super(ConfigDBBufferedWriter, self).__init__(config_db, max_pending, max_delay)
+        self.config_db = config_db
+
+    def __hash(self, table, key):
+        key = self.config_db.serialize_key(key)
+        return '{}{}{}'.format(table.upper(), self.config_db.TABLE_NAME_SEPARATOR, key)
+
+    def mod_entry(self, table, key, data):
+        """Buffer the modification of a table entry, see ConfigDBConnector.mod_entry."""
+        _hash = self.__hash(table, key)
+        if data is None:
+            self.delete(self.config_db.db_name, _hash)
+        else:
+            self.set_all(self.config_db.db_name, _hash, self.config_db.typed_to_raw(data, table.upper()))
+
+    def set_entry(self, table, key, data):
+        """Buffer the write of a table entry, see ConfigDBConnector.set_entry.
+           Like the connector, the entry is written, then its extra fields are removed,
+           see BufferedWriter.replace.
+        """
+        _hash = self.__hash(table, key)
+        raw = {} if data is None else self.config_db.typed_to_raw(data, table.upper())
+        self.replace(self.config_db.db_name, _hash, raw)
+
+    def _write_key(self, pipe, db_name, key, deleted, fields, stale):
+        count = super(ConfigDBBufferedWriter, self)._write_key(pipe, db_name, key, deleted, fields, stale)
+        if self.config_db.use_table_index and count:
+            (table_name, row) = key.split(self.config_db.TABLE_NAME_SEPARATOR, 1)
+            self.config_db._index_update(pipe, table_name, row, not fields)
+            count += 1
+        return count
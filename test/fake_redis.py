@@ -0,0 +1,34 @@
+"""
+Test fixture replacing the Redis clients created by swsssdk with fakeredis clients sharing one
+in-memory server.
+"""
+from unittest import TestCase, skipIf
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+if fakeredis is not None:
+    class FakeStrictRedis(fakeredis.FakeStrictRedis):
+        def config_set(self, name, value):
+            # CONFIG SET is not implemented by fakeredis
+            return True
+
+
+@skipIf(fakeredis is None, "fakeredis is not installed")
+class FakeRedisTestCase(TestCase):
+    def setUp(self):
+        server = self.server = fakeredis.FakeServer()
+        strict_redis = redis.StrictRedis
+        redis.StrictRedis = lambda *args, **kwargs: FakeStrictRedis(*args, server=server, **kwargs)
+        self.addCleanup(setattr, redis, 'StrictRedis', strict_redis)
+
+    def client(self, db=0, decode_responses=False):
+        """
+        :return: fakeredis client of the database %db of the fake server.
+        """
+        return FakeStrictRedis(server=self.server, db=db, decode_responses=decode_responses)
@@ -0,0 +1,408 @@
+import os
+import sys
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from unittest import TestCase
+
+from .fake_redis import FakeRedisTestCase
+
+
+class Test_apply_config_diff(TestCase):
+    def setUp(self):
+        import swsssdk
+        self.config_db = swsssdk.ConfigDBConnector()
+
+    def test__diff_replace(self):
+        current = {'alias': 'etp1', 'mtu': '9100', 'members@': 'a,b'}
+        desired = self.config_db.typed_to_raw({'alias': 'etp1', 'mtu': 1500})
+        to_set, to_del = self.config_db._diff_raw_entry(current, desired, 'replace')
+        self.assertEqual(to_set, {'mtu': '1500'})
+        self.assertEqual(sorted(to_del), ['members@'])
+
+    def test__diff_merge(self):
+        current = {'alias': 'etp1', 'mtu': '9100'}
+        desired = self.config_db.typed_to_raw({'mtu': '9100', 'members': ['a', 'b']})
+        to_set, to_del = self.config_db._diff_raw_entry(current, desired, 'merge')
+        self.assertEqual(to_set, {'members@': 'a,b'})
+        self.assertEqual(to_del, [])
+
+    def test__diff_empty_entry(self):
+        desired = self.config_db.typed_to_raw({})
+        self.assertEqual(self.config_db._diff_raw_entry({'mtu': '9100'}, desired, 'merge'), ({}, []))
+        self.assertEqual(self.config_db._diff_raw_entry({}, desired, 'merge'), ({'NULL': 'NULL'}, []))
+        self.assertEqual(self.config_db._diff_raw_entry({'mtu': '9100'}, desired, 'replace'),
+                         ({'NULL': 'NULL'}, ['mtu']))
+
+
+class Test_apply_config(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_apply_config, self).setUp()
+        import swsssdk
+        self.raw = self.client(db=4, decode_responses=True)
+        self.raw.set('CONFIG_DB_INITIALIZED', '1')
+        self.raw.hset('PORT|Ethernet0', mapping={'mtu': '9100', 'alias': 'etp1'})
+        self.raw.hset('PORT|Ethernet4', 'mtu', '9100')
+        self.raw.hset('VLAN|Vlan100', 'vlanid', '100')
+        self.raw.hset('VLAN|Vlan200', 'vlanid', '200')
+        self.config_db = swsssdk.ConfigDBConnector(use_table_index=True)
+        self.config_db.connect(wait_for_init=False)
+        # several pipeline batches
+        self.config_db.REDIS_PIPELINE_BATCH_SIZE = 2
+
+    def test__replace(self):
+        data = {
+            'PORT': {'Ethernet0': {'mtu': '1500', 'alias': 'etp1'}, 'Ethernet8': {}},
+            'VLAN': None,
+            'ACL_RULE': {('DATAACL', 'RULE_1'): {'priority': '10', 'ports': ['Ethernet0', 'Ethernet8']}},
+        }
+        delta = self.config_db.apply_config(data)
+        self.assertEqual(delta, {
+            'PORT': {
+                'Ethernet0': {'set': {'mtu': '1500'}, 'del': []},
+                'Ethernet4': None,
+                'Ethernet8': {'set': {'NULL': 'NULL'}, 'del': []},
+            },
+            'VLAN': {'Vlan100': None, 'Vlan200': None},
+            'ACL_RULE': {('DATAACL', 'RULE_1'): {'set': {'priority': '10', 'ports@': 'Ethernet0,Ethernet8'}, 'del': []}},
+        })
+        self.assertEqual(self.config_db.get_config(), {
+            'PORT': {'Ethernet0': {'mtu': '1500', 'alias': 'etp1'}, 'Ethernet8': {}},
+            'ACL_RULE': {('DATAACL', 'RULE_1'): {'priority': '10', 'ports': ['Ethernet0', 'Ethernet8']}},
+        })
+        self.assertEqual(self.raw.get('CONFIG_DB_INITIALIZED'), '1')
+        self.assertEqual(self.config_db.verify_table_index(), {})
+        self.assertEqual(self.raw.smembers('_TABLE_INDEX_PORT'), {'Ethernet0', 'Ethernet8'})
+
+        self.assertEqual(self.config_db.apply_config(data), {})
+        delta = self.config_db.apply_config({'PORT': {'Ethernet0': {'mtu': '1500'}, 'Ethernet8': {'mtu': '9100'}}})
+        self.assertEqual(delta['PORT'], {'Ethernet0': {'set': {}, 'del': ['alias']},
+                                         'Ethernet8': {'set': {'mtu': '9100'}, 'del': ['NULL']}})
+        self.assertEqual(self.config_db.get_config(), {'PORT': {'Ethernet0': {'mtu': '1500'}, 'Ethernet8': {'mtu': '9100'}}})
+
+    def test__merge(self):
+        data = {
+            'PORT': {'Ethernet0': {'mtu': '1500'}, 'Ethernet4': None, 'Ethernet12': None, 'Ethernet8': {}},
+            'VLAN': None,
+            'ACL_TABLE': {'DATAACL': {'ports': ['Ethernet0']}},
+        }
+        delta = self.config_db.apply_config(data, mode='merge')
+        self.assertEqual(delta, {
+            'PORT': {
+                'Ethernet0': {'set': {'mtu': '1500'}, 'del': []},
+                'Ethernet4': None,
+                'Ethernet8': {'set': {'NULL': 'NULL'}, 'del': []},
+            },
+            'VLAN': {'Vlan100': None, 'Vlan200': None},
+            'ACL_TABLE': {'DATAACL': {'set': {'ports@': 'Ethernet0'}, 'del': []}},
+        })
+        self.assertEqual(self.config_db.get_config(), {
+            'PORT': {'Ethernet0': {'mtu': '1500', 'alias': 'etp1'}, 'Ethernet8': {}},
+            'ACL_TABLE': {'DATAACL': {'ports': ['Ethernet0']}},
+        })
+        self.assertEqual(self.config_db.verify_table_index(), {})
+
+        # an empty entry only creates missing entries
+        self.assertEqual(self.config_db.apply_config({'PORT': {'Ethernet0': {}}}, mode='merge'), {})
+        self.assertEqual(self.config_db.apply_config(data, mode='merge'), {})
+        self.assertRaises(ValueError, self.config_db.apply_config, data, mode='update')
+
+
+class Test_iter_config(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_iter_config, self).setUp()
+        import swsssdk
+        self.raw = self.client(db=4, decode_responses=True)
+        self.raw.set('CONFIG_DB_INITIALIZED', '1')
+        for i in range(70):
+            self.raw.hset('PORT|Ethernet{}'.format(i * 4), 'mtu', '9100')
+        self.raw.hset('ACL_RULE|DATAACL|RULE_1', 'priority', '10')
+        self.raw.hset('PORTCHANNEL|PortChannel1', 'members@', 'Ethernet0,Ethernet4')
+        self.raw.sadd('_TABLE_INDEX_PORT', 'Ethernet0')
+        self.raw.set('_TABLE_INDEX', '1')
+
+    def connector(self, use_table_index=False):
+        import swsssdk
+        config_db = swsssdk.ConfigDBConnector(use_table_index=use_table_index)
+        config_db.connect(wait_for_init=False)
+        return config_db
+
+    def test__iter_table(self):
+        config_db = self.connector()
+        entries = list(config_db.iter_table('port'))
+        self.assertEqual(len(entries), 70)
+        self.assertEqual(set(table for table, _, _ in entries), {'PORT'})
+        self.assertIn(('PORT', 'Ethernet4', {'mtu': '9100'}), entries)
+        self.assertEqual(list(config_db.iter_table('ACL_RULE')), [('ACL_RULE', ('DATAACL', 'RULE_1'), {'priority': '10'})])
+        self.assertEqual(list(config_db.iter_table('VLAN')), [])
+
+    def test__iter_config(self):
+        config_db = self.connector()
+        entries = list(config_db.iter_config())
+        self.assertEqual(len(entries), 72)
+        self.assertEqual(set(table for table, _, _ in entries), {'PORT', 'ACL_RULE', 'PORTCHANNEL'})
+        self.assertIn(('PORTCHANNEL', 'PortChannel1', {'members': ['Ethernet0', 'Ethernet4']}), entries)
+        self.assertEqual(config_db.get_config()['PORT']['Ethernet0'], {'mtu': '9100'})
+
+    def test__iter_table_index(self):
+        config_db = self.connector(use_table_index=True)
+        self.assertEqual(list(config_db.iter_table('PORT')), [('PORT', 'Ethernet0', {'mtu': '9100'})])
+        self.assertEqual(len(list(config_db.iter_config())), 72)
+
+
+class Test_query_table(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_query_table, self).setUp()
+        self.raw = self.client(db=4, decode_responses=True)
+        self.raw.hset('PORT|Ethernet0', mapping={'admin_status': 'up', 'mtu': '9100', 'lanes@': '0,1'})
+        self.raw.hset('PORT|Ethernet4', mapping={'admin_status': 'down', 'mtu': '9100', 'lanes': '4'})
+        self.raw.hset('PORT|Ethernet8', mapping={'admin_status': 'up', 'lanes': '8'})
+        self.raw.set('PORT|string', 'up')
+
+    def connector(self, use_table_index=False):
+        import swsssdk
+        config_db = swsssdk.ConfigDBConnector(use_table_index=use_table_index)
+        config_db.connect(wait_for_init=False)
+        return config_db
+
+    def test__where_and_fields(self):
+        config_db = self.connector()
+        self.assertEqual(config_db.query_table('port', where={'admin_status': 'up'}, fields=['mtu', 'lanes']), {
+            'Ethernet0': {'mtu': '9100', 'lanes': ['0', '1']},
+            'Ethernet8': {'lanes': '8'},
+        })
+        self.assertEqual(config_db.query_table('PORT', where={'mtu': 9100}), {
+            'Ethernet0': {'admin_status': 'up', 'mtu': '9100', 'lanes': ['0', '1']},
+            'Ethernet4': {'admin_status': 'down', 'mtu': '9100', 'lanes': '4'},
+        })
+
+    def test__schema_fields(self):
+        config_db = self.connector()
+        config_db.register_schema('PORT', {'lanes': 'list', 'mtu': 'int'})
+        self.assertEqual(config_db.query_table('PORT', where={'mtu': 9100}, fields=['lanes']), {
+            'Ethernet0': {'lanes': ['0', '1']},
+            'Ethernet4': {},
+        })
+
+    def test__table_index(self):
+        config_db = self.connector(use_table_index=True)
+        self.raw.srem('_TABLE_INDEX_PORT', 'Ethernet8')
+        self.assertEqual(config_db.query_table('PORT', where={'admin_status': 'up'}, fields=['admin_status']),
+                         {'Ethernet0': {'admin_status': 'up'}})
+
+
+class Test_table_schema(TestCase):
+    def setUp(self):
+        import swsssdk
+        self.config_db = swsssdk.ConfigDBConnector()
+        self.config_db.register_schema('PORT', {'lanes': 'list', 'mtu': 'int', 'autoneg': 'bool', 'alias': 'string'})
+
+    def test__raw_to_typed(self):
+        raw = {'lanes@': '0,1', 'mtu': '9100', 'autoneg': 'true', 'alias': 'etp1', 'speed': 'x', 'members@': 'a'}
+        typed = self.config_db.raw_to_typed(raw, 'PORT')
+        self.assertEqual(typed, {'lanes': ['0', '1'], 'mtu': 9100, 'autoneg': True, 'alias': 'etp1',
+                                 'speed': 'x', 'members': ['a']})
+        self.assertEqual(self.config_db.raw_to_typed({'NULL': 'NULL'}, 'PORT'), {})
+        self.assertEqual(self.config_db.raw_to_typed({'mtu': '9100'}, 'VLAN'), {'mtu': '9100'})
+
+    def test__typed_to_raw(self):
+        typed = {'lanes': ['0', '1'], 'mtu': 9100, 'autoneg': False, 'speed': 100}
+        raw = self.config_db.typed_to_raw(typed, 'PORT')
+        self.assertEqual(raw, {'lanes@': '0,1', 'mtu': '9100', 'autoneg': 'false', 'speed': '100'})
+        self.assertEqual(self.config_db.typed_to_raw({}, 'PORT'), {'NULL': 'NULL'})
+        self.assertEqual(self.config_db.raw_to_typed(raw, 'PORT'), dict(typed, speed='100'))
+
+    def test__unsupported_type(self):
+        self.assertRaises(ValueError, self.config_db.register_schema, 'VLAN', {'vlanid': 'float'})
+
+
+class Test_compact_rows(TestCase):
+    def test__shared_layout(self):
+        from swsssdk.compact import CompactTableBuilder
+        import swsssdk
+        builder = CompactTableBuilder()
+        row1 = builder.row({'admin_status': 'up', 'lanes': ['0', '1']})
+        row2 = builder.row({'admin_status': 'up', 'lanes': ['2', '3']})
+        self.assertEqual(row1, {'admin_status': 'up', 'lanes': ['0', '1']})
+        self.assertIs(row1._layout, row2._layout)
+        self.assertIs(row1['admin_status'], row2['admin_status'])
+        with self.assertRaises(TypeError):
+            row1['mtu'] = '9100'
+
+        key = builder.key('Ethernet0|3', swsssdk.ConfigDBConnector.deserialize_key)
+        self.assertEqual(key, ('Ethernet0', '3'))
+        self.assertIs(builder.key('Ethernet0|3', None), key)
+
+
+class Test_transaction(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_transaction, self).setUp()
+        import swsssdk
+        self.config_db = swsssdk.ConfigDBConnector()
+        self.config_db.connect(wait_for_init=False)
+        self.config_db.set_entry('VLAN', 'Vlan100', {'members': ['Ethernet0']})
+        self.config_db.set_entry('VLAN', 'Vlan200', {'vlanid': '200'})
+        self.other = self.client(db=4, decode_responses=True)
+
+    def test__commit(self):
+        for txn in self.config_db.transaction():
+            with txn:
+                entry = txn.get_entry('VLAN', 'Vlan100')
+                txn.mod_entry('VLAN', 'Vlan100', {'members': entry['members'] + ['Ethernet4']})
+        self.assertTrue(txn.committed)
+        self.assertEqual(self.config_db.get_entry('VLAN', 'Vlan100'), {'members': ['Ethernet0', 'Ethernet4']})
+
+    def test__conflict_retry(self):
+        attempts = 0
+        for txn in self.config_db.transaction():
+            with txn:
+                attempts += 1
+                table = txn.get_table('VLAN')
+                if attempts == 1:
+                    self.other.hset('VLAN|Vlan200', 'vlanid', '201')
+                txn.set_entry('VLAN', 'Vlan300', {'vlanid': str(len(table))})
+        self.assertEqual(attempts, 2)
+        self.assertEqual(sorted(table), ['Vlan100', 'Vlan200'])
+        self.assertEqual(table['Vlan200'], {'vlanid': '201'})
+        self.assertEqual(self.config_db.get_entry('VLAN', 'Vlan300'), {'vlanid': '2'})
+
+    def test__empty_entries(self):
+        self.config_db.set_entry('VLAN', 'Vlan300', {})
+        for txn in self.config_db.transaction():
+            with txn:
+                table = txn.get_table('VLAN')
+        self.assertEqual(table, self.config_db.get_table('VLAN'))
+        self.assertEqual(table['Vlan300'], {})
+
+    def test__conflict_exhausted(self):
+        from swsssdk.configdb import TransactionConflictError
+        with self.assertRaises(TransactionConflictError):
+            for txn in self.config_db.transaction(retries=1):
+                with txn:
+                    txn.get_entry('VLAN', 'Vlan100')
+                    self.other.hset('VLAN|Vlan100', 'mtu', '9100')
+                    txn.mod_entry('VLAN', 'Vlan100', {'mtu': '1500'})
+        self.assertEqual(self.other.hget('VLAN|Vlan100', 'mtu'), '9100')
+
+
+def lost_connection(*args, **kwargs):
+    import redis
+    raise redis.ConnectionError("Connection lost")
+
+
+class StubPubSub(object):
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def get_message(self, timeout=0):
+        return self.messages.pop(0) if self.messages else None
+
+    def close(self):
+        pass
+
+
+class Test_change_feed(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_change_feed, self).setUp()
+        import swsssdk
+        self.raw = self.client(db=4, decode_responses=True)
+        self.raw.hset('PORT|Ethernet0', 'mtu', '9100')
+        self.raw.hset('VLAN|Vlan100', 'vlanid', '100')
+        self.config_db = swsssdk.ConfigDBConnector()
+        self.config_db.connect(wait_for_init=False)
+
+    def events(self, events):
+        return [(event.seq, event.table, event.key, event.data) for event in events]
+
+    def notify(self, feed, *keys):
+        feed.pubsub.close()
+        feed.pubsub = StubPubSub({'type': 'pmessage', 'channel': '__keyspace@4__:' + key} for key in keys)
+
+    def test__initial_events(self):
+        feed = self.config_db.change_feed(['port'])
+        self.assertEqual(self.events(feed.poll()), [(1, 'PORT', 'Ethernet0', {'mtu': '9100'})])
+        self.notify(feed)
+        self.assertEqual(feed.poll(), [])
+
+        events = iter(self.config_db.change_feed())
+        self.assertEqual([next(events)[1:] for _ in range(2)],
+                         [('PORT', 'Ethernet0', {'mtu': '9100'}), ('VLAN', 'Vlan100', {'vlanid': '100'})])
+
+    def test__poll(self):
+        feed = self.config_db.change_feed(['PORT'])
+        self.assertEqual(feed.snapshot(), {'PORT': {'Ethernet0': {'mtu': '9100'}}})
+        self.config_db.set_entry('PORT', 'Ethernet4', {'lanes': ['0', '1']})
+        self.config_db.set_entry('PORT', 'Ethernet0', None)
+        self.config_db.set_entry('VLAN', 'Vlan100', None)
+        # Ethernet8 notified without change
+        self.notify(feed, 'PORT|Ethernet4', 'PORT|Ethernet0', 'PORT|Ethernet8', 'PORT|Ethernet4', 'CONFIG_DB_INITIALIZED')
+        self.assertEqual(self.events(feed.poll()), [(1, 'PORT', 'Ethernet0', None),
+                                                    (2, 'PORT', 'Ethernet4', {'lanes': ['0', '1']})])
+        self.assertEqual(feed.state, {'PORT|Ethernet4': {'lanes': ['0', '1']}})
+
+    def test__resync(self):
+        feed = self.config_db.change_feed()
+        feed.snapshot()
+        # changes whose notifications are missed
+        self.raw.hset('PORT|Ethernet0', 'mtu', '1500')
+        self.raw.hset('PORT|Ethernet4', 'mtu', '9100')
+        self.raw.delete('VLAN|Vlan100')
+        self.notify(feed)
+        self.assertEqual(feed.poll(), [])
+        self.assertEqual(self.events(feed.resync()), [(1, 'PORT', 'Ethernet0', {'mtu': '1500'}),
+                                                      (2, 'PORT', 'Ethernet4', {'mtu': '9100'}),
+                                                      (3, 'VLAN', 'Vlan100', None)])
+        self.assertEqual(feed.resync(), [])
+
+        # lost notification channel
+        self.raw.hset('PORT|Ethernet8', 'mtu', '9100')
+        feed.pubsub.close()
+        feed.pubsub = StubPubSub([])
+        feed.pubsub.get_message = lost_connection
+        self.assertEqual(self.events(feed.poll()), [(4, 'PORT', 'Ethernet8', {'mtu': '9100'})])
+        self.assertIsNot(feed.pubsub, None)
+
+        feed.close()
+        self.raw.delete('PORT|Ethernet8')
+        self.assertEqual(self.events(feed.poll()), [(5, 'PORT', 'Ethernet8', None)])
+
+
+class Test_table_index(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_table_index, self).setUp()
+        import swsssdk
+        self.raw = self.client(db=4, decode_responses=True)
+        self.raw.hset('PORT|Ethernet0', 'mtu', '9100')
+        self.config_db = swsssdk.ConfigDBConnector(use_table_index=True)
+        self.config_db.connect(wait_for_init=False)
+
+    def test__index_keys(self):
+        self.config_db.set_entry('PORT', 'Ethernet4', {'mtu': '1500'})
+        self.config_db.set_entry('VLAN', 'Vlan100', {'vlanid': '100'})
+        self.config_db.set_entry('VLAN', 'Vlan100', None)
+        # No index key is taken for a table entry by readers splitting keys on the separator
+        self.assertEqual(sorted(key for key in self.raw.keys() if '|' in key), ['PORT|Ethernet0', 'PORT|Ethernet4'])
+        self.assertEqual(self.raw.smembers('_TABLE_INDEX_PORT'), {'Ethernet0', 'Ethernet4'})
+        self.assertEqual(self.config_db.get_config(), {'PORT': {'Ethernet0': {'mtu': '9100'}, 'Ethernet4': {'mtu': '1500'}}})
+        self.assertEqual(self.config_db.verify_table_index(), {})
+
+    def test__verify_and_rebuild(self):
+        self.raw.hset('VLAN|Vlan100', 'vlanid', '100')
+        self.raw.sadd('_TABLE_INDEX_PORT', 'Ethernet8')
+        self.assertEqual(self.config_db.verify_table_index(),
+                         {'PORT': {'missing': [], 'stale': ['Ethernet8']}, 'VLAN': {'missing': ['Vlan100'], 'stale': []}})
+        self.config_db.rebuild_table_index()
+        self.assertEqual(self.config_db.verify_table_index(), {})
+        self.assertEqual(self.config_db.get_table('VLAN'), {'Vlan100': {'vlanid': '100'}})
+
+    def test__change_feed_skips_index(self):
+        feed = self.config_db.change_feed()
+        self.assertEqual(feed.snapshot(), {'PORT': {'Ethernet0': {'mtu': '9100'}}})
+        self.config_db.set_entry('PORT', 'Ethernet4', {'mtu': '1500'})
+        messages = [{'type': 'pmessage', 'channel': '__keyspace@4__:' + key}
+                    for key in ('_TABLE_INDEX_PORT', 'PORT|Ethernet4')]
+        feed.pubsub.close()
+        feed.pubsub = StubPubSub(messages)
+        events = feed.poll()
+        self.assertEqual([(event.table, event.key, event.data) for event in events], [('PORT', 'Ethernet4', {'mtu': '1500'})])
@@ -0,0 +1,66 @@
+import os
+import sys
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from unittest import TestCase, skipIf
+
+from swsssdk import counters
+from .fake_redis import FakeRedisTestCase
+
+
+@skipIf(counters.numpy is None, "NumPy is not installed")
+class Test_counter_rate_engine(TestCase):
+    def snapshot(self, timestamp, values):
+        return counters.CounterSnapshot(timestamp, ['Ethernet0', 'Ethernet4'], ['rx', 'tx'],
+                                        counters.numpy.array(values, dtype=counters.numpy.uint64))
+
+    def test__rates_and_resets(self):
+        engine = counters.CounterRateEngine(history_size=2)
+        self.assertIsNone(engine.update(self.snapshot(0.0, [[10, 2 ** 64 - 5], [100, 7]])))
+        rates = engine.update(self.snapshot(2.0, [[30, 3], [50, 9]]))
+        self.assertEqual(rates.deltas.tolist(), [[20, 3], [50, 2]])
+        self.assertEqual(rates.rates.tolist(), [[10.0, 1.5], [25.0, 1.0]])
+
+        engine.clear()
+        rates = engine.update(self.snapshot(3.0, [[40, 3], [50, 12]]))
+        self.assertEqual(rates.totals.tolist(), [[10, 0], [0, 3]])
+        self.assertEqual(engine.moving_average().tolist(), [[10.0, 1.0], [50.0 / 3, 5.0 / 3]])
+
+    def test__wrap(self):
+        engine = counters.CounterRateEngine(wrap_bits=32)
+        engine.update(self.snapshot(0.0, [[2 ** 32 - 2, 0], [0, 0]]))
+        self.assertEqual(engine.update(self.snapshot(1.0, [[3, 0], [0, 0]])).deltas.tolist(), [[5, 0], [0, 0]])
+
+
+class Test_counters_reader(FakeRedisTestCase):
+    COUNTERS = ['SAI_PORT_STAT_IF_IN_OCTETS', 'SAI_PORT_STAT_IF_OUT_OCTETS']
+
+    def setUp(self):
+        super(Test_counters_reader, self).setUp()
+        import swsssdk
+        self.db = swsssdk.SonicV2Connector()
+        counters_db = self.client(db=2)
+        counters_db.hset('COUNTERS:oid:0x1000000000002', mapping={
+            'SAI_PORT_STAT_IF_IN_OCTETS': '10', 'SAI_PORT_STAT_IF_OUT_OCTETS': str(2 ** 64 - 1)})
+        # missing counter, then missing port
+        counters_db.hset('COUNTERS:oid:0x1000000000003', 'SAI_PORT_STAT_IF_IN_OCTETS', '30')
+        self.if_name_map = {'Ethernet8': '1000000000004', 'Ethernet4': '1000000000003',
+                            'Ethernet0': '1000000000002'}
+
+    def read(self, use_numpy):
+        reader = counters.CountersReader(self.db, self.if_name_map, self.COUNTERS, use_numpy=use_numpy, batch_size=2)
+        snapshot = reader.read()
+        self.assertEqual(snapshot.ports, ['Ethernet0', 'Ethernet4', 'Ethernet8'])
+        self.assertEqual(snapshot.counters, self.COUNTERS)
+        return snapshot.values
+
+    def test__read(self):
+        self.assertEqual(self.read(use_numpy=False), [[10, 2 ** 64 - 1], [30, 0], [0, 0]])
+
+    @skipIf(counters.numpy is None, "NumPy is not installed")
+    def test__read_numpy(self):
+        values = self.read(use_numpy=True)
+        self.assertEqual(values.dtype, counters.numpy.uint64)
+        self.assertEqual(values.tolist(), [[10, 2 ** 64 - 1], [30, 0], [0, 0]])
@@ -0,0 +1,106 @@
+import os
+import shutil
+import sys
+import tempfile
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from unittest import TestCase, skipIf
+
+from swsssdk import counters, counters_shm
+
+
+class Test_counters_snapshot(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = os.path.join(tmp_dir, 'counters')
+        self.publisher = counters_shm.CountersSnapshotPublisher(None, path=self.path)
+        self.reader = counters_shm.CountersSnapshotReader(path=self.path)
+        self.addCleanup(self.publisher.close)
+        self.addCleanup(self.reader.close)
+
+    def publish(self, timestamp, ports, values):
+        snapshot = counters.CounterSnapshot(timestamp, ports, ['rx', 'tx'], values)
+        return self.publisher.publish(snapshot)
+
+    def values(self, snapshot):
+        values = snapshot.values
+        return values.tolist() if counters_shm.numpy is not None else values
+
+    def test__read(self):
+        self.assertIsNone(self.reader.read())
+        self.assertEqual(self.publish(1.0, ['Ethernet0', 'Ethernet4'], [[1, 2], [3, 2 ** 64 - 1]]), 2)
+        snapshot = self.reader.read()
+        self.assertEqual((snapshot.timestamp, snapshot.ports, snapshot.counters), (1.0, ['Ethernet0', 'Ethernet4'], ['rx', 'tx']))
+        self.assertEqual(self.values(snapshot), [[1, 2], [3, 2 ** 64 - 1]])
+        self.assertEqual(self.reader.seq, 2)
+
+        self.publish(2.0, ['Ethernet0', 'Ethernet4'], [[5, 6], [7, 8]])
+        self.assertEqual(self.values(self.reader.read()), [[5, 6], [7, 8]])
+        self.assertEqual(self.reader.seq, 4)
+
+    def test__layout_change(self):
+        self.publish(1.0, ['Ethernet0'], [[1, 2]])
+        self.reader.read()
+        first_mm = self.reader.mm
+        view = self.reader.view()
+
+        self.publish(2.0, ['Ethernet0', 'Ethernet4'], [[3, 4], [5, 6]])
+        snapshot = self.reader.read()
+        self.assertEqual(snapshot.ports, ['Ethernet0', 'Ethernet4'])
+        self.assertEqual(self.values(snapshot), [[3, 4], [5, 6]])
+        # The view of the replaced file is still valid, and no longer updated
+        self.assertEqual(view.tolist(), [[1, 2]] if counters_shm.numpy is not None else [1, 2])
+        self.assertIs(self.reader.previous_mm, first_mm)
+
+        second_mm = self.reader.mm
+        del view
+        self.publish(3.0, ['Ethernet8'], [[7, 8]])
+        self.assertEqual(self.values(self.reader.read()), [[7, 8]])
+        self.assertTrue(first_mm.closed)
+        self.assertIs(self.reader.previous_mm, second_mm)
+        self.assertFalse(second_mm.closed)
+
+    def test__odd_seq_retry(self):
+        self.publish(1.0, ['Ethernet0'], [[1, 2]])
+        self.reader.read()
+        self.reader.RETRIES = 3
+        # Publisher interrupted while writing the values
+        counters_shm.SEQ.pack_into(self.publisher.mm, counters_shm.SEQ_OFFSET, self.publisher.seq + 1)
+        with self.assertRaises(RuntimeError):
+            self.reader.read()
+        self.publish(2.0, ['Ethernet0'], [[3, 4]])
+        self.assertEqual(self.values(self.reader.read()), [[3, 4]])
+
+    def test__not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * counters_shm.HEADER_SIZE)
+        with self.assertRaises(ValueError):
+            self.reader.read()
+
+
+class Test_counters_snapshot_without_numpy(Test_counters_snapshot):
+    def setUp(self):
+        super(Test_counters_snapshot_without_numpy, self).setUp()
+        self.addCleanup(setattr, counters_shm, 'numpy', counters_shm.numpy)
+        counters_shm.numpy = None
+
+
+@skipIf(counters.numpy is None, "NumPy is not installed")
+class Test_counters_snapshot_numpy(TestCase):
+    def test__view(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'counters')
+        publisher = counters_shm.CountersSnapshotPublisher(None, path=path)
+        reader = counters_shm.CountersSnapshotReader(path=path)
+        publisher.publish(counters.CounterSnapshot(1.0, ['Ethernet0'], ['rx', 'tx'], counters.numpy.array([[1, 2]])))
+        view = reader.view()
+        self.assertEqual(view.shape, (1, 2))
+        publisher.publish(counters.CounterSnapshot(2.0, ['Ethernet0'], ['rx', 'tx'], counters.numpy.array([[3, 4]])))
+        self.assertEqual(view.tolist(), [[3, 4]])
+        del view
+        reader.close()
+        publisher.close()
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+import redis
+
+from swsssdk import SonicDBConfig
+from .fake_redis import FakeRedisTestCase
+
+
+class Test_multi_db_batch(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_multi_db_batch, self).setUp()
+        import swsssdk
+        self.db = swsssdk.SonicV2Connector()
+        for db_name in (self.db.APPL_DB, self.db.STATE_DB, self.db.COUNTERS_DB):
+            self.db.connect(db_name)
+        self.client(db=0).hset('PORT_TABLE:Ethernet0', 'mtu', '9100')
+        self.client(db=6).hset('PORT_TABLE|Ethernet0', 'netdev_oper_status', 'up')
+        self.client(db=2).hset('COUNTERS:oid:0x1', 'SAI_PORT_STAT_IF_IN_OCTETS', '10')
+
+    def use_instances(self, instances):
+        """
+        Host the databases of %instances (dict of db name to instance name) on other instances.
+        """
+        get_instancename = SonicDBConfig.get_instancename
+        self.addCleanup(setattr, SonicDBConfig, 'get_instancename', staticmethod(get_instancename))
+        SonicDBConfig.get_instancename = staticmethod(
+            lambda db_name, namespace=None: instances.get(db_name) or get_instancename(db_name, namespace))
+
+    def queue(self, batch):
+        batch.hget(self.db.APPL_DB, 'PORT_TABLE:Ethernet0', 'mtu')
+        batch.hgetall(self.db.STATE_DB, 'PORT_TABLE|Ethernet0')
+        batch.hget(self.db.COUNTERS_DB, 'COUNTERS:oid:0x1', 'SAI_PORT_STAT_IF_IN_OCTETS')
+        batch.hset(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'mtu', '9100')
+        batch.exists(self.db.APPL_DB, 'PORT_TABLE|Ethernet0')
+
+    def test__submission_order(self):
+        batch = self.db.batch()
+        self.queue(batch)
+        self.assertEqual(len(batch), 5)
+        self.assertEqual(batch.execute(), ['9100', {'netdev_oper_status': 'up'}, '10', 1, 0])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.execute(), [])
+        self.assertEqual(self.client(db=6).hget('PORT_TABLE|Ethernet0', 'mtu'), b'9100')
+
+    def test__select_restored(self):
+        batch = self.db.batch()
+        batch.hget(self.db.APPL_DB, 'PORT_TABLE:Ethernet0', 'mtu')
+        batch.hget(self.db.COUNTERS_DB, 'COUNTERS:oid:0x1', 'SAI_PORT_STAT_IF_IN_OCTETS')
+        batch.execute()
+        # the pooled connection of the APPL_DB client is back on APPL_DB
+        client = self.db.get_redis_client(self.db.APPL_DB)
+        self.assertEqual(len(client.connection_pool._available_connections), 1)
+        self.assertEqual(client.hget('PORT_TABLE:Ethernet0', 'mtu'), '9100')
+        self.assertEqual(self.db.get(self.db.APPL_DB, 'PORT_TABLE:Ethernet0', 'mtu'), '9100')
+
+    def test__instances(self):
+        self.use_instances({self.db.COUNTERS_DB: 'redis_counters', self.db.STATE_DB: 'redis_state'})
+        threads = set()
+        execute_group = type(self.db.batch())._execute_group
+
+        def record_thread(batch, commands, results):
+            threads.add(threading.current_thread().name)
+            return execute_group(batch, commands, results)
+
+        batch = self.db.batch()
+        batch._execute_group = lambda commands, results: record_thread(batch, commands, results)
+        self.queue(batch)
+        self.assertEqual(batch.execute(), ['9100', {'netdev_oper_status': 'up'}, '10', 1, 0])
+        self.assertEqual(len(threads), 3)
+
+    def test__instance_error(self):
+        self.use_instances({self.db.COUNTERS_DB: 'redis_counters'})
+        batch = self.db.batch()
+        self.queue(batch)
+        batch.lpush(self.db.COUNTERS_DB, 'COUNTERS:oid:0x1', 'value')
+        with self.assertRaises(redis.ResponseError):
+            batch.execute()
+        self.assertEqual(len(batch), 0)
@@ -0,0 +1,111 @@
+import os
+import sys
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from .fake_redis import FakeRedisTestCase
+
+
+class ScriptedPubSub(object):
+    """
+    Keyspace subscription running the next step of a script on each blocking get_message:
+    a step changes the db and returns the notifications to deliver.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.messages = []
+
+    def psubscribe(self, *patterns):
+        pass
+
+    def get_message(self, timeout=0):
+        if timeout and not self.messages and self.steps:
+            self.messages = self.steps.pop(0)()
+        return self.messages.pop(0) if self.messages else None
+
+    def close(self):
+        pass
+
+
+class Test_wait_for(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_wait_for, self).setUp()
+        import swsssdk
+        self.db = swsssdk.SonicV2Connector()
+        self.db.connect(self.db.STATE_DB)
+
+    def test__no_keys(self):
+        self.assertTrue(self.db.wait_for(self.db.STATE_DB, []))
+
+    def test__ready_keys(self):
+        self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'state', 'ok')
+        self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet4', 'state', 'ok')
+        self.assertTrue(self.db.wait_for(self.db.STATE_DB, ['PORT_TABLE|Ethernet0', 'PORT_TABLE|Ethernet*']))
+        self.assertFalse(self.db.wait_for(self.db.STATE_DB, ['PORT_TABLE|Ethernet8'], timeout=0.1))
+
+    def notification(self, key):
+        return {'type': 'pmessage', 'channel': '__keyspace@6__:' + key}
+
+    def test__conditions_not_latched(self):
+        self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'state', 'ok')
+
+        def port4_ok_port0_down():
+            self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet4', 'state', 'ok')
+            # the notification of Ethernet0 is not received yet
+            self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'state', 'down')
+            return [self.notification('PORT_TABLE|Ethernet4')]
+
+        def port0_ok():
+            self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'state', 'ok')
+            return [self.notification('PORT_TABLE|Ethernet0')]
+
+        client = self.db.get_redis_client(self.db.STATE_DB)
+        pubsub = ScriptedPubSub([port4_ok_port0_down, port0_ok])
+        client.pubsub = lambda: pubsub
+        condition = lambda key, value: value is not None and value.get('state') == 'ok'
+        keys = ['PORT_TABLE|Ethernet0', 'PORT_TABLE|Ethernet4']
+        self.assertTrue(self.db.wait_for(self.db.STATE_DB, keys, condition, timeout=1))
+        self.assertEqual(pubsub.steps, [])
+
+        pubsub = ScriptedPubSub([port4_ok_port0_down])
+        self.db.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'state', 'ok')
+        self.db.delete(self.db.STATE_DB, 'PORT_TABLE|Ethernet4')
+        self.assertFalse(self.db.wait_for(self.db.STATE_DB, keys, condition, timeout=0.1))
+
+
+class Test_query(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_query, self).setUp()
+        import swsssdk
+        self.db = swsssdk.SonicV2Connector()
+        self.db.connect(self.db.APPL_DB)
+        # several script calls
+        self.db.dbintf.REDIS_SCAN_BATCH_SIZE = 2
+        client = self.client(db=0)
+        client.hset('PORT_TABLE:Ethernet0', mapping={'admin_status': 'up', 'mtu': '9100', 'alias': 'etp1'})
+        client.hset('PORT_TABLE:Ethernet4', mapping={'admin_status': 'down', 'mtu': '9100'})
+        client.hset('PORT_TABLE:Ethernet8', mapping={'admin_status': 'up'})
+        client.set('PORT_TABLE:string', 'up')
+        client.sadd('PORT_TABLE:set', 'admin_status')
+        client.hset('VLAN_TABLE:Vlan100', 'admin_status', 'up')
+
+    def test__where_and_fields(self):
+        query = lambda *args, **kwargs: self.db.query(self.db.APPL_DB, 'PORT_TABLE:*', *args, **kwargs)
+        self.assertEqual(sorted(query()), ['PORT_TABLE:Ethernet0', 'PORT_TABLE:Ethernet4', 'PORT_TABLE:Ethernet8'])
+        self.assertEqual(query(where={'admin_status': 'up'}, fields=['mtu', 'admin_status']), {
+            'PORT_TABLE:Ethernet0': {'mtu': '9100', 'admin_status': 'up'},
+            'PORT_TABLE:Ethernet8': {'admin_status': 'up'},
+        })
+        self.assertEqual(query(where={'admin_status': 'up', 'mtu': '9100'}), {
+            'PORT_TABLE:Ethernet0': {'admin_status': 'up', 'mtu': '9100', 'alias': 'etp1'},
+        })
+        self.assertEqual(query(where={'speed': '100000'}), {})
+        self.assertEqual(query(fields=['alias']), {'PORT_TABLE:Ethernet0': {'alias': 'etp1'},
+                                                   'PORT_TABLE:Ethernet4': {}, 'PORT_TABLE:Ethernet8': {}})
+
+    def test__keys(self):
+        keys = ['PORT_TABLE:Ethernet4', 'PORT_TABLE:string', 'PORT_TABLE:Ethernet12', 'VLAN_TABLE:Vlan100']
+        self.assertEqual(self.db.query(self.db.APPL_DB, where={'admin_status': 'up'}, keys=keys),
+                         {'VLAN_TABLE:Vlan100': {'admin_status': 'up'}})
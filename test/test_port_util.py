@@ -0,0 +1,184 @@
+import os
+import sys
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from unittest import TestCase
+
+import redis
+
+from .fake_redis import FakeRedisTestCase
+
+
+class Test_interface_indexer(TestCase):
+    def test__same_indexes(self):
+        from swsssdk import port_util
+        indexer = port_util.InterfaceIndexer()
+        names = ['Ethernet0', 'Ethernet-BP4', 'Vlan1000', 'PortChannel01', 'eth0', 'Ethernet', 'lo', 'Vlan1000x']
+        self.assertEqual(indexer.get_indexes(names), [port_util.get_index_from_str(name) for name in names])
+        self.assertEqual(indexer.get_indexes(names), [1, 9004, 3000, 1001, 10000, None, None, None])
+        self.assertEqual(indexer.get_index(b'Ethernet-BP4'), 9004)
+        self.assertEqual(indexer.get_names([1, 3000, 5]), ['Ethernet0', 'Vlan1000', None])
+
+
+class Test_vlan_resolver(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_vlan_resolver, self).setUp()
+        import swsssdk
+        from swsssdk import port_util
+        self.asic = self.client(db=1)
+        self.asic.hset(port_util.VLAN_KEY_PREFIX + 'oid:0x26000000000001', 'SAI_VLAN_ATTR_VLAN_ID', '100')
+        self.asic.hset(port_util.VLAN_KEY_PREFIX + 'oid:0x26000000000002', 'SAI_VLAN_ATTR_VLAN_ID', '200')
+        self.resolver = port_util.VlanResolver(swsssdk.SonicV2Connector(), cache_size=2)
+        self.addCleanup(self.resolver.close)
+
+    def change_vlan(self, bvid, vlan_id):
+        # fakeredis sends no keyspace notification, the cached value is kept
+        from swsssdk import port_util
+        self.asic.hset(port_util.VLAN_KEY_PREFIX + bvid, 'SAI_VLAN_ATTR_VLAN_ID', vlan_id)
+
+    def test__cache(self):
+        self.resolver.populate()
+        self.assertEqual(self.resolver.resolve_many(['oid:0x26000000000001', 'oid:0x26000000000003',
+                                                     'oid:0x26000000000002']), ['100', None, '200'])
+        self.assertEqual(len(self.resolver.cache), 2)
+        self.change_vlan('oid:0x26000000000002', '201')
+        self.assertEqual(self.resolver.resolve('oid:0x26000000000002'), '200')
+
+    def test__subscription_lost(self):
+        self.assertEqual(self.resolver.resolve('oid:0x26000000000001'), '100')
+        self.change_vlan('oid:0x26000000000001', '101')
+        pubsub = self.resolver.pubsub
+
+        def lost_connection(*args, **kwargs):
+            raise redis.ConnectionError("Connection lost")
+
+        pubsub.get_message = lost_connection
+        self.assertEqual(self.resolver.resolve('oid:0x26000000000001'), '101')
+        self.assertIsNot(self.resolver.pubsub, pubsub)
+
+    def test__resubscribed(self):
+        self.assertEqual(self.resolver.resolve('oid:0x26000000000001'), '100')
+        self.change_vlan('oid:0x26000000000001', '101')
+        # A reconnected pubsub subscribes again
+        self.resolver.pubsub.psubscribe(self.resolver.pattern)
+        self.assertEqual(self.resolver.resolve('oid:0x26000000000001'), '101')
+
+
+class PortMapsTestCase(FakeRedisTestCase):
+    def setUp(self):
+        super(PortMapsTestCase, self).setUp()
+        import swsssdk
+        from swsssdk import port_util
+        self.counters = self.client(db=2)
+        self.counters.hset('COUNTERS_PORT_NAME_MAP', mapping={'Ethernet0': 'oid:0x1000000000002',
+                                                              'Ethernet4': 'oid:0x1000000000003'})
+        self.counters.hset('COUNTERS_LAG_NAME_MAP', 'PortChannel01', 'oid:0x2000000000010')
+        self.counters.hset('COUNTERS_RIF_NAME_MAP', 'Vlan1000', 'oid:0x6000000000020')
+        self.counters.hset('COUNTERS_RIF_TYPE_MAP', 'oid:0x6000000000020', 'SAI_ROUTER_INTERFACE_TYPE_VLAN')
+        self.asic = self.client(db=1)
+        self.asic.hset(port_util.BRIDGE_PORT_KEY_PREFIX + 'oid:0x3a000000000616',
+                       'SAI_BRIDGE_PORT_ATTR_PORT_ID', 'oid:0x1000000000002')
+        self.asic.hset(port_util.BRIDGE_PORT_KEY_PREFIX + 'oid:0x3a000000000617',
+                       'SAI_BRIDGE_PORT_ATTR_TYPE', 'SAI_BRIDGE_PORT_TYPE_1Q_ROUTER')
+        self.asic.hset(port_util.ROUTER_INTERFACE_KEY_PREFIX + 'oid:0x6000000000021',
+                       'SAI_ROUTER_INTERFACE_ATTR_PORT_ID', 'oid:0x1000000000003')
+        self.asic.hset(port_util.ROUTER_INTERFACE_KEY_PREFIX + 'oid:0x6000000000020',
+                       'SAI_ROUTER_INTERFACE_ATTR_TYPE', 'SAI_ROUTER_INTERFACE_TYPE_VLAN')
+        self.db = swsssdk.SonicV2Connector()
+
+    if_name_map = {'Ethernet0': '1000000000002', 'Ethernet4': '1000000000003', 'PortChannel01': '2000000000010'}
+    if_id_map = {'1000000000002': 'Ethernet0', '1000000000003': 'Ethernet4', '2000000000010': 'PortChannel01'}
+    if_br_oid_map = {'3a000000000616': '1000000000002'}
+    rif_port_oid_map = {'6000000000021': '1000000000003'}
+    vlan_if_name_map = {'6000000000020': 'Vlan1000'}
+
+
+class Test_port_maps(PortMapsTestCase):
+    def test__bridge_port_map(self):
+        from swsssdk import port_util
+        self.assertEqual(port_util.get_bridge_port_map(self.db), self.if_br_oid_map)
+
+    def test__rif_port_map(self):
+        from swsssdk import port_util
+        self.assertEqual(port_util.get_rif_port_map(self.db), self.rif_port_oid_map)
+
+    def test__empty(self):
+        from swsssdk import port_util
+        self.asic.flushdb()
+        self.assertEqual(port_util.get_bridge_port_map(self.db), {})
+        self.assertEqual(port_util.get_rif_port_map(self.db), {})
+
+    def test__port_maps(self):
+        from swsssdk import port_util
+        maps = port_util.get_port_maps(self.db)
+        self.assertEqual(maps, port_util.PortMaps(self.if_name_map, self.if_id_map, self.if_br_oid_map,
+                                                  self.rif_port_oid_map, self.vlan_if_name_map))
+        self.assertEqual(maps.if_name_map, port_util.get_interface_oid_map(self.db)[0])
+        self.assertEqual(maps.vlan_if_name_map, port_util.get_vlan_interface_oid_map(self.db))
+
+
+class Test_port_map_cache(PortMapsTestCase):
+    def setUp(self):
+        super(Test_port_map_cache, self).setUp()
+        from swsssdk import port_util
+        self.cache = port_util.PortMapCache(self.db)
+        self.addCleanup(self.cache.close)
+
+    def notify(self, client, key, event='hset'):
+        # fakeredis sends no keyspace notification, publish it as redis would
+        db_id = client.connection_pool.connection_kwargs['db']
+        client.publish('__keyspace@{}__:{}'.format(db_id, key), event)
+
+    def test__resync(self):
+        from swsssdk import port_util
+        self.assertEqual(self.cache.version, 1)
+        self.assertEqual(self.cache.maps, port_util.get_port_maps(self.db))
+        self.assertFalse(self.cache.update(timeout=0.01))
+        self.assertFalse(self.cache.resync())
+        self.assertEqual(self.cache.version, 1)
+
+    def test__bridge_ports(self):
+        from swsssdk import port_util
+        maps = self.cache.maps
+        added = port_util.BRIDGE_PORT_KEY_PREFIX + 'oid:0x3a000000000618'
+        self.asic.hset(added, 'SAI_BRIDGE_PORT_ATTR_PORT_ID', 'oid:0x2000000000010')
+        self.notify(self.asic, added)
+        deleted = port_util.BRIDGE_PORT_KEY_PREFIX + 'oid:0x3a000000000616'
+        self.asic.delete(deleted)
+        self.notify(self.asic, deleted, 'del')
+
+        self.assertTrue(self.cache.update(timeout=1))
+        self.assertEqual(self.cache.version, 2)
+        self.assertEqual(self.cache.maps.if_br_oid_map, {'3a000000000618': '2000000000010'})
+        self.assertEqual(self.cache.maps, port_util.get_port_maps(self.db))
+        # replaced, not modified
+        self.assertEqual(maps.if_br_oid_map, self.if_br_oid_map)
+        self.assertIs(self.cache.maps.if_name_map, maps.if_name_map)
+
+    def test__counters_name_map(self):
+        from swsssdk import port_util
+        self.counters.hset('COUNTERS_PORT_NAME_MAP', 'Ethernet8', 'oid:0x1000000000004')
+        self.notify(self.counters, 'COUNTERS_PORT_NAME_MAP')
+
+        self.assertTrue(self.cache.update(timeout=1))
+        self.assertEqual(self.cache.version, 2)
+        self.assertEqual(self.cache.maps.if_name_map['Ethernet8'], '1000000000004')
+        self.assertEqual(self.cache.maps.if_id_map['1000000000004'], 'Ethernet8')
+        self.assertEqual(self.cache.maps, port_util.get_port_maps(self.db))
+
+    def test__unchanged(self):
+        from swsssdk import port_util
+        # notified without any change of the mapped attributes
+        key = port_util.BRIDGE_PORT_KEY_PREFIX + 'oid:0x3a000000000616'
+        self.asic.hset(key, 'SAI_BRIDGE_PORT_ATTR_ADMIN_STATE', 'true')
+        self.notify(self.asic, key)
+        self.notify(self.counters, 'COUNTERS_LAG_NAME_MAP')
+        unmapped = port_util.BRIDGE_PORT_KEY_PREFIX + 'oid:0x3a000000000617'
+        self.asic.delete(unmapped)
+        self.notify(self.asic, unmapped, 'del')
+
+        self.assertFalse(self.cache.update(timeout=1))
+        self.assertEqual(self.cache.version, 1)
+        self.assertEqual(self.cache.maps, port_util.get_port_maps(self.db))
@@ -0,0 +1,524 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+import redis
+
+import swsssdk.sonic_db_dump_load
+from .fake_redis import FakeRedisTestCase
+
+dump_load = sys.modules['swsssdk.sonic_db_dump_load']
+
+
+class DumpLoadTestCase(FakeRedisTestCase):
+    def setUp(self):
+        super(DumpLoadTestCase, self).setUp()
+        self.source = self.client(db=0)
+        self.source.set('string', 'value')
+        self.source.rpush('list', 'a', 'b', 'a')
+        self.source.sadd('set', 'x', 'y')
+        self.source.zadd('zset', {'low': 1, 'high': 2.5})
+        self.source.hset('PORT_TABLE:Ethernet0', mapping={'mtu': '9100', 'admin_status': 'up'})
+        self.source.hset('PORT|Ethernet0', 'mtu', '9100')
+        self.source.expire('string', 100)
+
+    def dump(self, **kwargs):
+        output = io.BytesIO()
+        dump_load.native_dump(output, **kwargs)
+        return output.getvalue()
+
+    def content(self, db):
+        client = self.client(db=db, decode_responses=True)
+        content = {}
+        for key in client.keys():
+            key_type = client.type(key)
+            if key_type == 'string':
+                value = client.get(key)
+            elif key_type == 'list':
+                value = client.lrange(key, 0, -1)
+            elif key_type == 'set':
+                value = sorted(client.smembers(key))
+            elif key_type == 'zset':
+                value = client.zrange(key, 0, -1, withscores=True)
+            else:
+                value = client.hgetall(key)
+            content[key] = (key_type, value)
+        return content
+
+
+class Test_native_dump(DumpLoadTestCase):
+    def test__round_trip(self):
+        dump = json.loads(self.dump(batch_size=2).decode('utf-8'))
+        self.assertEqual(sorted(dump), ['PORT_TABLE:Ethernet0', 'PORT|Ethernet0', 'list', 'set', 'string', 'zset'])
+        self.assertEqual(dump['zset'], {'type': 'zset', 'value': [['low', 1.0], ['high', 2.5]]})
+        self.assertTrue(0 < dump['string']['ttl'] <= 100)
+        self.assertNotIn('ttl', dump['list'])
+
+        count, _ = dump_load.native_load(io.BytesIO(json.dumps(dump).encode('utf-8')), db=1, batch_size=4)
+        self.assertEqual(count, 6)
+        self.assertEqual(self.content(1), self.content(0))
+        self.assertTrue(0 < self.client(db=1).pttl('string') <= 100000)
+        self.assertEqual(self.client(db=1).ttl('list'), -1)
+
+    def test__formats(self):
+        dump = json.loads(self.dump().decode('utf-8'))
+        pretty = self.dump(pretty=True)
+        self.assertEqual(pretty[:3], b'{\n"')
+        self.assertEqual(set(json.loads(pretty.decode('utf-8'))), set(dump))
+        self.assertEqual(json.loads(pretty.decode('utf-8'))['list'], dump['list'])
+
+        lines = self.dump(jsonl=True).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), len(dump))
+        jsonl = {}
+        for line in lines:
+            item = json.loads(line)
+            self.assertEqual(len(item), 1)
+            jsonl.update(item)
+        self.assertEqual(set(jsonl), set(dump))
+
+        lines = self.dump(jsonl=True, pretty=True).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), len(dump))
+        self.assertEqual(dict(item for line in lines for item in json.loads(line).items())['set'],
+                         {'type': 'set', 'value': ['x', 'y']})
+
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as output:
+            dump_load.native_dump(output, jsonl=True)
+        count, _ = dump_load.native_load(io.BytesIO(compressed.getvalue()), db=1)
+        self.assertEqual(count, len(dump))
+        self.assertEqual(self.content(1), self.content(0))
+
+    def test__dump_writer(self):
+        output = io.BytesIO()
+        writer = dump_load._DumpWriter(output)
+        writer.close()
+        self.assertEqual(json.loads(output.getvalue().decode('utf-8')), {})
+
+        output = io.BytesIO()
+        writer = dump_load._DumpWriter(output, pretty=True)
+        writer.write(u'k\u00e9', {'type': 'string', 'value': u'\u00e9'})
+        writer.write('k2', {'value': 'v', 'type': 'string'})
+        writer.close()
+        self.assertEqual(output.getvalue().decode('utf-8'),
+                         '{\n"k\\u00e9":{\n  "type": "string",\n  "value": "\\u00e9"\n},\n'
+                         '"k2":{\n  "type": "string",\n  "value": "v"\n}\n}')
+
+        # JSON lines stay on one line
+        output = io.BytesIO()
+        writer = dump_load._DumpWriter(output, pretty=True, jsonl=True)
+        writer.write('k2', {'value': 'v', 'type': 'string'})
+        writer.close()
+        self.assertEqual(output.getvalue(), b'{"k2":{"type":"string","value":"v"}}\n')
+
+    def test__scan_keys(self):
+        keys = lambda *args, **kwargs: sorted(key for batch in dump_load._scan_keys(self.source, *args, **kwargs)
+                                              for key in batch)
+        self.assertEqual(len(keys(batch_size=1)), 6)
+        self.assertEqual(keys(['PORT*', 'PORT_TABLE:*']), [b'PORT_TABLE:Ethernet0', b'PORT|Ethernet0'])
+        self.assertEqual(keys(types=['set', 'zset']), [b'set', b'zset'])
+        self.assertEqual(keys(exclude=['PORT*', 's*']), [b'list', b'zset'])
+
+    def test__read_batch(self):
+        items = list(dump_load._read_batch(self.source, [b'hash', b'string', b'PORT|Ethernet0', b'set'], False, 'utf-8'))
+        self.assertEqual([item[:2] for item in items], [('string', 'string'), ('PORT|Ethernet0', 'hash'),
+                                                        ('set', 'set')])
+        self.assertTrue(0 < items[0][2] <= 100)
+        self.assertEqual(items[1][2:], (None, {'mtu': '9100'}))
+        self.assertEqual(sorted(items[2][3]), ['x', 'y'])
+
+
+class ShortReads(object):
+    """
+    Binary stream returning at most chunk_size bytes per read, like a pipe.
+    """
+
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.pos = 0
+
+    def read(self, size=-1):
+        data = self.data[self.pos:self.pos + min(size, self.chunk_size)]
+        self.pos += len(data)
+        return data
+
+
+class Test_native_load(DumpLoadTestCase):
+    DUMP = u'{"k1":{"type":"string","value":"été"} , "k2" : {"type":"list","value":["a","}"]},\n' \
+           u'"k3":{"type":"hash","value":{"f":"{\\"v\\":1}"}}}\n{}\n{"k4":{"type":"string","value":"4"}}\n'
+
+    def read(self, data, chunk_size):
+        return list(dump_load._DumpReader(ShortReads(data, chunk_size)))
+
+    def test__dump_reader(self):
+        expected = [('k1', {'type': 'string', 'value': u'été'}),
+                    ('k2', {'type': 'list', 'value': ['a', '}']}),
+                    ('k3', {'type': 'hash', 'value': {'f': '{"v":1}'}}),
+                    ('k4', {'type': 'string', 'value': '4'})]
+        data = self.DUMP.encode('utf-8')
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as output:
+            output.write(data)
+        compressed = compressed.getvalue()
+        for chunk_size in (1, 2, 3, 7, 1000):
+            self.assertEqual(self.read(data, chunk_size), expected)
+            self.assertEqual(self.read(compressed, chunk_size), expected)
+        # concatenated gzip members
+        self.assertEqual(self.read(compressed + compressed, 5), expected + expected)
+        self.assertEqual(self.read(b'', 1), [])
+        self.assertEqual(self.read(b' \n', 1), [])
+
+    def test__invalid_dump(self):
+        for data in (b'{"k1":{"type":"string","value":"v"}', b'{"k1" {}}', b'["k1"]', b'{"k1":{"type":'):
+            with self.assertRaises(ValueError):
+                self.read(data, 4)
+
+    def test__input(self):
+        data = b'\x1f\x8b is not gzip'
+        # a first read of a single byte is completed before detecting gzip
+        reader = dump_load._Input(ShortReads(b'{}', 1))
+        self.assertEqual(reader.read(), b'{}')
+        self.assertEqual(reader.bytes_read, 2)
+        self.assertIsNone(reader.read())
+        reader = dump_load._Input(ShortReads(b'{', 1))
+        self.assertEqual(reader.read(), b'{')
+        self.assertIsNone(reader.read())
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as output:
+            output.write(data)
+        reader = dump_load._Input(ShortReads(compressed.getvalue(), 1))
+        chunks = []
+        while True:
+            chunk = reader.read()
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(reader.bytes_read, len(compressed.getvalue()))
+
+    def test__load(self):
+        self.source.set('k2', 'replaced')
+        count, size = dump_load.native_load(ShortReads(self.DUMP.encode('utf-8'), 10), db=0, batch_size=3, multi=True)
+        self.assertEqual((count, size), (4, len(self.DUMP.encode('utf-8'))))
+        client = self.client(db=0, decode_responses=True)
+        self.assertEqual(client.get('k1'), u'été')
+        self.assertEqual(client.lrange('k2', 0, -1), ['a', '}'])
+        self.assertEqual(client.hgetall('k3'), {'f': '{"v":1}'})
+        self.assertEqual(client.get('string'), 'value')
+
+        progress = []
+        dump_load.native_load(io.BytesIO(b'{"k5":{"type":"set","value":["a"]}}'), db=0, empty=True,
+                              progress=lambda *args: progress.append(args[:2]))
+        self.assertEqual(client.keys(), ['k5'])
+        self.assertEqual(progress, [(1, 35)])
+
+    def test__empty(self):
+        for i in range(25):
+            self.source.set('key{}'.format(i), i)
+        # one SCAN batch: the cursors of fakeredis, unlike Redis ones, skip keys deleted during the scan
+        dump_load._empty(self.source, batch_size=100)
+        self.assertEqual(self.source.dbsize(), 0)
+        dump_load._empty(self.source)
+        self.assertEqual(self.source.dbsize(), 0)
+
+
+class Test_incremental_dump(DumpLoadTestCase):
+    def setUp(self):
+        super(Test_incremental_dump, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.digests = os.path.join(tmp_dir, 'digests')
+        # The Lua scripts of fakeredis have no redis.sha1hex: use the digested strings themselves
+        self.addCleanup(setattr, dump_load, 'DIGEST_SCRIPT', dump_load.DIGEST_SCRIPT)
+        dump_load.DIGEST_SCRIPT = dump_load.DIGEST_SCRIPT.replace('redis.sha1hex(', '(')
+
+    def incremental_dump(self, **kwargs):
+        return self.dump(digests=self.digests, **kwargs)
+
+    def test__digests(self):
+        full = self.incremental_dump(batch_size=2)
+        self.assertEqual(len(json.loads(full.decode('utf-8'))), 6)
+        self.assertEqual(json.loads(self.incremental_dump().decode('utf-8')), {})
+
+        self.source.hset('PORT|Ethernet0', 'mtu', '1500')
+        self.source.delete('list')
+        self.source.sadd('new', 'a')
+        # same content, in another order
+        self.source.delete('PORT_TABLE:Ethernet0')
+        self.source.hset('PORT_TABLE:Ethernet0', mapping={'admin_status': 'up', 'mtu': '9100'})
+        self.source.expire('set', 100)
+        increment = self.incremental_dump()
+        self.assertEqual(json.loads(increment.decode('utf-8')), {
+            'PORT|Ethernet0': {'type': 'hash', 'value': {'mtu': '1500'}},
+            'new': {'type': 'set', 'value': ['a']},
+            'list': dump_load.REMOVED_ITEM,
+        })
+
+        merged = io.BytesIO()
+        self.assertEqual(dump_load.merge_dumps(merged, [io.BytesIO(full), io.BytesIO(increment)]), 6)
+        merged = json.loads(merged.getvalue().decode('utf-8'))
+        self.assertNotIn('list', merged)
+        self.assertEqual(merged['new'], {'type': 'set', 'value': ['a']})
+        self.assertEqual(merged['PORT|Ethernet0']['value'], {'mtu': '1500'})
+
+        dump_load.native_load(io.BytesIO(full), db=1)
+        dump_load.native_load(io.BytesIO(increment), db=1)
+        self.assertEqual(self.content(1), self.content(0))
+
+    def test__selection(self):
+        self.incremental_dump(keys=['PORT*'])
+        with self.assertRaises(ValueError):
+            self.incremental_dump(keys=['PORT*'], types=['hash'])
+
+    def test__merge_dumps(self):
+        inputs = [b'{"a":{"type":"string","value":"1"},"b":{"type":"string","value":"2"}}',
+                  b'{"a":{"type":"none"}}\n{"c":{"type":"list","value":["3"]}}\n{"x":{"type":"none"}}\n',
+                  b'{"a":{"type":"string","value":"4"},"c":{"type":"none"}}']
+        for jsonl in (False, True):
+            output = io.BytesIO()
+            self.assertEqual(dump_load.merge_dumps(output, [io.BytesIO(data) for data in inputs[:2]], jsonl=jsonl), 2)
+            self.assertEqual(output.getvalue().count(b'\n'), 2 if jsonl else 0)
+        output = io.BytesIO()
+        self.assertEqual(dump_load.merge_dumps(output, [io.BytesIO(data) for data in inputs]), 2)
+        self.assertEqual(json.loads(output.getvalue().decode('utf-8')), {
+            'a': {'type': 'string', 'value': '4'},
+            'b': {'type': 'string', 'value': '2'},
+        })
+
+
+class Test_binary_dump(DumpLoadTestCase):
+    def binary_dump(self, **kwargs):
+        output = io.BytesIO()
+        count = dump_load.binary_dump(output, manifest={'dbname': 'APPL_DB'}, **kwargs)
+        return count, output.getvalue()
+
+    def test__round_trip(self):
+        count, snapshot = self.binary_dump(batch_size=4)
+        self.assertEqual(count, 6)
+        self.source.set('list', 'replaced')
+        self.assertEqual(dump_load.binary_load(io.BytesIO(snapshot), db=0, batch_size=4)[0], 6)
+        loaded, size, manifest = dump_load.binary_load(ShortReads(snapshot, 3), db=1, multi=True)
+        self.assertEqual((loaded, size), (6, len(snapshot)))
+        self.assertEqual((manifest['dbname'], manifest['db'], manifest['keys']), ('APPL_DB', 0, '*'))
+        self.assertEqual(self.content(1), self.content(0))
+        self.assertEqual(self.client(db=0).lrange('list', 0, -1), [b'a', b'b', b'a'])
+        self.assertTrue(0 < self.client(db=1).pttl('string') <= 100000)
+        self.assertEqual(self.client(db=1).ttl('set'), -1)
+
+        compressed = io.BytesIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as output:
+            output.write(snapshot)
+        self.assertEqual(dump_load.binary_load(io.BytesIO(compressed.getvalue()), db=2, empty=True)[0], 6)
+        self.assertEqual(self.content(2), self.content(0))
+
+    def test__use_expireat(self):
+        _, snapshot = self.binary_dump(types=['string'])
+        dump_load.binary_load(io.BytesIO(snapshot), db=1, use_expireat=True)
+        self.assertTrue(0 < self.client(db=1).pttl('string') <= 100000)
+        # created 200s ago: the key expired since
+        reader = dump_load._SnapshotReader(io.BytesIO(snapshot))
+        created = reader.manifest['created']
+        expired = snapshot.replace(str(created).encode('ascii'), str(created - 200000).encode('ascii'))
+        self.assertEqual(dump_load.binary_load(io.BytesIO(expired), db=2, use_expireat=True)[0], 0)
+        self.assertEqual(self.client(db=2).dbsize(), 0)
+
+    def test__invalid_snapshot(self):
+        _, snapshot = self.binary_dump()
+        reader = dump_load._SnapshotReader(io.BytesIO(snapshot))
+        self.assertEqual(len(list(reader)), 6)
+
+        with self.assertRaises(ValueError) as context:
+            dump_load._SnapshotReader(io.BytesIO(b'SWSSDMP0' + snapshot[8:]))
+        self.assertIn('unknown format', str(context.exception))
+        with self.assertRaises(ValueError) as context:
+            dump_load._SnapshotReader(io.BytesIO(snapshot.replace(b'"version": 1', b'"version": 2')))
+        self.assertIn('unsupported version 2', str(context.exception))
+        for size in (0, 10, len(snapshot) // 2, len(snapshot) - 1):
+            with self.assertRaises(ValueError) as context:
+                list(dump_load._SnapshotReader(io.BytesIO(snapshot[:size])))
+            self.assertIn('truncated', str(context.exception))
+        # end record of another number of keys
+        with self.assertRaises(ValueError) as context:
+            list(dump_load._SnapshotReader(io.BytesIO(snapshot[:-8] + b'\x07' + b'\0' * 7)))
+        self.assertIn('7 dumped', str(context.exception))
+        # corrupted payload
+        corrupted = bytearray(snapshot)
+        corrupted[-20] ^= 0xff
+        with self.assertRaises(redis.ResponseError):
+            dump_load.binary_load(io.BytesIO(bytes(corrupted)), db=1)
+
+
+class Test_key_selection(DumpLoadTestCase):
+    def setUp(self):
+        super(Test_key_selection, self).setUp()
+        config_db = self.client(db=4)
+        config_db.hset('PORT|Ethernet0', 'mtu', '9100')
+        config_db.hset('PORT_QOS_MAP|Ethernet0', 'tc_to_queue_map', 'AZURE')
+        config_db.hset('VLAN|Vlan100', 'vlanid', '100')
+        config_db.set('PORT', 'not a table key')
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.output = os.path.join(tmp_dir, 'dump.json')
+        self.addCleanup(setattr, sys, 'argv', sys.argv)
+
+    def run_dump(self, *args):
+        sys.argv = ['sonic-db-dump', '--engine', 'native', '-o', self.output] + list(args)
+        swsssdk.sonic_db_dump_load()
+        with open(self.output) as f:
+            return sorted(json.load(f))
+
+    def test__tables(self):
+        self.assertEqual(self.run_dump('-n', 'CONFIG_DB', '-T', 'PORT', '-T', 'VLAN'), ['PORT|Ethernet0', 'VLAN|Vlan100'])
+        self.assertEqual(self.run_dump('-n', 'APPL_DB', '-T', 'PORT_TABLE', '-k', 'str*'),
+                         ['PORT_TABLE:Ethernet0', 'string'])
+        # both separators without database name
+        self.assertEqual(self.run_dump('-T', 'PORT'), ['PORT|Ethernet0'])
+
+    def test__types_and_exclude(self):
+        self.assertEqual(self.run_dump('-n', 'APPL_DB', '--type', 'string', '--type', 'zset'), ['string', 'zset'])
+        self.assertEqual(self.run_dump('-n', 'APPL_DB', '-x', 'PORT*', '-x', 's*'), ['list', 'zset'])
+        self.assertEqual(self.run_dump('-n', 'CONFIG_DB', '-T', 'PORT', '-k', 'PORT*', '-x', 'PORT_QOS*',
+                                       '--type', 'hash'), ['PORT|Ethernet0'])
+        self.assertEqual(self.run_dump('-n', 'APPL_DB', '-k', '*', '-k', 's*', '--type', 'hash', '--type', 'set',
+                                       '-x', 'PORT|*'), ['PORT_TABLE:Ethernet0', 'set'])
+
+    def test__redisdl_selection(self):
+        stdout = sys.stdout
+        sys.stdout = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        self.addCleanup(setattr, sys, 'stdout', stdout)
+        for args in (['-T', 'PORT'], ['-x', 'PORT*'], ['--type', 'hash'], ['-k', 'a*', '-k', 'b*']):
+            sys.argv = ['sonic-db-dump', '-o', self.output] + args
+            with self.assertRaises(SystemExit) as context:
+                swsssdk.sonic_db_dump_load()
+            self.assertEqual(context.exception.code, 4)
+
+    def test__redisdl_load_options(self):
+        stdout = sys.stdout
+        sys.stdout = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        self.addCleanup(setattr, sys, 'stdout', stdout)
+        for args in (['sonic-db-load', '-b', '10'], ['sonic-db-load', '-M'], ['sonic-db-load', '-P'],
+                     ['sonic-db', '-l', '--engine', 'redisdl', '-P']):
+            sys.argv = args + [self.output]
+            with self.assertRaises(SystemExit) as context:
+                swsssdk.sonic_db_dump_load()
+            self.assertEqual(context.exception.code, 4)
+        self.assertIn('Usage:', sys.stdout.getvalue())
+
+    def test__scan_without_type(self):
+        scan = self.source.scan
+
+        def scan_without_type(cursor=0, match=None, count=None, _type=None):
+            if _type is not None:
+                raise redis.ResponseError("syntax error")
+            return scan(cursor, match, count)
+
+        self.source.scan = scan_without_type
+        keys = [key for batch in dump_load._scan_keys(self.source, ['*', 's*'], types=['string', 'set'],
+                                                      exclude=['se*'], batch_size=2) for key in batch]
+        self.assertEqual(sorted(keys), [b'string'])
+
+
+class Test_dump_all(DumpLoadTestCase):
+    def setUp(self):
+        super(Test_dump_all, self).setUp()
+        self.client(db=4).hset('PORT|Ethernet0', 'mtu', '9100')
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.tmp_dir = tmp_dir
+        self.dblist = sorted(swsssdk.SonicDBConfig.get_dblist())
+        self.addCleanup(setattr, sys, 'argv', sys.argv)
+        stdout = sys.stdout
+        sys.stdout = io.StringIO() if sys.version_info[0] > 2 else io.BytesIO()
+        self.addCleanup(setattr, sys, 'stdout', stdout)
+
+    def run_dump(self, output, *args):
+        sys.argv = ['sonic-db-dump', '--engine', 'native', '--all', '-j', '2', '-o', output] + list(args)
+        swsssdk.sonic_db_dump_load()
+
+    def check_dumps(self, directory, namespace=''):
+        self.assertEqual(sorted(name for name in os.listdir(os.path.join(directory, namespace))
+                                if name.endswith('.json')), [dbname + '.json' for dbname in self.dblist])
+        with open(os.path.join(directory, namespace, 'APPL_DB.json')) as f:
+            self.assertEqual(sorted(json.load(f)), ['PORT_TABLE:Ethernet0', 'PORT|Ethernet0', 'list', 'set',
+                                                    'string', 'zset'])
+        with open(os.path.join(directory, namespace, 'CONFIG_DB.json')) as f:
+            self.assertEqual(json.load(f), {'PORT|Ethernet0': {'type': 'hash', 'value': {'mtu': '9100'}}})
+        with open(os.path.join(directory, namespace, 'STATE_DB.json')) as f:
+            self.assertEqual(json.load(f), {})
+
+    def staging_directories(self):
+        """
+        Record the directories created by tempfile.mkdtemp.
+        """
+        mkdtemp = tempfile.mkdtemp
+        directories = []
+
+        def record_mkdtemp(*args, **kwargs):
+            directories.append(mkdtemp(*args, **kwargs))
+            return directories[-1]
+
+        tempfile.mkdtemp = record_mkdtemp
+        self.addCleanup(setattr, tempfile, 'mkdtemp', mkdtemp)
+        return directories
+
+    def test__directory(self):
+        output = os.path.join(self.tmp_dir, 'dump')
+        self.run_dump(output)
+        self.check_dumps(output)
+        self.assertIn("{} databases dumped to {}".format(len(self.dblist), output), sys.stdout.getvalue())
+
+    def test__archive(self):
+        staging = self.staging_directories()
+        for name in ('dump.tar', 'dump.tgz'):
+            output = os.path.join(self.tmp_dir, name)
+            self.run_dump(output)
+            with tarfile.open(output) as tar:
+                directory = os.path.join(self.tmp_dir, name + '.content')
+                tar.extractall(directory)
+            self.check_dumps(directory)
+        self.assertEqual(len(staging), 2)
+        self.assertFalse(any(os.path.exists(directory) for directory in staging))
+
+    def test__archive_error(self):
+        staging = self.staging_directories()
+        self.server.connected = False
+        with self.assertRaises(redis.ConnectionError):
+            self.run_dump(os.path.join(self.tmp_dir, 'dump.tgz'))
+        self.assertEqual(len(staging), 1)
+        self.assertFalse(os.path.exists(staging[0]))
+
+    def test__namespaces(self):
+        config = dict(vars(swsssdk.SonicDBConfig))
+        for name in ('_sonic_db_config', '_sonic_db_config_init', '_sonic_db_global_config_init'):
+            self.addCleanup(setattr, swsssdk.SonicDBConfig, name, config[name])
+        swsssdk.SonicDBConfig._sonic_db_config = {}
+        swsssdk.SonicDBConfig._sonic_db_config_init = False
+        swsssdk.SonicDBConfig._sonic_db_global_config_init = False
+        swsssdk.SonicDBConfig.load_sonic_global_db_config(
+            global_db_file_path=os.path.join(modules_path, 'test', 'config', 'database_global.json'))
+
+        output = os.path.join(self.tmp_dir, 'dump')
+        self.run_dump(output, '-N')
+        # the databases of the host, then a directory per namespace
+        self.assertEqual(sorted(name for name in os.listdir(output) if not name.endswith('.json')),
+                         ['asic0', 'asic1', 'asic2'])
+        for namespace in ('', 'asic0', 'asic1', 'asic2'):
+            self.check_dumps(output, namespace)
+
+    def test__no_database(self):
+        get_dblist = swsssdk.SonicDBConfig.get_dblist
+        self.addCleanup(setattr, swsssdk.SonicDBConfig, 'get_dblist', staticmethod(get_dblist))
+        swsssdk.SonicDBConfig.get_dblist = staticmethod(lambda namespace=None: [])
+        output = os.path.join(self.tmp_dir, 'dump.tar')
+        self.run_dump(output)
+        with tarfile.open(output) as tar:
+            self.assertEqual(tar.getnames(), [])
+        self.assertIn("0 databases dumped", sys.stdout.getvalue())
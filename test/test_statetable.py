@@ -0,0 +1,98 @@
+import os
+import sys
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+from swsssdk import ConsumerStateTable, ProducerStateTable
+from swsssdk.statetable import DEL_COMMAND, SET_COMMAND
+from .fake_redis import FakeRedisTestCase
+
+
+class Test_state_table(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_state_table, self).setUp()
+        import swsssdk
+        self.db = swsssdk.SonicV2Connector()
+        self.db.connect(self.db.APPL_DB)
+        self.appl = self.client(db=0, decode_responses=True)
+        self.notifications = self.appl.pubsub()
+        self.notifications.subscribe('PORT_TABLE_CHANNEL')
+        self.notifications.get_message(timeout=1)
+        self.addCleanup(self.notifications.close)
+
+    def producer(self, **kwargs):
+        return ProducerStateTable(self.db, self.db.APPL_DB, 'PORT_TABLE', **kwargs)
+
+    def consumer(self, **kwargs):
+        consumer = ConsumerStateTable(self.db, self.db.APPL_DB, 'PORT_TABLE', **kwargs)
+        self.addCleanup(consumer.close)
+        return consumer
+
+    def published(self):
+        messages = []
+        message = self.notifications.get_message(timeout=0.01)
+        while message is not None:
+            messages.append((message['channel'], message['data']))
+            message = self.notifications.get_message(timeout=0.01)
+        return messages
+
+    def test__producer(self):
+        producer = self.producer()
+        producer.set('Ethernet0', {'speed': '100000', 'mtu': '9100'})
+        producer.set('Ethernet0', [('mtu', '1500')])
+        producer.delete('Ethernet4')
+        self.assertEqual(self.appl.hgetall('_PORT_TABLE:Ethernet0'), {'speed': '100000', 'mtu': '1500'})
+        self.assertEqual(self.appl.smembers('PORT_TABLE_KEY_SET'), {'Ethernet0', 'Ethernet4'})
+        self.assertEqual(self.appl.smembers('PORT_TABLE_DEL_SET'), {'Ethernet4'})
+        self.assertFalse(self.appl.exists('PORT_TABLE:Ethernet0'))
+        # one notification per key added to the key set
+        self.assertEqual(self.published(), [('PORT_TABLE_CHANNEL', 'G'), ('PORT_TABLE_CHANNEL', 'G')])
+
+    def test__buffered_producer(self):
+        producer = self.producer(buffered=True, batch_size=3)
+        producer.set('Ethernet0', {'speed': '100000'})
+        producer.delete('Ethernet4')
+        self.assertEqual(self.appl.keys(), [])
+        producer.set('Ethernet8', {'speed': '40000'})
+        self.assertEqual(self.appl.smembers('PORT_TABLE_KEY_SET'), {'Ethernet0', 'Ethernet4', 'Ethernet8'})
+        self.assertEqual(self.appl.smembers('PORT_TABLE_DEL_SET'), {'Ethernet4'})
+        self.assertEqual(self.appl.hgetall('_PORT_TABLE:Ethernet8'), {'speed': '40000'})
+
+        producer.set('Ethernet12', {'speed': '40000'})
+        self.assertFalse(self.appl.exists('_PORT_TABLE:Ethernet12'))
+        producer.flush()
+        self.assertTrue(self.appl.exists('_PORT_TABLE:Ethernet12'))
+        self.assertEqual(len(self.published()), 4)
+
+    def test__pops(self):
+        self.appl.hset('PORT_TABLE:Ethernet4', mapping={'speed': '40000', 'mtu': '9100'})
+        self.appl.hset('PORT_TABLE:Ethernet8', 'speed', '40000')
+        producer = self.producer()
+        consumer = self.consumer(pop_batch_size=2)
+        producer.set('Ethernet0', {'speed': '100000'})
+        producer.delete('Ethernet4')
+        producer.set('Ethernet4', {'speed': '100000'})
+        producer.delete('Ethernet8')
+        self.assertTrue(consumer.wait(timeout=1))
+
+        entries = consumer.pops() + consumer.pops()
+        self.assertEqual(consumer.pops(), [])
+        self.assertEqual(sorted(entries), [
+            ('Ethernet0', SET_COMMAND, [('speed', '100000')]),
+            ('Ethernet4', SET_COMMAND, [('speed', '100000')]),
+            ('Ethernet8', DEL_COMMAND, []),
+        ])
+        self.assertEqual(self.appl.hgetall('PORT_TABLE:Ethernet0'), {'speed': '100000'})
+        # deleted before the staged fields were applied
+        self.assertEqual(self.appl.hgetall('PORT_TABLE:Ethernet4'), {'speed': '100000'})
+        self.assertFalse(self.appl.exists('PORT_TABLE:Ethernet8'))
+        self.assertEqual(sorted(self.appl.keys()), ['PORT_TABLE:Ethernet0', 'PORT_TABLE:Ethernet4'])
+        self.assertFalse(consumer.wait(timeout=0.01))
+
+    def test__empty_set(self):
+        self.appl.hset('PORT_TABLE:Ethernet0', 'speed', '40000')
+        self.producer().set('Ethernet0', {})
+        self.assertEqual(self.consumer().pops(), [('Ethernet0', DEL_COMMAND, [])])
+        # nothing staged: the entry is left as is
+        self.assertEqual(self.appl.hgetall('PORT_TABLE:Ethernet0'), {'speed': '40000'})
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+
+modules_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(modules_path, 'src'))
+
+import redis
+
+from swsssdk import BufferedWriter, ConfigDBBufferedWriter
+from .fake_redis import FakeRedisTestCase
+
+
+def lost_connection(*args, **kwargs):
+    raise redis.ConnectionError("Connection lost")
+
+
+class Test_buffered_writer(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_buffered_writer, self).setUp()
+        import swsssdk
+        self.db = swsssdk.SonicV2Connector()
+        self.db.connect(self.db.APPL_DB)
+        self.db.connect(self.db.STATE_DB)
+        self.state = self.client(db=6, decode_responses=True)
+
+    def test__coalescing(self):
+        writer = BufferedWriter(self.db, max_pending=100)
+        writer.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'oper_status', 'down')
+        writer.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'oper_status', 'up')
+        writer.set_all(self.db.STATE_DB, 'PORT_TABLE|Ethernet4', {'oper_status': 'up', 'mtu': '9100'})
+        self.assertEqual(writer.pending_count, 3)
+        self.assertEqual(self.state.keys(), [])
+        writer.flush()
+        self.assertEqual(self.state.hgetall('PORT_TABLE|Ethernet0'), {'oper_status': 'up'})
+        self.assertEqual(self.state.hgetall('PORT_TABLE|Ethernet4'), {'oper_status': 'up', 'mtu': '9100'})
+        self.assertEqual((writer.stats['writes'], writer.stats['coalesced'], writer.stats['commands']), (3, 1, 2))
+
+    def test__flush_if_due(self):
+        writer = BufferedWriter(self.db, max_pending=2, max_delay=0.05)
+        writer.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'oper_status', 'up')
+        self.assertFalse(writer.flush_if_due())
+        self.assertEqual(self.state.keys(), [])
+        writer.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet4', 'oper_status', 'up')
+        self.assertEqual(len(self.state.keys()), 2)
+
+        writer.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet8', 'oper_status', 'up')
+        time.sleep(0.06)
+        # no write after the delay: only flushed by flush_if_due
+        self.assertFalse(self.state.exists('PORT_TABLE|Ethernet8'))
+        self.assertTrue(writer.flush_if_due())
+        self.assertTrue(self.state.exists('PORT_TABLE|Ethernet8'))
+        self.assertIsNone(writer.first_pending_time)
+
+    def test__replace_and_delete(self):
+        self.state.hset('PORT_TABLE|Ethernet0', mapping={'oper_status': 'up', 'mtu': '9100'})
+        self.state.hset('PORT_TABLE|Ethernet4', 'oper_status', 'up')
+        writer = BufferedWriter(self.db)
+        writer.replace(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', {'oper_status': 'down'})
+        writer.delete(self.db.STATE_DB, 'PORT_TABLE|Ethernet4')
+        writer.flush()
+        self.assertEqual(self.state.hgetall('PORT_TABLE|Ethernet0'), {'oper_status': 'down'})
+        self.assertFalse(self.state.exists('PORT_TABLE|Ethernet4'))
+        # HMSET and HDEL for the replacement, DEL for the deletion
+        self.assertEqual(writer.stats['commands'], 3)
+
+    def test__flush_error_keeps_writes(self):
+        writer = BufferedWriter(self.db)
+        writer.set(self.db.APPL_DB, 'PORT_TABLE:Ethernet0', 'mtu', '9100')
+        writer.set(self.db.STATE_DB, 'PORT_TABLE|Ethernet0', 'oper_status', 'up')
+        client = self.db.get_redis_client(self.db.STATE_DB)
+        pipeline = client.pipeline
+
+        def failing_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            pipe.execute = lost_connection
+            return pipe
+
+        client.pipeline = failing_pipeline
+        with self.assertRaises(redis.ConnectionError):
+            writer.flush()
+        self.assertEqual(self.client(db=0).hget('PORT_TABLE:Ethernet0', 'mtu'), b'9100')
+        self.assertEqual(list(writer.pending), [self.db.STATE_DB])
+        self.assertEqual(writer.pending_count, 1)
+
+        del client.pipeline
+        writer.flush()
+        self.assertEqual(writer.pending, {})
+        self.assertEqual(self.state.hgetall('PORT_TABLE|Ethernet0'), {'oper_status': 'up'})
+
+
+class Test_config_db_buffered_writer(FakeRedisTestCase):
+    def setUp(self):
+        super(Test_config_db_buffered_writer, self).setUp()
+        import swsssdk
+        self.config_db = swsssdk.ConfigDBConnector()
+        self.config_db.connect(wait_for_init=False)
+        self.config_db.set_entry('PORT', 'Ethernet0', {'mtu': '9100', 'alias': 'etp1', 'lanes': ['0', '1']})
+
+    def test__set_entry(self):
+        writer = ConfigDBBufferedWriter(self.config_db)
+        writer.set_entry('PORT', 'Ethernet0', {'mtu': '1500', 'lanes': ['0']})
+        writer.set_entry('PORT', 'Ethernet4', {})
+        writer.mod_entry('VLAN', 'Vlan100', {'vlanid': '100'})
+        writer.flush()
+        self.assertEqual(self.config_db.get_config(), {
+            'PORT': {'Ethernet0': {'mtu': '1500', 'lanes': ['0']}, 'Ethernet4': {}},
+            'VLAN': {'Vlan100': {'vlanid': '100'}},
+        })
+        writer.set_entry('PORT', 'Ethernet4', None)
+        writer.flush()
+        self.assertEqual(list(self.config_db.get_table('PORT')), ['Ethernet0'])
+